@@ -1,25 +1,24 @@
 # Importations nécessaires
 import customtkinter as ctk # Pour l'interface graphique
+import gc # Pour écarter les données chargées des collectes (gc.freeze)
 import json # Pour la sauvegarde en JSON
 import os # Pour vérifier l'existence des fichiers
 from datetime import datetime # Pour la gestion des dates
 from tkinter import messagebox # Pour les boîtes de dialogue d'alerte
+import tkinter # Pour le label qui affiche le graphique rendu en arrière-plan
 import tkinter.ttk as ttk # Pour le widget Treeview (tableau)
-from collections import defaultdict # Pour faciliter le comptage des dépenses
 import io
-import re # Importation pour extraire le montant numérique
+import queue # Pour transmettre la réponse du chat du thread de l'API à l'interface
 import threading # Pour les appels API non bloquants
+import time # Pour mesurer le délai avant la première réponse du chat
 
-# Importation pour les requêtes API
-import requests
-import json
+import config # Paramètres de l'application
+import perf # Mesures de performance (si activées)
+from storage import BackgroundWriter, create_storage # Sauvegarde des données (JSON, journal ou SQLite), écrite dans un thread dédié
+from ledger import Ledger, LedgerError, bulk_load, month_of, parse_date, sort_key, id_of_key # Registre (données, index et totaux), sans interface
 
-# Matériel pour le graphique camembert
-import matplotlib
-matplotlib.use("Agg") # Nécessaire pour la compatibilité avec tkinter
-import matplotlib.pyplot as plt
-from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
-from PIL import Image, ImageTk
+# Les modules lourds (requests pour l'API, matplotlib/charts et PIL pour le graphique) sont importés
+# à leur première utilisation : ils ne ralentissent pas l'ouverture de la fenêtre
 
 # Classe principale de l'application
 class BudgetApp(ctk.CTk):
@@ -39,19 +38,55 @@ class BudgetApp(ctk.CTk):
         script_dir = os.path.dirname(os.path.abspath(__file__))
         # Define the data file path relative to the script directory
         self.data_file = os.path.join(script_dir, "budget_data.json")
-        self.data = self.load_data() # Charge les données
+        self.storage = create_storage(config.STORAGE_MODE, self.data_file, config.JOURNAL_COMPACT_THRESHOLD)
+        # Registre : données, index par identifiant/mois/catégorie et totaux précalculés (voir ledger.py)
+        self.ledger = Ledger(self.storage, verify=config.VERIFY_AGGREGATES)
+        with bulk_load(): backfilled = self.ledger.attach(self.load_data())
+        # Les transactions chargées vivent jusqu'à la fermeture : les écarter des collectes suivantes, qui sinon
+        # les parcourraient toutes (les cycles déjà inaccessibles à cet instant ne seront plus libérés)
+        gc.freeze()
+        # Les sauvegardes sont confiées à un thread d'écriture : l'interface n'attend jamais le disque
+        self.ledger.writer = BackgroundWriter(self.storage, self.ledger.storage_lock, delay=config.WRITE_DELAY)
+        self.save_poll_scheduled = False
+        self.protocol("WM_DELETE_WINDOW", self.on_closing) # Écrire ce qui reste avant de fermer
+        if backfilled:
+            self.save_data() # Ancien fichier : enregistrer les identifiants attribués
+        self.report_invalid_dates()
         self.categories = self.load_categories() # Charge les catégories
 
         # Variables pour les filtres
         self.filter_month_var = ctk.StringVar(value="Tous")
         self.filter_category_var = ctk.StringVar(value="Toutes")
         
-        # Pour le graphique
-        self.analysis_chart_widget = None
+        # Pour le tableau des transactions (rempli page par page)
+        self.visible_keys = [] # Clés de tri des transactions filtrées, dans l'ordre d'affichage
+        self.loaded_row_count = 0 # Nombre de lignes déjà insérées dans le Treeview
+        self.page_load_pending = False
+        self.statement_import = None # Import de relevé en cours (voir importer.py)
+
+        # Rafraîchissement groupé : les modifications marquent les vues à refaire, un seul passage after_idle
+        # rafraîchit celles de l'écran affiché ; les autres attendent que l'écran soit ouvert
+        self.current_frame = None
+        self.dirty_views = set()
+        self.refresh_scheduled = False
+
+        # Pour le graphique (figure unique réutilisée à chaque mise à jour)
+        self.analysis_chart = None # DonutChart affiché directement (mode "inline")
+        self.analysis_chart_widget = None # Widget Tk qui affiche le graphique (canevas ou image)
+        self.analysis_render_key = None # (version des données, thème, largeur, hauteur) du dernier affichage
+        # Mode "background" : rendu dans un thread, puis affichage de l'image avec ImageTk (créé avec l'écran Analyse)
+        self.chart_renderer = None
+        self.chart_photo = None # Référence gardée sur l'image affichée (sinon Tk l'efface)
+        self.chart_poll_scheduled = False
         
         # Pour le chat IA
         self.openai_client = None
         self.chat_history_list = [] # Pour garder l'historique pour l'API
+        self.chat_queue = None # Événements du thread de l'API (réponse en cours), vidés par drain_chat_queue
+        self.chat_client = None # ChatClient créé au premier message, puis réutilisé (connexions gardées ouvertes)
+        self.chat_request = None # Requête en cours (ChatRequest), annulée si un nouveau message est envoyé
+        self.chat_cache = None # ResponseCache des réponses déjà reçues, créé avec chat_client
+        self.chat_digest = None # (empreinte des données, résumé du budget pour le message système)
 
         # --- Le menu à gauche --- 
         self.sidebar_frame = ctk.CTkFrame(self, width=180, corner_radius=0)
@@ -70,6 +105,9 @@ class BudgetApp(ctk.CTk):
         self.analysis_button.grid(row=3, column=0, padx=20, pady=10)
         self.chat_button = ctk.CTkButton(self.sidebar_frame, text="Chat IA", command=lambda: self.select_frame_by_name("chat"))
         self.chat_button.grid(row=4, column=0, padx=20, pady=10)
+        # Écran des mesures de performance, caché si elles ne sont pas activées
+        self.performance_button = ctk.CTkButton(self.sidebar_frame, text="Performance", command=lambda: self.select_frame_by_name("performance"))
+        if perf.enabled(): self.performance_button.grid(row=5, column=0, padx=20, pady=10, sticky="n")
 
         # Choix du thème (clair/sombre)
         self.appearance_mode_label = ctk.CTkLabel(self.sidebar_frame, text="Mode d'Apparence:", anchor="w")
@@ -91,57 +129,77 @@ class BudgetApp(ctk.CTk):
         self.chat_frame = ctk.CTkFrame(self, corner_radius=0, fg_color="transparent")
         self.chat_frame.grid_columnconfigure(0, weight=1)
         self.chat_frame.grid_rowconfigure(1, weight=1) # L'historique prend l'espace
+        self.performance_frame = ctk.CTkFrame(self, corner_radius=0, fg_color="transparent")
+        self.performance_frame.grid_columnconfigure(0, weight=1)
+        self.performance_frame.grid_rowconfigure(1, weight=1)
 
         # --- Création du contenu --- 
+        # Seul le tableau de bord est construit tout de suite ; les autres écrans le sont à leur première
+        # ouverture (BUDGET_LAZY_START=0 : tout construire au démarrage)
+        self.frame_builders = {"transactions": self.create_transactions_widgets, "analysis": self.create_analysis_widgets, "chat": self.create_chat_widgets,
+                               "performance": self.create_performance_widgets}
+        self.built_frames = set()
         self.create_dashboard_widgets()
-        self.create_transactions_widgets()
-        self.create_analysis_widgets()
-        self.create_chat_widgets() # Création des widgets du chat
+        self.built_frames.add("dashboard")
+        if not config.LAZY_START:
+            for name in list(self.frame_builders): self.build_frame(name)
 
         # --- Initialisation --- 
         self.select_frame_by_name("dashboard") # Afficher le tableau de bord au démarrage
         self.appearance_mode_optionemenu.set("Dark") # Thème sombre par défaut
-        self.update_category_dropdowns()
-        self.update_month_filter_dropdown()
-        self.update_transaction_list()
 
-    # Charge les données depuis le fichier JSON
+    # Charge les données depuis le fichier JSON (et rejoue le journal en mode "journal")
+    @perf.timed("load_data")
     def load_data(self):
-        if os.path.exists(self.data_file):
-            try:
-                with open(self.data_file, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
-                    # Assurer que les listes existent
-                    if "income" not in data: data["income"] = []
-                    if "expenses" not in data: data["expenses"] = []
-                    # Vérifier et convertir les montants en float si nécessaire
-                    for tx_type in ["income", "expenses"]:
-                        for tx in data[tx_type]:
-                            if isinstance(tx.get("amount"), str):
-                                try: tx["amount"] = float(tx["amount"])
-                                except ValueError: tx["amount"] = 0 # Mettre 0 si conversion impossible
-                    return data
-            except Exception as e:
-                print(f"Erreur lors du chargement des données: {e}")
-                messagebox.showerror("Erreur Chargement", f"Impossible de charger le fichier de données: {e}")
-                return {"income": [], "expenses": []} # Retourner structure vide en cas d'erreur
-        else:
-            return {"income": [], "expenses": []} # Créer structure si fichier inexistant
-
-    # Sauvegarde les données dans le fichier JSON
-    def save_data(self):
         try:
-            with open(self.data_file, 'w', encoding='utf-8') as f:
-                json.dump(self.data, f, indent=4, ensure_ascii=False)
-        except IOError as e:
-            messagebox.showerror("Erreur Sauvegarde", f"Impossible de sauvegarder les données: {e}")
+            return self.storage.load()
+        except Exception as e:
+            print(f"Erreur lors du chargement des données: {e}")
+            messagebox.showerror("Erreur Chargement", f"Impossible de charger le fichier de données: {e}")
+            return {"income": [], "expenses": []} # Retourner structure vide en cas d'erreur
+
+    # Sauvegarde les données : réécriture complète, ou ajout des modifications en fin de journal si records est fourni
+    # L'écriture se fait dans le thread d'écriture ; ses erreurs sont affichées ensuite par poll_save_errors
+    @perf.timed("save_data")
+    def save_data(self, records=None):
+        self.ledger.save(records)
+        self.schedule_save_poll()
+
+    def schedule_save_poll(self):
+        if not self.save_poll_scheduled:
+            self.save_poll_scheduled = True
+            self.after(200, self.poll_save_errors)
+
+    # Affiche les erreurs du thread d'écriture (jamais pendant l'écriture) ; les modifications non écrites restent
+    # en attente et sont réécrites à la prochaine sauvegarde ou à la fermeture
+    def poll_save_errors(self):
+        self.save_poll_scheduled = False
+        error = self.ledger.writer.take_error()
+        if error is not None:
+            messagebox.showerror("Erreur Sauvegarde", f"Impossible de sauvegarder les données: {error}\nNouvel essai à la prochaine modification.")
+        elif self.ledger.writer.busy(): self.schedule_save_poll()
+
+    # Fermeture de la fenêtre : écrit les modifications en attente avant de quitter
+    def on_closing(self):
+        while not self.ledger.writer.close():
+            error = self.ledger.writer.take_error()
+            if not messagebox.askretrycancel("Erreur Sauvegarde", f"Impossible de sauvegarder les données: {error}\n"
+                                             "Réessayer ? (Annuler ferme sans enregistrer les dernières modifications)"):
+                break
+        self.storage.close()
+        self.destroy()
+
+    # Signale une seule fois, au chargement, les transactions dont la date est invalide
+    # (elles restent enregistrées mais n'apparaissent ni dans les filtres ni dans le tableau)
+    def report_invalid_dates(self):
+        invalid = self.ledger.index.invalid_dates
+        if not invalid: return
+        for tx in invalid[:20]: print(f"Avertissement: date invalide pour la transaction {tx.get('id')}: {tx.get('date')!r}")
+        messagebox.showwarning("Dates Invalides", f"{len(invalid)} transaction(s) ont une date invalide et ne seront pas affichées dans le tableau.")
 
     # Charge les catégories depuis les dépenses existantes et ajoute les catégories par défaut
     def load_categories(self):
-        categories = set()
-        if "expenses" in self.data:
-            for expense in self.data["expenses"]:
-                if "category" in expense: categories.add(expense["category"])
+        categories = self.ledger.expense_categories()
         default_categories = ["Alimentation", "Transport", "Loyer", "Factures", "Loisirs", "Autre"]
         categories.update(default_categories)
         return sorted(list(categories))
@@ -183,20 +241,14 @@ class BudgetApp(ctk.CTk):
             filter_categories = ["Toutes"] + self.categories
             self.filter_category_combobox.configure(values=filter_categories)
             current_filter_selection = self.filter_category_var.get()
-            # Si la sélection actuelle n'est plus valide, choisir "Toutes"
+            # Si la sélection actuelle n'est plus valide, choisir "Toutes" (le filtre change : reconstruire le tableau)
             if current_filter_selection not in filter_categories:
                 self.filter_category_var.set("Toutes")
+                if hasattr(self, 'transaction_tree'): self.update_transaction_list()
 
     # Récupère la liste des mois uniques (format AAAA-MM) où des transactions existent
     def get_available_months(self):
-        months = set()
-        all_trans = self.data.get('income', []) + self.data.get('expenses', [])
-        for item in all_trans:
-            try:
-                date_obj = datetime.strptime(item['date'], '%Y-%m-%d')
-                months.add(date_obj.strftime('%Y-%m'))
-            except (ValueError, KeyError): continue # Ignorer les dates invalides ou manquantes
-        return sorted(list(months), reverse=True)
+        return self.ledger.aggregates.available_months() # Mois tenus à jour par les agrégats
 
     # Met à jour la liste déroulante des mois pour le filtre
     def update_month_filter_dropdown(self):
@@ -204,14 +256,52 @@ class BudgetApp(ctk.CTk):
             available_months = ["Tous"] + self.get_available_months()
             self.filter_month_combobox.configure(values=available_months)
             current_selection = self.filter_month_var.get()
-            # Si la sélection actuelle n'est plus valide, choisir "Tous"
+            # Si la sélection actuelle n'est plus valide, choisir "Tous" (le filtre change : reconstruire le tableau)
             if current_selection not in available_months:
                 self.filter_month_var.set("Tous")
+                if hasattr(self, 'transaction_tree'): self.update_transaction_list()
+
+    # Construit le contenu d'un écran s'il ne l'a pas encore été
+    def build_frame(self, name):
+        if name in self.built_frames: return
+        self.built_frames.add(name)
+        self.frame_builders[name]()
+
+    # Vues rafraîchies par refresh_views : nom -> (écran qui les affiche, méthode de mise à jour)
+    def view_updaters(self):
+        return {"dashboard": ("dashboard", self.update_dashboard),
+                "categories": ("transactions", self.update_category_dropdowns),
+                "month_filter": ("transactions", self.update_month_filter_dropdown),
+                "transactions": ("transactions", self.update_transaction_list),
+                "analysis": ("analysis", self.update_analysis)}
+
+    # Marque des vues à rafraîchir ; plusieurs modifications rapprochées ne donnent qu'un seul rafraîchissement
+    def mark_dirty(self, *views):
+        self.dirty_views.update(views)
+        if not self.refresh_scheduled:
+            self.refresh_scheduled = True
+            self.after_idle(self.refresh_views)
+
+    # Rafraîchit les vues marquées de l'écran affiché (ou de l'écran donné)
+    # Les vues d'un écran pas encore construit sont oubliées : il sera construit à jour
+    def refresh_views(self, frame_name=None):
+        if frame_name is None:
+            self.refresh_scheduled = False
+            frame_name = self.current_frame
+        for view, (view_frame, update) in self.view_updaters().items():
+            if view not in self.dirty_views: continue
+            if view_frame not in self.built_frames: self.dirty_views.discard(view)
+            elif view_frame == frame_name:
+                self.dirty_views.discard(view)
+                update()
 
     # Change le cadre principal affiché (Tableau de bord, Transactions, etc.)
     def select_frame_by_name(self, name):
-        buttons = {"dashboard": self.dashboard_button, "transactions": self.transactions_button, "analysis": self.analysis_button, "chat": self.chat_button}
-        frames = {"dashboard": self.dashboard_frame, "transactions": self.transactions_frame, "analysis": self.analysis_frame, "chat": self.chat_frame}
+        self.build_frame(name) # Écran construit à sa première ouverture
+        buttons = {"dashboard": self.dashboard_button, "transactions": self.transactions_button, "analysis": self.analysis_button, "chat": self.chat_button,
+                   "performance": self.performance_button}
+        frames = {"dashboard": self.dashboard_frame, "transactions": self.transactions_frame, "analysis": self.analysis_frame, "chat": self.chat_frame,
+                  "performance": self.performance_frame}
 
         # Met en surbrillance le bouton du cadre sélectionné
         for btn_name, button in buttons.items():
@@ -226,19 +316,16 @@ class BudgetApp(ctk.CTk):
             if name == frame_name: frame.grid(row=0, column=1, sticky="nsew")
             else: frame.grid_forget()
         
-        # Met à jour le contenu spécifique au cadre si nécessaire
-        if name == "transactions":
-            self.update_transaction_list()
-            self.update_month_filter_dropdown()
-            self.update_category_dropdowns()
-        if name == "dashboard": self.update_dashboard()
-        if name == "analysis": self.update_analysis()
+        # Met à jour le contenu du cadre s'il a changé pendant qu'il était caché
+        self.current_frame = name
+        self.refresh_views(name)
+        if name == "performance": self.update_performance_report()
 
     # Change le mode d'apparence (Light/Dark/System)
     def change_appearance_mode_event(self, new_appearance_mode: str):
         ctk.set_appearance_mode(new_appearance_mode)
         self.style_treeview() # Met à jour le style du tableau
-        self.update_analysis() # Redessine le graphique avec les nouvelles couleurs
+        self.mark_dirty("analysis") # Graphique redessiné avec les nouvelles couleurs (quand il est affiché)
 
     # Applique le style actuel au widget Treeview (tableau)
     def style_treeview(self):
@@ -295,9 +382,10 @@ class BudgetApp(ctk.CTk):
         self.update_dashboard() # Mettre à jour les chiffres initiaux
 
     # Met à jour les indicateurs du Tableau de Bord (Solde, Total Revenus, Total Dépenses)
+    @perf.timed("update_dashboard")
     def update_dashboard(self):
-        total_income = sum(item.get('amount', 0) for item in self.data.get('income', []))
-        total_expenses = sum(item.get('amount', 0) for item in self.data.get('expenses', []))
+        total_income = self.ledger.aggregates.total_income # Totaux précalculés
+        total_expenses = self.ledger.aggregates.total_expenses
         balance = total_income - total_expenses
         # Fonction pour formater en FCFA (sans décimales, espace comme séparateur)
         fcfa_format = lambda x: f"{x:,.0f} FCFA".replace(',', ' ')
@@ -321,6 +409,7 @@ class BudgetApp(ctk.CTk):
         ctk.CTkLabel(input_frame, text="Description:").grid(row=1, column=0, padx=(20, 5), pady=5, sticky="w")
         self.desc_entry = ctk.CTkEntry(input_frame, placeholder_text="Ex: Café, Salaire")
         self.desc_entry.grid(row=1, column=1, columnspan=3, padx=5, pady=5, sticky="ew")
+        self.desc_entry.bind("<KeyRelease>", self.suggest_category) # Catégorie proposée pendant la saisie
 
         # Montant
         ctk.CTkLabel(input_frame, text="Montant (FCFA):").grid(row=2, column=0, padx=(20, 5), pady=5, sticky="w")
@@ -335,7 +424,8 @@ class BudgetApp(ctk.CTk):
 
         # Catégorie (visible seulement pour les dépenses)
         self.category_label = ctk.CTkLabel(input_frame, text="Catégorie:")
-        self.expense_category_combobox = ctk.CTkComboBox(input_frame, values=self.categories)
+        self.expense_category_combobox = ctk.CTkComboBox(input_frame, values=self.categories, command=self.on_category_chosen)
+        self.category_chosen = False # Vrai quand l'utilisateur a choisi la catégorie : plus de suggestion automatique
         self.add_category_button = ctk.CTkButton(input_frame, text="+", width=30, command=self.add_category_dialog)
         # Placer les widgets de catégorie, seront cachés/montrés par toggle_category_field
         self.category_label.grid(row=3, column=0, padx=(20, 5), pady=5, sticky="w")
@@ -385,17 +475,27 @@ class BudgetApp(ctk.CTk):
         self.transaction_tree.grid(row=0, column=0, sticky="nsew")
 
         # Barre de défilement verticale pour le Treeview
-        scrollbar = ctk.CTkScrollbar(list_frame, command=self.transaction_tree.yview)
-        scrollbar.grid(row=0, column=1, sticky="ns")
-        self.transaction_tree.configure(yscrollcommand=scrollbar.set)
+        self.transaction_scrollbar = ctk.CTkScrollbar(list_frame, command=self.transaction_tree.yview)
+        self.transaction_scrollbar.grid(row=0, column=1, sticky="ns")
+        # Le tableau est rempli page par page : on surveille le défilement pour charger la suite
+        self.transaction_tree.configure(yscrollcommand=self.on_transaction_scroll)
         self.style_treeview() # Appliquer le style
 
-        # --- Bouton Supprimer --- 
+        # --- Import de relevé et bouton Supprimer --- 
+        import_frame = ctk.CTkFrame(self.transactions_frame, fg_color="transparent")
+        import_frame.grid(row=3, column=0, padx=20, pady=(5, 20), sticky="w") # Placé en bas à gauche
+        self.import_button = ctk.CTkButton(import_frame, text="Importer un Relevé...", command=self.import_statement)
+        self.import_button.grid(row=0, column=0)
+        # Progression de l'import (cachée en dehors d'un import)
+        self.import_progressbar = ctk.CTkProgressBar(import_frame, width=200)
+        self.import_status_label = ctk.CTkLabel(import_frame, text="")
         delete_button_frame = ctk.CTkFrame(self.transactions_frame, fg_color="transparent")
         delete_button_frame.grid(row=3, column=0, padx=20, pady=(5, 20), sticky="e") # Placé en bas à droite
         self.delete_button = ctk.CTkButton(delete_button_frame, text="Supprimer Sélection", command=self.delete_transaction, fg_color="#D32F2F", hover_color="#B71C1C")
         self.delete_button.grid(row=0, column=0)
 
+        self.update_transaction_list() # Remplir la première page du tableau
+
     # Cache ou affiche le champ catégorie selon le type de transaction
     def toggle_category_field(self, *args):
         if self.transaction_type_var.get() == "Dépense":
@@ -407,6 +507,21 @@ class BudgetApp(ctk.CTk):
             self.expense_category_combobox.grid_remove()
             self.add_category_button.grid_remove()
 
+    # Propose la catégorie de la dépense d'après la description saisie (classement automatique local)
+    # La suggestion ne remplace jamais une catégorie choisie à la main
+    def suggest_category(self, event=None):
+        if self.transaction_type_var.get() != "Dépense" or self.category_chosen: return
+        category = self.ledger.category_classifier().suggest(self.desc_entry.get())
+        if category is not None and category in self.categories:
+            self.expense_category_combobox.set(category)
+            self.category_label.configure(text="Catégorie (suggérée):")
+        else:
+            self.category_label.configure(text="Catégorie:")
+
+    def on_category_chosen(self, choice):
+        self.category_chosen = True
+        self.category_label.configure(text="Catégorie:")
+
     # Ajoute une nouvelle transaction (revenu ou dépense)
     def add_transaction(self):
         trans_type = self.transaction_type_var.get()
@@ -415,21 +530,11 @@ class BudgetApp(ctk.CTk):
         date_str = self.date_entry.get().strip()
         category = self.expense_category_combobox.get() if trans_type == "Dépense" else None
 
-        # Validation des entrées
-        if not description:
-            messagebox.showwarning("Entrée Invalide", "La description ne peut pas être vide.")
-            return
-        try:
-            amount = float(amount_str)
-            if amount <= 0:
-                raise ValueError("Le montant doit être positif.")
-        except ValueError:
-            messagebox.showwarning("Entrée Invalide", "Veuillez entrer un montant numérique valide et positif.")
-            return
+        # Validation des entrées (description, montant et date vérifiés par le registre)
         try:
-            datetime.strptime(date_str, "%Y-%m-%d")
-        except ValueError:
-            messagebox.showwarning("Entrée Invalide", "Format de date invalide. Utilisez AAAA-MM-JJ.")
+            transaction_data = Ledger.make_transaction(description, amount_str, date_str, category)
+        except LedgerError as e:
+            messagebox.showwarning("Entrée Invalide", str(e))
             return
         if trans_type == "Dépense" and not category:
              if not self.categories:
@@ -438,20 +543,18 @@ class BudgetApp(ctk.CTk):
                  messagebox.showwarning("Catégorie Manquante", "Veuillez sélectionner une catégorie pour la dépense.")
              return
 
-        # Création du dictionnaire de la transaction
-        transaction_data = {"description": description, "amount": amount, "date": date_str}
-        if trans_type == "Dépense":
-            transaction_data["category"] = category
-            self.data["expenses"].append(transaction_data)
-        else: # Revenu
-            self.data["income"].append(transaction_data)
-
-        self.save_data() # Sauvegarder les données
+        # Ajout au registre (identifiant, index et totaux), puis sauvegarde
+        data_key = "expenses" if trans_type == "Dépense" else "income"
+        # Stockage par mois : le mois de la transaction est chargé d'abord (add le ferait aussi), pour savoir
+        # s'il a apporté d'autres transactions au tableau
+        loaded = self.ledger.ensure_loaded([month_of(transaction_data["date"])])
+        records = self.ledger.add(data_key, transaction_data)
+        transaction_data = records[0]["tx"] # Transaction enregistrée, avec son identifiant
+        self.save_data(records) # Sauvegarder les données
         # Mettre à jour l'interface
-        self.update_transaction_list()
-        self.update_dashboard()
-        self.update_month_filter_dropdown()
-        self.update_analysis()
+        if loaded: self.mark_dirty("transactions") # Tout un mois arrivé en mémoire : liste refaite
+        else: self.insert_transaction_row(data_key, transaction_data) # Une seule ligne ajoutée au tableau
+        self.mark_dirty("dashboard", "month_filter", "analysis")
 
         # Vider les champs d'entrée
         self.desc_entry.delete(0, ctk.END)
@@ -459,8 +562,11 @@ class BudgetApp(ctk.CTk):
         # Réinitialiser la catégorie si c'était une dépense
         if trans_type == "Dépense" and self.categories:
             self.expense_category_combobox.set(self.categories[0])
+        self.category_chosen = False
+        self.category_label.configure(text="Catégorie:")
 
     # Supprime la ou les transactions sélectionnées dans le tableau
+    @perf.timed("delete_transaction")
     def delete_transaction(self):
         selected_items = self.transaction_tree.selection()
         if not selected_items:
@@ -471,133 +577,185 @@ class BudgetApp(ctk.CTk):
         if not confirm:
             return
 
-        items_to_delete_details = [] # Stocker les détails (type, index) des transactions à supprimer
-        transactions_deleted = 0
-
-        # Fonction pour comparer les transactions (tolérance pour float)
-        def compare_transactions(tree_vals, data_tx):
-            tree_type, tree_date, tree_desc, tree_amount_str, tree_cat = tree_vals
-            # Extraire le montant numérique de la chaîne formatée
-            amount_match = re.search(r'[\d\s,.]+', tree_amount_str.replace(' ', '').replace(',', '.'))
-            if not amount_match: return False
-            try:
-                tree_amount = float(amount_match.group(0))
-            except ValueError:
-                return False
-            
-            data_type = "Dépense" if "category" in data_tx else "Revenu"
-            data_cat = data_tx.get("category", "N/A")
-            
-            # Comparaison (attention aux floats)
-            return (
-                tree_type == data_type and
-                tree_date == data_tx.get("date") and
-                tree_desc == data_tx.get("description") and
-                abs(tree_amount - data_tx.get("amount", 0.0)) < 0.001 and # Tolérance pour float
-                tree_cat == data_cat
-            )
-
-        # Parcourir les éléments sélectionnés dans le Treeview pour identifier les transactions dans les données
-        all_data_indices_to_delete = {'income': [], 'expenses': []}
-        processed_tree_items = set()
-
-        for item_id in selected_items:
-            if item_id in processed_tree_items: continue # Eviter double traitement si sélection multiple identique
-            values = self.transaction_tree.item(item_id, "values")
-            trans_type = values[0]
-            data_list_key = 'expenses' if trans_type == "Dépense" else 'income'
-            data_list = self.data[data_list_key]
-            found = False
-            
-            # Chercher l'index correspondant dans la liste de données
-            for i, transaction in enumerate(data_list):
-                 # Vérifier si cette transaction n'est pas déjà marquée pour suppression
-                 # et si elle correspond aux valeurs du Treeview
-                 if i not in all_data_indices_to_delete[data_list_key] and compare_transactions(values, transaction):
-                    all_data_indices_to_delete[data_list_key].append(i)
-                    processed_tree_items.add(item_id)
-                    found = True
-                    break # Passer à l'élément sélectionné suivant
-            
-            if not found:
-                 print(f"Avertissement: Transaction non trouvée dans les données pour {values}")
-
-        # Supprimer les transactions des données en commençant par la fin pour éviter les problèmes d'index
-        for data_key, indices in all_data_indices_to_delete.items():
-            if indices:
-                indices.sort(reverse=True)
-                data_list_to_modify = self.data[data_key]
-                for index in indices:
-                    if 0 <= index < len(data_list_to_modify):
-                        del data_list_to_modify[index]
-                        transactions_deleted += 1
-                    else:
-                        print(f"Erreur: Index {index} hors limites pour la suppression dans {data_key}.")
-
-        if transactions_deleted > 0:
-            self.save_data() # Sauvegarder les changements
+        # Les lignes du tableau ont pour iid l'identifiant de la transaction : suppression directe par l'index
+        removed, records = self.ledger.delete([int(item_id) for item_id in selected_items])
+
+        if removed:
+            self.save_data(records) # Sauvegarder les changements
             # Mettre à jour l'interface
-            self.update_transaction_list()
-            self.update_dashboard()
-            self.update_analysis()
-            messagebox.showinfo("Succès", f"{transactions_deleted} transaction(s) supprimée(s).")
-        elif not processed_tree_items and selected_items: # Si on a sélectionné qqch mais rien trouvé
+            self.remove_transaction_rows(removed) # Seules les lignes supprimées sont retirées du tableau
+            self.mark_dirty("dashboard", "month_filter", "analysis")
+            messagebox.showinfo("Succès", f"{len(removed)} transaction(s) supprimée(s).")
+        else: # Si on a sélectionné qqch mais rien trouvé
              messagebox.showerror("Erreur", "Impossible de trouver les transactions sélectionnées dans les données.")
-        # Ne rien faire si aucune transaction n'a été supprimée (cas où found=False pour tous)
+
+    # Importe un relevé bancaire (CSV ou OFX) : le fichier est lu et validé dans un thread, la progression
+    # est suivie par poll_statement_import, puis tout est ajouté et enregistré en une seule fois
+    def import_statement(self):
+        from tkinter import filedialog
+        from importer import StatementImport
+        path = filedialog.askopenfilename(title="Importer un relevé", filetypes=[("Relevés", "*.csv *.ofx *.qfx"), ("CSV", "*.csv"), ("OFX", "*.ofx *.qfx")])
+        if not path: return
+        skip_duplicates = messagebox.askyesno("Doublons", "Ignorer les transactions déjà présentes (même date, montant et description) ?")
+        # Copie des listes (rapide) : le thread compare avec les transactions existantes sans toucher au registre
+        existing = None
+        if skip_duplicates:
+            self.ledger.ensure_loaded() # Stockage par mois : comparer avec tous les mois
+            existing = [("income", tx) for tx in self.ledger.data["income"]] + [("expenses", tx) for tx in self.ledger.data["expenses"]]
+        # Le classement automatique est appris ici (thread principal) ; le thread d'import ne fait que le lire
+        self.statement_import = StatementImport(path, existing, self.ledger.category_classifier())
+        self.statement_import.start()
+        self.import_button.configure(state="disabled")
+        self.import_progressbar.set(0)
+        self.import_progressbar.grid(row=0, column=1, padx=(10, 5))
+        self.import_status_label.configure(text="Lecture du relevé...")
+        self.import_status_label.grid(row=0, column=2, padx=5)
+        self.after(100, self.poll_statement_import)
+
+    # Suit l'import en cours ; à la fin, ajoute les transactions en un lot, une sauvegarde et un seul rafraîchissement
+    def poll_statement_import(self):
+        fraction, result, error = self.statement_import.poll()
+        if fraction is not None: self.import_progressbar.set(fraction)
+        if result is None and error is None:
+            self.after(100, self.poll_statement_import)
+            return
+        self.statement_import = None
+        self.import_button.configure(state="normal")
+        self.import_progressbar.grid_remove()
+        self.import_status_label.grid_remove()
+        if error is not None:
+            messagebox.showerror("Erreur d'Import", f"Impossible d'importer le relevé: {error}")
+            return
+        if result.transactions:
+            added, records = self.ledger.add_many(result.transactions)
+            self.save_data(records) # Une seule écriture pour tout le relevé
+            self.categories = self.load_categories() # Catégories éventuellement apportées par le relevé
+            self.mark_dirty("categories", "transactions", "dashboard", "month_filter", "analysis")
+        summary = f"{len(result.transactions)} transaction(s) importée(s)."
+        if result.classified: summary += f"\n{result.classified} dépense(s) classée(s) automatiquement."
+        if result.duplicates: summary += f"\n{result.duplicates} doublon(s) ignoré(s)."
+        if result.errors:
+            summary += f"\n{len(result.errors)} ligne(s) invalide(s) ignorée(s) :"
+            summary += "".join(f"\n  - ligne {line}: {message}" for line, message in result.errors[:10])
+            if len(result.errors) > 10: summary += "\n  ..."
+        messagebox.showinfo("Import Terminé", summary)
 
     # Appelé quand un filtre est modifié
     def apply_filters(self, *args):
         self.update_transaction_list()
 
+    # Clés de tri (voir ledger.sort_key) des transactions du mois et de la catégorie choisis, de la plus récente
+    # à la plus ancienne ; lues directement dans les index secondaires, sans parcourir ni copier les transactions
+    # Stockage par mois : le mois choisi est chargé ; sans filtre de mois, seuls les mois récents nécessaires
+    # à la première page (les suivants sont chargés pendant le défilement, voir load_more_transaction_rows)
+    def filter_transactions(self, selected_month, selected_category):
+        month = None if selected_month == "Tous" else selected_month
+        category = None if selected_category == "Toutes" else selected_category
+        if month is not None: self.ledger.ensure_loaded([month])
+        else: self.ledger.load_recent(config.TRANSACTION_PAGE_SIZE, category)
+        return self.ledger.query(month=month, category=category)
+
+    # Vrai s'il reste des lignes à afficher : déjà filtrées, ou dans des mois pas encore chargés
+    def more_transaction_rows(self):
+        if self.loaded_row_count < len(self.visible_keys): return True
+        category = self.filter_category_var.get()
+        return self.filter_month_var.get() == "Tous" and self.ledger.has_unloaded(None if category == "Toutes" else category)
+
     # Met à jour le contenu du tableau des transactions en fonction des filtres
+    # Seule la première page est insérée dans le Treeview ; les suivantes sont ajoutées pendant le défilement
+    @perf.timed("update_transaction_list")
     def update_transaction_list(self):
-        # Vider le tableau actuel
-        for item in self.transaction_tree.get_children(): self.transaction_tree.delete(item)
-
-        # Combiner revenus et dépenses pour le filtrage et l'affichage
-        all_transactions = [] 
-        for item in self.data.get('income', []): all_transactions.append({**item, 'type': 'Revenu', 'category': 'N/A'}) # Ajouter type et catégorie N/A pour revenus
-        for item in self.data.get('expenses', []): all_transactions.append({**item, 'type': 'Dépense'}) # Type déjà implicite
-        
-        selected_month = self.filter_month_var.get()
-        selected_category = self.filter_category_var.get()
-
-        # Filtrer les transactions
-        filtered_transactions = []
-        for item in all_transactions:
-            try:
-                item_date = datetime.strptime(item['date'], '%Y-%m-%d')
-                item_month = item_date.strftime('%Y-%m')
-            except (ValueError, KeyError): continue # Ignorer si date invalide
-
-            # Vérifier correspondance mois
-            month_match = (selected_month == "Tous" or item_month == selected_month)
-            # Vérifier correspondance catégorie
-            category_match = (selected_category == "Toutes" or 
-                             (item['type'] == 'Dépense' and item.get('category') == selected_category) or 
-                             (item['type'] == 'Revenu' and selected_category == "Toutes")) # Les revenus matchent si filtre "Toutes"
-
-            if month_match and category_match: filtered_transactions.append(item)
-
-        # Trier les transactions filtrées par date (plus récentes en premier)
-        try: filtered_transactions.sort(key=lambda x: datetime.strptime(x['date'], '%Y-%m-%d'), reverse=True)
-        except ValueError:
-            print("Erreur lors du tri des transactions par date.")
-            messagebox.showerror("Erreur Interne", "Impossible de trier les transactions.")
-
-        # Remplir le tableau avec les transactions filtrées et triées
+        # Vider le tableau actuel (en un seul appel)
+        self.transaction_tree.delete(*self.transaction_tree.get_children())
+
+        self.visible_keys = self.filter_transactions(self.filter_month_var.get(), self.filter_category_var.get())
+        self.loaded_row_count = 0
+        self.load_more_transaction_rows() # Remplir la première page
+        self.transaction_tree.yview_moveto(0)
+
+    # Appelé par le Treeview quand la zone visible change : met à jour la barre de défilement
+    # et charge la page suivante quand on approche du bas des lignes déjà insérées
+    def on_transaction_scroll(self, first, last):
+        self.transaction_scrollbar.set(first, last)
+        if float(last) >= 0.9 and not self.page_load_pending and self.more_transaction_rows():
+            self.page_load_pending = True
+            self.after_idle(self.load_more_transaction_rows)
+
+    # Valeurs affichées dans le tableau pour une transaction
+    @staticmethod
+    def transaction_row_values(data_key, item):
         fcfa_format = lambda x: f"{x:,.0f} FCFA".replace(',', ' ')
-        for i, item in enumerate(filtered_transactions):
+        if data_key == 'expenses':
+            return ("Dépense", item['date'], item['description'], fcfa_format(item['amount']), item.get('category', 'N/A'))
+        return ("Revenu", item['date'], item['description'], fcfa_format(item['amount']), 'N/A')
+
+    # Insère la page suivante des transactions filtrées dans le tableau
+    def load_more_transaction_rows(self):
+        self.page_load_pending = False
+        start = self.loaded_row_count
+        # Stockage par mois, sans filtre de mois : charger les mois plus anciens nécessaires à cette page
+        # Ils sont plus anciens que toutes les lignes déjà affichées : celles-ci gardent leur position
+        if self.filter_month_var.get() == "Tous":
+            category = self.filter_category_var.get()
+            if self.ledger.load_recent(start + config.TRANSACTION_PAGE_SIZE, None if category == "Toutes" else category):
+                self.visible_keys = self.filter_transactions(self.filter_month_var.get(), category)
+        end = min(start + config.TRANSACTION_PAGE_SIZE, len(self.visible_keys))
+        for i in range(start, end):
+            tx_id = id_of_key(self.visible_keys[i])
+            data_key, item = self.ledger.get(tx_id)
             tag = 'evenrow' if i % 2 == 0 else 'oddrow' # Appliquer style alterné
-            self.transaction_tree.insert("", "end", values=(
-                item['type'], 
-                item['date'], 
-                item['description'], 
-                fcfa_format(item['amount']), 
-                item.get('category', 'N/A') # Utiliser N/A si catégorie absente
-            ), tags=(tag,))
-        
-        self.style_treeview() # Réappliquer le style (utile si thème change)
+            self.transaction_tree.insert("", "end", iid=str(tx_id), values=self.transaction_row_values(data_key, item), tags=(tag,))
+        self.loaded_row_count = end
+
+    # Position d'une clé dans self.visible_keys (triée par ordre décroissant), par recherche dichotomique
+    def find_visible_position(self, key):
+        low, high = 0, len(self.visible_keys)
+        while low < high:
+            middle = (low + high) // 2
+            if self.visible_keys[middle] > key: low = middle + 1
+            else: high = middle
+        return low
+
+    # Réapplique les couleurs alternées aux lignes insérées à partir de la position start (leur parité a changé)
+    def retag_transaction_rows(self, start):
+        for i in range(start, self.loaded_row_count):
+            tag = 'evenrow' if i % 2 == 0 else 'oddrow'
+            self.transaction_tree.item(str(id_of_key(self.visible_keys[i])), tags=(tag,))
+
+    # Ajoute une nouvelle transaction au tableau à sa place (tri par date), sans reconstruire le tableau
+    def insert_transaction_row(self, data_key, transaction):
+        selected_month = self.filter_month_var.get()
+        selected_category = self.filter_category_var.get()
+        if selected_month != "Tous" and month_of(transaction['date']) != selected_month: return
+        if selected_category != "Toutes" and transaction.get('category') != selected_category: return
+
+        key = self.ledger.index.key_of(transaction)
+        position = self.find_visible_position(key)
+        # La ligne n'est insérée dans le Treeview que si elle tombe dans les pages déjà chargées
+        materialize = position < self.loaded_row_count or self.loaded_row_count == len(self.visible_keys)
+        self.visible_keys.insert(position, key)
+        if materialize:
+            self.transaction_tree.insert("", position, iid=str(transaction['id']), values=self.transaction_row_values(data_key, transaction))
+            self.loaded_row_count += 1
+            self.retag_transaction_rows(position)
+
+    # Retire du tableau les transactions supprimées (liste de (type, transaction)), sans reconstruire le tableau
+    def remove_transaction_rows(self, removed):
+        positions = []
+        for data_key, transaction in removed:
+            parsed_date = parse_date(transaction.get('date'))
+            if parsed_date is None: continue # Jamais affichée
+            key = sort_key(parsed_date[0], transaction['id'])
+            position = self.find_visible_position(key)
+            if position < len(self.visible_keys) and self.visible_keys[position] == key:
+                positions.append(position)
+        if not positions: return
+        existing_rows = [str(id_of_key(self.visible_keys[p])) for p in positions if p < self.loaded_row_count]
+        self.transaction_tree.delete(*existing_rows)
+        for position in sorted(positions, reverse=True):
+            del self.visible_keys[position]
+        self.loaded_row_count -= len(existing_rows)
+        self.retag_transaction_rows(min(positions))
 
     # Widgets de l'écran Analyse
     def create_analysis_widgets(self):
@@ -625,31 +783,35 @@ class BudgetApp(ctk.CTk):
         # Label initial qui sera remplacé par le graphique
         self.chart_label = ctk.CTkLabel(self.analysis_chart_frame, text="Chargement du graphique...")
         self.chart_label.grid(row=0, column=0, padx=10, pady=10, sticky="nsew")
+        if config.CHART_RENDERING == "background":
+            from charts import BackgroundChartRenderer # Importe matplotlib (première ouverture de l'écran Analyse)
+            self.chart_renderer = BackgroundChartRenderer()
+            # L'image rendue a une taille fixe : nouveau rendu quand la zone change de taille
+            self.analysis_chart_frame.bind("<Configure>", lambda event: self.after_idle(self.update_analysis))
 
         self.update_analysis() # Générer l'analyse initiale
 
     # Met à jour le texte et le graphique de l'analyse des dépenses
+    # Rien n'est refait si les données, le thème et la taille de la zone sont les mêmes qu'au dernier affichage
+    @perf.timed("update_analysis")
     def update_analysis(self):
-        expenses = self.data.get('expenses', [])
-        if not expenses:
+        if "analysis" not in self.built_frames: return # Écran pas encore ouvert : l'analyse sera faite à son ouverture
+        render_key = (self.ledger.aggregates.version, ctk.get_appearance_mode(),
+                      self.analysis_chart_frame.winfo_width(), self.analysis_chart_frame.winfo_height())
+        if render_key == self.analysis_render_key: return
+        self.analysis_render_key = render_key
+
+        # Total dépensé par catégorie, tenu à jour par les agrégats
+        category_spending = self.ledger.aggregates.category_totals
+
+        if not self.ledger.aggregates.expense_count or not category_spending:
             self.analysis_results_label.configure(text="Aucune dépense enregistrée pour l'analyse.")
-            # Nettoyer le graphique précédent s'il existe
-            if self.analysis_chart_widget: self.analysis_chart_widget.get_tk_widget().destroy(); self.analysis_chart_widget = None
+            # Cacher le graphique précédent s'il existe (il est conservé pour le prochain affichage)
+            if self.chart_renderer: self.chart_renderer.cancel() # Un rendu en cours n'a plus lieu d'être affiché
+            if self.analysis_chart_widget: self.analysis_chart_widget.grid_remove()
             self.chart_label.configure(text="Pas de données pour le graphique.", image=None); self.chart_label.grid() # Afficher message
             return
 
-        # Calculer le total dépensé par catégorie
-        category_spending = defaultdict(float)
-        for expense in expenses:
-            category = expense.get('category', 'Non Catégorisé') # Utiliser 'Non Catégorisé' si absent
-            category_spending[category] += expense.get('amount', 0)
-
-        if not category_spending:
-             self.analysis_results_label.configure(text="Aucune dépense avec catégorie trouvée.")
-             if self.analysis_chart_widget: self.analysis_chart_widget.get_tk_widget().destroy(); self.analysis_chart_widget = None
-             self.chart_label.configure(text="Pas de données pour le graphique.", image=None); self.chart_label.grid()
-             return
-
         # --- Générer le résumé textuel --- 
         top_category = max(category_spending, key=category_spending.get)
         top_amount = category_spending[top_category]
@@ -664,63 +826,65 @@ class BudgetApp(ctk.CTk):
             analysis_text += f"  - {category}: {fcfa_format(amount)}\n"
         self.analysis_results_label.configure(text=analysis_text)
 
-        # --- Générer le graphique camembert --- 
-        labels = list(category_spending.keys())
-        sizes = list(category_spending.values())
-        
-        # Détruire l'ancien widget graphique s'il existe
-        if self.analysis_chart_widget: self.analysis_chart_widget.get_tk_widget().destroy(); self.analysis_chart_widget = None
-
+        # --- Mettre à jour le graphique camembert --- 
+        labels, sizes = list(category_spending.keys()), list(category_spending.values())
         try:
-            theme = ctk.get_appearance_mode()
-            # Définir les couleurs Matplotlib en fonction du thème CTk
-            if theme == "Dark":
-                bg_color = "#2b2b2b" # Couleur de fond sombre
-                text_color = "#ffffff" # Couleur de texte claire
-                pie_text_color = "white"
-                plt.style.use('dark_background') # Style Matplotlib sombre
-            else: # Light or System (assume light for System)
-                bg_color = "#ebebeb" # Couleur de fond claire
-                text_color = "#000000" # Couleur de texte sombre
-                pie_text_color = "black"
-                plt.style.use('seaborn-v0_8-pastel') # Style Matplotlib clair
-
-            fig, ax = plt.subplots(figsize=(5, 4), dpi=100)
-            fig.patch.set_facecolor(bg_color) # Couleur de fond de la figure
-            ax.set_facecolor(bg_color) # Couleur de fond des axes
-
-            # Créer le camembert
-            wedges, texts, autotexts = ax.pie(sizes, labels=None, autopct='%1.1f%%', startangle=90, pctdistance=0.85)
-            # Ajouter un cercle au centre pour faire un donut chart
-            centre_circle = plt.Circle((0,0),0.70,fc=bg_color); fig.gca().add_artist(centre_circle)
-
-            # Configurer la couleur du texte des pourcentages
-            for autotext in autotexts: autotext.set_color(pie_text_color); autotext.set_fontsize(9)
-
-            ax.axis('equal') # Assure que le camembert est un cercle
-            # Ajouter une légende
-            legend = ax.legend(wedges, labels, title="Catégories", loc="center left", bbox_to_anchor=(1.05, 0.5), fontsize=10)
-            plt.setp(legend.get_texts(), color=text_color)
-            plt.setp(legend.get_title(), color=text_color)
-            legend.get_frame().set_facecolor(bg_color)
-            legend.get_frame().set_edgecolor(text_color)
-            
-            plt.title("Répartition des Dépenses", color=text_color)
-            plt.tight_layout(rect=[0, 0, 0.85, 1]) # Ajuster layout pour la légende
-
-            # Intégrer le graphique dans Tkinter
-            canvas = FigureCanvasTkAgg(fig, master=self.analysis_chart_frame)
-            canvas.draw()
-            self.analysis_chart_widget = canvas
-            canvas.get_tk_widget().grid(row=0, column=0, padx=10, pady=10, sticky="nsew")
+            if self.chart_renderer:
+                self.request_chart_render(labels, sizes) # Affiché plus tard par poll_chart_render
+                return
+            self.draw_analysis_chart(labels, sizes)
+            self.analysis_chart_widget.grid(row=0, column=0, padx=10, pady=10, sticky="nsew")
             self.chart_label.grid_forget() # Cacher le label initial
-            plt.close(fig) # Fermer la figure matplotlib pour libérer la mémoire
-
         except Exception as e:
+            self.analysis_render_key = None # Réessayer au prochain affichage
             print(f"Erreur lors de la génération du graphique: {e}")
             messagebox.showerror("Erreur Graphique", f"Impossible de générer le graphique: {e}")
             self.chart_label.configure(text="Erreur graphique."); self.chart_label.grid() # Afficher message d'erreur
 
+    # Dessine le donut sur la figure unique, créée au premier appel puis réutilisée (mode "inline")
+    def draw_analysis_chart(self, labels, sizes):
+        if self.analysis_chart is None:
+            from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
+            from charts import DonutChart
+            self.analysis_chart = DonutChart(figsize=(5, 4), dpi=100)
+            self.analysis_canvas = FigureCanvasTkAgg(self.analysis_chart.figure, master=self.analysis_chart_frame)
+            self.analysis_chart_widget = self.analysis_canvas.get_tk_widget()
+        self.analysis_chart.update(labels, sizes, ctk.get_appearance_mode())
+        self.analysis_canvas.draw_idle()
+
+    # Mode "background" : envoie la demande de rendu au thread (à la taille actuelle de la zone du graphique)
+    # et surveille l'arrivée de l'image depuis la boucle Tk
+    def request_chart_render(self, labels, sizes):
+        width = self.analysis_chart_frame.winfo_width() - 20 # Marges padx/pady du widget
+        height = self.analysis_chart_frame.winfo_height() - 20
+        if width < 100 or height < 100: width, height = 500, 400 # Zone pas encore affichée : taille par défaut
+        self.chart_renderer.submit(labels, sizes, ctk.get_appearance_mode(), width, height)
+        self.schedule_chart_poll()
+
+    def schedule_chart_poll(self):
+        if not self.chart_poll_scheduled:
+            self.chart_poll_scheduled = True
+            self.after(30, self.poll_chart_render)
+
+    # Affiche l'image rendue par le thread dès qu'elle est prête (les images obsolètes sont ignorées)
+    def poll_chart_render(self):
+        self.chart_poll_scheduled = False
+        from PIL import Image, ImageTk
+        from charts import chart_theme_colors
+        image = self.chart_renderer.poll()
+        if image is None:
+            if self.chart_renderer.busy(): self.schedule_chart_poll()
+            return
+        width, height, rgba = image
+        self.chart_photo = ImageTk.PhotoImage(Image.frombuffer("RGBA", (width, height), rgba, "raw", "RGBA", 0, 1))
+        if self.analysis_chart_widget is None:
+            self.analysis_chart_widget = tkinter.Label(self.analysis_chart_frame, borderwidth=0, highlightthickness=0)
+        bg_color = chart_theme_colors(ctk.get_appearance_mode())[0]
+        self.analysis_chart_widget.configure(image=self.chart_photo, bg=bg_color)
+        self.analysis_chart_widget.grid(row=0, column=0, padx=10, pady=10, sticky="nsew")
+        self.chart_label.grid_forget() # Cacher le label initial
+        if self.chart_renderer.busy(): self.schedule_chart_poll()
+
     # Widgets de l'écran Chat IA
     def create_chat_widgets(self):
         chat_container = ctk.CTkFrame(self.chat_frame)
@@ -750,6 +914,10 @@ class BudgetApp(ctk.CTk):
         self.send_button = ctk.CTkButton(chat_container, text="Envoyer", command=self.send_chat_message_event)
         self.send_button.grid(row=2, column=2, padx=(5,10), pady=(0,10))
 
+        # État de la réponse en cours (délai avant le premier morceau reçu)
+        self.chat_status_label = ctk.CTkLabel(chat_container, text="", font=ctk.CTkFont(size=10), text_color="gray")
+        self.chat_status_label.grid(row=3, column=0, columnspan=3, padx=10, pady=(0,10), sticky="w")
+
         # Note indiquant que la logique IA n'est pas implémentée (supprimée ou commentée)
         # note_label = ctk.CTkLabel(chat_container, text="Note : La logique de discussion avec l'API doit être implémentée.", font=ctk.CTkFont(size=10), text_color="gray")
         # note_label.grid(row=3, column=0, columnspan=3, padx=10, pady=(0,10), sticky="w")
@@ -767,97 +935,181 @@ class BudgetApp(ctk.CTk):
         self.chat_history.configure(state="disabled")
         self.chat_history.see(ctk.END)
 
+    # Ajoute un morceau de texte à la fin de l'historique du chat (réponse reçue en flux)
+    def append_to_chat_history(self, text):
+        self.chat_history.configure(state="normal")
+        self.chat_history.insert(ctk.END, text)
+        self.chat_history.configure(state="disabled")
+        self.chat_history.see(ctk.END)
+
     # Gère l'événement d'envoi (bouton ou touche Entrée)
     def send_chat_message_event(self, event=None):
         user_message = self.user_input.get().strip()
         if not user_message:
             return
-        
+        from chat_client import ChatClient, ChatRequest # Importé au premier message (requests est long à charger)
+        from chat_cache import ResponseCache
+        if self.chat_client is None:
+            self.chat_client = ChatClient(self.openrouter_api_key)
+            cache_path = os.path.join(os.path.dirname(self.data_file), "chat_cache.json") if config.CHAT_CACHE_PERSIST else None
+            self.chat_cache = ResponseCache(path=cache_path)
+        # Un nouveau message remplace la réponse en cours : la requête est annulée
+        if self.chat_queue is not None: self.cancel_chat_message()
+
         # Effacer le champ d'entrée immédiatement après l'envoi
         self.user_input.delete(0, ctk.END)
-        
-        # Lancer l'appel API dans un thread séparé
-        thread = threading.Thread(target=self.process_chat_message, args=(user_message,))
-        thread.start()
-
-    # Traite le message utilisateur et appelle l'API OpenRouter avec DeepSeek
-    def process_chat_message(self, user_message):
-        # Désactiver les widgets d'entrée pendant le traitement
-        self.user_input.configure(state="disabled")
-        self.send_button.configure(state="disabled")
         self.add_to_chat_history("Vous", user_message)
-        # La ligne d'effacement du champ a été déplacée dans send_chat_message_event
+        self.chat_status_label.configure(text="En attente de la réponse...")
+
+        # Ajouter le message utilisateur à l'historique pour l'API
+        self.chat_history_list.append({"role": "user", "content": user_message})
+        # Préparer les messages pour l'API : message système avec le résumé du budget, puis les derniers
+        # échanges qui tiennent dans le budget de tokens
+        from chat_context import SYSTEM_PROMPT, build_messages, ledger_digest
+        fingerprint = self.ledger.aggregates.fingerprint()
+        if self.chat_digest is None or self.chat_digest[0] != fingerprint: # Résumé recalculé seulement si les données ont changé
+            self.chat_digest = (fingerprint, ledger_digest(self.ledger.aggregates))
+        messages_for_api = build_messages(SYSTEM_PROMPT, self.chat_history_list, config.CHAT_CONTEXT_TOKENS, self.chat_digest[1])
+
+        # Même conversation, même modèle et mêmes données : la réponse déjà reçue est affichée sans appel à l'API
+        self.chat_cache_key = ResponseCache.make_key(messages_for_api, self.chat_client.model, fingerprint)
+        cached_reply = self.chat_cache.get(self.chat_cache_key)
+        if cached_reply is not None:
+            self.add_to_chat_history("Assistant", cached_reply)
+            self.remember_chat_reply(cached_reply)
+            self.chat_status_label.configure(text="Réponse instantanée (déjà reçue pour cette question)")
+            return
 
+        # Lancer l'appel API dans un thread séparé ; il ne touche jamais aux widgets :
+        # tout passe par chat_queue, vidée par drain_chat_queue dans la boucle principale
+        self.chat_queue = queue.Queue()
+        self.chat_request = ChatRequest()
+        self.chat_sent_at = time.perf_counter()
+        self.chat_reply_parts = []
+        thread = threading.Thread(target=self.process_chat_message, args=(messages_for_api, self.chat_request, self.chat_queue), daemon=True)
+        thread.start()
+        self.after(30, self.drain_chat_queue, self.chat_queue)
+
+    # Appelle l'API OpenRouter avec DeepSeek (dans un thread) ; la réponse arrive en flux
+    # Événements envoyés : ("delta", texte), ("retry", texte d'état), ("done", None),
+    # ("error", (titre, message, texte pour l'historique)) ; rien après une annulation
+    def process_chat_message(self, messages_for_api, request, events):
+        import requests
+        from chat_client import ChatCancelled, ChatError
+        on_retry = lambda attempt, delay, reason: events.put(("retry", f"API indisponible ({reason}), nouvel essai {attempt} dans {delay:.1f} s..."))
         try:
-            # Ajouter le message utilisateur à l'historique pour l'API
-            self.chat_history_list.append({"role": "user", "content": user_message})
-            
-            # Préparer les messages pour l'API (inclure un message système)
-            messages_for_api = [
-                {"role": "system", "content": "Tu es un assistant utile intégré à une application de suivi de budget. Réponds de manière concise et pertinente aux questions des utilisateurs, potentiellement liées à la gestion de budget ou à des sujets généraux."}
-            ] + self.chat_history_list
-
-            # Configuration de la requête pour OpenRouter avec DeepSeek
-            url = "https://openrouter.ai/api/v1/chat/completions"
-            headers = {
-                "Authorization": f"Bearer {self.openrouter_api_key}",
-                "Content-Type": "application/json",
-                "HTTP-Referer": "budget_tracker_app",  # Identifiant de l'application
-                "X-Title": "Budget Tracker"  # Nom de l'application
-            }
-            
-            # Préparation des données pour la requête
-            data = {
-                "model": "deepseek/deepseek-r1-0528",
-                "messages": messages_for_api,
-                "max_tokens": 1000  # Limitation nécessaire malgré la clé "unlimited"
-            }
-            
-            # Appel à l'API OpenRouter
-            response = requests.post(
-                url=url,
-                headers=headers,
-                data=json.dumps(data)
-            )
-            
-            # Vérification de la réponse
-            if response.status_code == 200:
-                response_data = response.json()
-                ai_message = response_data["choices"][0]["message"]["content"].strip()
-                
-                # Ajouter la réponse de l'IA à l'historique local et API
-                self.add_to_chat_history("Assistant", ai_message)
-                self.chat_history_list.append({"role": "assistant", "content": ai_message})
-                
-                # Limiter la taille de l'historique pour éviter de dépasser les limites de tokens
-                MAX_HISTORY_MESSAGES = 10 
-                if len(self.chat_history_list) > MAX_HISTORY_MESSAGES:
-                    self.chat_history_list = self.chat_history_list[-MAX_HISTORY_MESSAGES:]
+            with perf.measure("chat_round_trip"):
+                for text in self.chat_client.stream_chat(messages_for_api, request, on_retry):
+                    events.put(("delta", text))
+            events.put(("done", None))
+        except ChatCancelled:
+            pass
+        except ChatError as e:
+            events.put(("error", ("Erreur API", str(e), f"Erreur: {e}")))
+        except requests.exceptions.RequestException as e:
+            events.put(("error", ("Erreur Connexion API", f"Impossible de se connecter à l'API OpenRouter: {e}", "Erreur de connexion API.")))
+        except Exception as e:
+            print(f"Erreur API inattendue: {e}")
+            events.put(("error", ("Erreur Inconnue", f"Une erreur inattendue est survenue: {e}", f"Erreur inattendue: {e}")))
+
+    # Affiche dans l'historique les morceaux de réponse reçus depuis le dernier passage (boucle principale)
+    # events est la file de la requête qui a lancé cette boucle : elle s'arrête si la requête a été remplacée
+    def drain_chat_queue(self, events):
+        while events is self.chat_queue:
+            try: kind, value = events.get_nowait()
+            except queue.Empty: break
+            if kind == "retry":
+                self.chat_status_label.configure(text=value)
+            elif kind == "delta":
+                if not self.chat_reply_parts:
+                    # Premier morceau : c'est le délai ressenti par l'utilisateur
+                    first_token = time.perf_counter() - self.chat_sent_at
+                    if perf.enabled(): perf.record("chat_first_token", first_token)
+                    self.chat_status_label.configure(text=f"Première réponse en {first_token:.1f} s")
+                    self.append_to_chat_history("Assistant: ")
+                self.chat_reply_parts.append(value)
+                self.append_to_chat_history(value)
+            elif kind == "done":
+                ai_message = "".join(self.chat_reply_parts).strip()
+                self.append_to_chat_history("\n\n" if self.chat_reply_parts else "Assistant: (réponse vide)\n\n")
+                if ai_message: self.chat_cache.put(self.chat_cache_key, ai_message)
+                self.remember_chat_reply(ai_message)
+                self.finish_chat_message()
+                return
             else:
-                error_message = f"Erreur API (code {response.status_code}): {response.text}"
-                messagebox.showerror("Erreur API", error_message)
-                self.add_to_chat_history("Système", f"Erreur: {error_message}")
+                title, message, history_text = value
+                if self.chat_reply_parts: self.append_to_chat_history("\n\n") # Réponse interrompue
+                self.chat_status_label.configure(text="")
+                messagebox.showerror(title, message)
+                self.add_to_chat_history("Système", history_text)
                 # Retirer le dernier message utilisateur de l'historique API car il a échoué
                 if self.chat_history_list and self.chat_history_list[-1]["role"] == "user":
                     self.chat_history_list.pop()
-
-        except requests.exceptions.RequestException as e:
-            messagebox.showerror("Erreur Connexion API", f"Impossible de se connecter à l'API OpenRouter: {e}")
-            self.add_to_chat_history("Système", f"Erreur de connexion API.")
-            if self.chat_history_list and self.chat_history_list[-1]["role"] == "user":
-                self.chat_history_list.pop()
-        except Exception as e:
-            messagebox.showerror("Erreur Inconnue", f"Une erreur inattendue est survenue: {e}")
-            self.add_to_chat_history("Système", f"Erreur inattendue: {e}")
-            print(f"Erreur API inattendue: {e}")
+                self.finish_chat_message()
+                return
+        if events is self.chat_queue: self.after(30, self.drain_chat_queue, events)
+
+    # Ajoute la réponse de l'IA à l'historique API
+    def remember_chat_reply(self, ai_message):
+        self.chat_history_list.append({"role": "assistant", "content": ai_message})
+        # L'historique envoyé est limité par build_messages (budget de tokens) ; ici, on borne seulement la mémoire
+        MAX_HISTORY_MESSAGES = 200
+        if len(self.chat_history_list) > MAX_HISTORY_MESSAGES:
+            self.chat_history_list = self.chat_history_list[-MAX_HISTORY_MESSAGES:]
+
+    # Annule la réponse en cours : la partie déjà reçue est gardée dans l'historique
+    def cancel_chat_message(self):
+        self.chat_request.cancel()
+        if self.chat_reply_parts:
+            self.append_to_chat_history(" [interrompu]\n\n")
+            self.remember_chat_reply("".join(self.chat_reply_parts).strip())
+        else:
+            self.add_to_chat_history("Système", "Réponse annulée.")
             if self.chat_history_list and self.chat_history_list[-1]["role"] == "user":
                 self.chat_history_list.pop()
-        finally:
-            # Réactiver les widgets d'entrée
-            self.user_input.configure(state="normal")
-            self.send_button.configure(state="normal")
-            # Remettre le focus sur le champ d'entrée
-            self.user_input.focus()
+        self.finish_chat_message()
+
+    # Fin d'un échange : la requête n'est plus suivie, le focus revient sur le champ d'entrée
+    def finish_chat_message(self):
+        self.chat_queue = None
+        self.chat_request = None
+        self.user_input.focus()
+
+    # Widgets de l'écran Performance (visible seulement quand les mesures sont activées)
+    def create_performance_widgets(self):
+        title_label = ctk.CTkLabel(self.performance_frame, text="Performance", font=ctk.CTkFont(size=24, weight="bold"))
+        title_label.grid(row=0, column=0, padx=20, pady=(20, 10), sticky="w")
+        self.performance_textbox = ctk.CTkTextbox(self.performance_frame, state="disabled", wrap="none", font=ctk.CTkFont(family="Courier", size=12))
+        self.performance_textbox.grid(row=1, column=0, padx=20, pady=10, sticky="nsew")
+        button_frame = ctk.CTkFrame(self.performance_frame, fg_color="transparent")
+        button_frame.grid(row=2, column=0, padx=20, pady=(5, 20), sticky="e")
+        ctk.CTkButton(button_frame, text="Actualiser", command=self.update_performance_report).grid(row=0, column=0, padx=5)
+        ctk.CTkButton(button_frame, text="Réinitialiser", command=lambda: (perf.reset(), self.update_performance_report())).grid(row=0, column=1, padx=5)
+        ctk.CTkButton(button_frame, text="Exporter JSON", command=self.export_performance_report).grid(row=0, column=2, padx=5)
+
+    # Affiche les mesures actuelles (nombre d'appels et histogramme des durées)
+    def update_performance_report(self):
+        self.performance_textbox.configure(state="normal")
+        self.performance_textbox.delete("1.0", ctk.END)
+        report = perf.format_report()
+        if self.chat_cache is not None:
+            stats = self.chat_cache.stats()
+            report += (f"\n\nCache du chat : {stats['hits']} réponse(s) du cache, {stats['misses']} appel(s) à l'API "
+                       f"({stats['hit_rate']:.0%}), {stats['entries']} entrée(s)")
+        self.performance_textbox.insert("1.0", report)
+        self.performance_textbox.configure(state="disabled")
+
+    # Enregistre les mesures dans un fichier JSON choisi par l'utilisateur
+    def export_performance_report(self):
+        from tkinter import filedialog
+        path = filedialog.asksaveasfilename(title="Exporter les mesures", defaultextension=".json",
+                                            initialfile="performance.json", filetypes=[("JSON", "*.json")])
+        if not path: return
+        try:
+            perf.export_json(path)
+            messagebox.showinfo("Export", f"Mesures enregistrées dans {path}")
+        except IOError as e:
+            messagebox.showerror("Erreur d'Export", f"Impossible d'écrire le fichier: {e}")
 
     # Fonction utilitaire pour appliquer le mode d'apparence aux couleurs
     # (Nécessaire car CustomTkinter retourne parfois des tuples de couleurs)
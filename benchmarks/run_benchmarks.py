@@ -0,0 +1,249 @@
+# Benchmarks des opérations principales sur des registres synthétiques (de 1 000 à 1 000 000 de transactions)
+# Exécutés sans interface : on appelle directement le stockage et le registre (storage.py, ledger.py)
+# comme le fait BudgetApp. Les résultats sont écrits en JSON pour comparer deux exécutions :
+#   python benchmarks/run_benchmarks.py --sizes 1000 100000 --output resultats.json
+#   python benchmarks/run_benchmarks.py --compare ancien.json --output nouveau.json
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import date, datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__)))) # Modules de l'application
+
+import config
+from ledger import Ledger, LedgerAggregates, TransactionIndex, id_of_key
+from storage import create_storage
+
+DEFAULT_SIZES = [1000, 10000, 100000, 1000000]
+
+# Catégories de dépenses : (nom, poids relatif, montant médian en FCFA, descriptions possibles)
+EXPENSE_CATEGORIES = [
+    ("Alimentation", 30, 2500, ["Supermarché", "Marché", "Boulangerie", "Restaurant universitaire", "Café"]),
+    ("Transport", 20, 500, ["Taxi", "Bus", "Moto-taxi", "Carburant"]),
+    ("Logement", 5, 60000, ["Loyer", "Électricité", "Eau"]),
+    ("Loisirs", 12, 3000, ["Cinéma", "Sortie", "Concert", "Abonnement streaming"]),
+    ("Études", 8, 5000, ["Livres", "Photocopies", "Frais d'inscription", "Fournitures"]),
+    ("Santé", 5, 4000, ["Pharmacie", "Consultation"]),
+    ("Communication", 10, 1000, ["Crédit téléphone", "Forfait internet"]),
+    ("Vêtements", 5, 8000, ["Chaussures", "Tee-shirt", "Pagne"]),
+    ("Non Catégorisé", 5, 1500, ["Divers", "Cadeau"]),
+]
+INCOME_DESCRIPTIONS = [("Bourse", 50000), ("Virement des parents", 30000), ("Job étudiant", 20000), ("Cours particuliers", 10000)]
+INCOME_SHARE = 0.1 # Proportion de revenus parmi les transactions
+
+
+# Registre synthétique de n transactions réparties sur environ trois ans, avec des identifiants uniques
+# Les montants suivent une loi log-normale autour du montant médian de chaque catégorie
+def generate_ledger(n, seed=42, years=3):
+    rng = random.Random(seed)
+    first_day = date(2023, 1, 1).toordinal()
+    span = 365 * years
+    names = [c[0] for c in EXPENSE_CATEGORIES]
+    weights = [c[1] for c in EXPENSE_CATEGORIES]
+    details = {c[0]: (c[2], c[3]) for c in EXPENSE_CATEGORIES}
+    data = {"income": [], "expenses": []}
+    for tx_id in range(1, n + 1):
+        day = date.fromordinal(first_day + rng.randrange(span)).isoformat()
+        if rng.random() < INCOME_SHARE:
+            description, median = rng.choice(INCOME_DESCRIPTIONS)
+            data["income"].append({"id": tx_id, "description": description,
+                                   "amount": round(median * rng.lognormvariate(0, 0.3)), "date": day})
+        else:
+            category = rng.choices(names, weights)[0]
+            median, descriptions = details[category]
+            data["expenses"].append({"id": tx_id, "description": rng.choice(descriptions),
+                                     "amount": round(median * rng.lognormvariate(0, 0.6)), "date": day,
+                                     "category": category})
+    return data
+
+
+# Durées (en secondes) de plusieurs exécutions de func
+def time_runs(func, repeat):
+    durations = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        durations.append(time.perf_counter() - start)
+    return durations
+
+
+def result_entry(size, storage_mode, name, durations, **extra):
+    entry = {"size": size, "storage": storage_mode, "benchmark": name, "repeat": len(durations),
+             "median_s": statistics.median(durations), "min_s": min(durations), "max_s": max(durations)}
+    entry.update(extra)
+    return entry
+
+
+# Mémoire occupée par un registre chargé comme au démarrage de l'application (transactions, index et totaux ;
+# stockage par mois : tous les mois), mesurée par tracemalloc : octets encore alloués après le chargement, et pic
+# Mesurée dans un nouveau processus : les caches et les chaînes partagées créés par un chargement précédent
+# (autre taille ou autre mode) ne faussent pas la mesure suivante
+# Retourne (durée du chargement, mémoire conservée, pic), la durée étant allongée par tracemalloc
+def measure_ledger_memory(storage_mode, data_file):
+    output = subprocess.run([sys.executable, os.path.abspath(__file__), "--measure-memory", storage_mode, data_file],
+                            check=True, capture_output=True, text=True).stdout
+    return tuple(json.loads(output.splitlines()[-1]))
+
+
+# Mesure faite dans le processus lancé par measure_ledger_memory (modules déjà importés avant tracemalloc)
+def _measure_ledger_memory(storage_mode, data_file):
+    tracemalloc.start()
+    start = time.perf_counter()
+    ledger = Ledger(create_storage(storage_mode, data_file, config.JOURNAL_COMPACT_THRESHOLD))
+    ledger.load()
+    ledger.ensure_loaded()
+    duration = time.perf_counter() - start
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    ledger.storage.close()
+    return duration, current, peak
+
+
+# Benchmarks d'une taille de registre ; retourne la liste des résultats
+def run_size(size, storage_mode, repeat, page_size, work_dir, memory=True):
+    results = []
+    def add(name, durations, **extra):
+        entry = result_entry(size, storage_mode, name, durations, **extra)
+        results.append(entry)
+        print(f"  {name:<26} médiane {entry['median_s'] * 1000:10.2f} ms  (min {entry['min_s'] * 1000:.2f} ms)", flush=True)
+
+    print(f"{size} transactions ({storage_mode}) :", flush=True)
+    data = generate_ledger(size)
+    data_file = os.path.join(work_dir, f"budget_data_{storage_mode}_{size}.json")
+
+    # save_data : réécriture complète (le premier appel crée les fichiers)
+    storage = create_storage(storage_mode, data_file, config.JOURNAL_COMPACT_THRESHOLD)
+    add("save_data", time_runs(lambda: storage.save(data), repeat))
+
+    if memory:
+        duration, current, peak = measure_ledger_memory(storage_mode, data_file)
+        add("ledger_memory", [duration], bytes=current, peak_bytes=peak, bytes_per_transaction=round(current / size))
+        print(f"  {'':<26} mémoire {current / 1e6:10.1f} Mo  ({current / size:.0f} octets/transaction, pic {peak / 1e6:.1f} Mo)", flush=True)
+
+    # load_data : lecture du fichier, puis construction des index et des agrégats comme au démarrage (Ledger.load)
+    ledger = Ledger(storage)
+    add("load_data", time_runs(ledger.load, repeat))
+    if storage.loads_lazily:
+        # Stockage par mois : load_data ne lit que le manifeste et le mois en cours ; lecture de tous les mois
+        start = time.perf_counter()
+        ledger.ensure_loaded()
+        add("load_all_months", [time.perf_counter() - start])
+    data, index, aggregates = ledger.data, ledger.index, ledger.aggregates
+    add("index_rebuild", time_runs(lambda: TransactionIndex().rebuild(data), repeat))
+    add("aggregates_rebuild", time_runs(lambda: LedgerAggregates().rebuild(data), repeat))
+    if storage.provides_totals:
+        # Totaux calculés par le stockage (GROUP BY SQL, manifeste ou enregistrements binaires), comme au démarrage
+        add("stored_totals", time_runs(lambda: LedgerAggregates().load_grouped(storage.grouped_totals()), repeat))
+
+    # get_available_months : mois tenus à jour par les agrégats
+    add("get_available_months", time_runs(aggregates.available_months, repeat))
+
+    # Filtrage et tri comme update_transaction_list : clés triées, puis lecture de la première page
+    months = aggregates.available_months()
+    month = months[len(months) // 2]
+    category = EXPENSE_CATEGORIES[0][0]
+    for name, query in [("filter_all", {}), ("filter_month", {"month": month}),
+                        ("filter_category", {"category": category}),
+                        ("filter_month_category", {"month": month, "category": category})]:
+        def filter_and_page(query=query):
+            keys = index.query(**query)
+            return [index.get(data, id_of_key(key)) for key in keys[:page_size]]
+        add(name, time_runs(filter_and_page, repeat), rows=len(index.query(**query)))
+
+    # Agrégation par catégorie comme update_analysis : totaux tenus à jour, triés par montant
+    def category_summary():
+        spending = aggregates.category_totals
+        return sorted(spending.items(), key=lambda item: item[1], reverse=True)
+    add("category_aggregation", time_runs(category_summary, repeat))
+
+    # Suppression groupée comme delete_transaction (1 % des transactions, au moins une), mesurée une fois
+    # car elle modifie les données : Ledger.delete (index, agrégats), puis enregistrement des suppressions
+    rng = random.Random(7)
+    ids = rng.sample(sorted(index.ids()), max(1, size // 100))
+    def bulk_delete():
+        _, records = ledger.delete(ids)
+        ledger.save(records)
+    add("bulk_delete", time_runs(bulk_delete, 1), deleted=len(ids))
+
+    if hasattr(storage, "wait_for_compaction"): storage.wait_for_compaction()
+    storage.close()
+    return results
+
+
+def git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, timeout=10,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+# Affiche le rapport entre les médianes de deux exécutions (> 1 : plus lent qu'avant)
+# Pour la mesure de mémoire, le rapport entre les octets conservés (> 1 : plus gourmand qu'avant)
+def compare(previous, current):
+    old = {(r["size"], r["storage"], r["benchmark"]): r for r in previous["results"]}
+    print("\nComparaison avec l'exécution précédente (médiane nouvelle / ancienne) :")
+    for r in current["results"]:
+        before = old.get((r["size"], r["storage"], r["benchmark"]))
+        if not before: continue
+        if "bytes" in r and before.get("bytes"):
+            ratio = r["bytes"] / before["bytes"]
+            flag = "  <-- plus de mémoire" if ratio > 1.2 else ""
+            print(f"  {r['size']:>8} {r['storage']:<8} {r['benchmark']:<26} x{ratio:5.2f} (mémoire){flag}")
+            continue
+        if not before["median_s"]: continue
+        ratio = r["median_s"] / before["median_s"]
+        flag = "  <-- plus lent" if ratio > 1.2 else ""
+        print(f"  {r['size']:>8} {r['storage']:<8} {r['benchmark']:<26} x{ratio:5.2f}{flag}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks du suivi de budget sur des registres synthétiques")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES, help="nombres de transactions")
+    parser.add_argument("--storage", choices=["json", "journal", "sqlite", "sharded", "binary"], nargs="+", default=[config.STORAGE_MODE],
+                        help="modes de stockage à mesurer")
+    parser.add_argument("--repeat", type=int, default=3, help="exécutions par mesure (la médiane est retenue)")
+    parser.add_argument("--output", help="fichier JSON des résultats (sinon affichés sur la sortie standard)")
+    parser.add_argument("--compare", help="fichier JSON d'une exécution précédente à comparer")
+    parser.add_argument("--no-memory", action="store_true", help="ne mesure pas la mémoire du registre chargé (tracemalloc, lent)")
+    parser.add_argument("--measure-memory", nargs=2, metavar=("STORAGE", "DATA_FILE"), help=argparse.SUPPRESS) # Voir measure_ledger_memory
+    args = parser.parse_args()
+    if args.measure_memory:
+        print(json.dumps(_measure_ledger_memory(*args.measure_memory)))
+        return
+
+    work_dir = tempfile.mkdtemp(prefix="budget_bench_")
+    try:
+        results = []
+        for storage_mode in args.storage:
+            for size in args.sizes:
+                results.extend(run_size(size, storage_mode, args.repeat, config.TRANSACTION_PAGE_SIZE, work_dir, memory=not args.no_memory))
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    report = {
+        "meta": {"timestamp": datetime.now().isoformat(timespec="seconds"), "git_revision": git_revision(),
+                 "python": platform.python_version(), "platform": platform.platform(),
+                 "repeat": args.repeat, "page_size": config.TRANSACTION_PAGE_SIZE},
+        "results": results,
+    }
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f: json.dump(report, f, indent=4, ensure_ascii=False)
+        print(f"\nRésultats enregistrés dans {args.output}")
+    else:
+        print(json.dumps(report, indent=4, ensure_ascii=False))
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f: compare(json.load(f), report)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,151 @@
+# Graphique de répartition des dépenses (donut), dessiné sans pyplot
+# Utilisable dans l'interface (FigureCanvasTkAgg) ou dans un thread de rendu (Agg -> image RGBA)
+import math # Pour placer les pourcentages
+import queue # Pour transmettre les images rendues au thread principal
+import threading # Pour le thread de rendu
+
+import matplotlib
+matplotlib.use("Agg") # Rendu sans fenêtre, possible hors du thread Tk
+import matplotlib.style # Palettes des styles Matplotlib (lues sans modifier le style global)
+from matplotlib.figure import Figure # Figure créée sans pyplot : pas d'état global à fermer
+from matplotlib.patches import Circle
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+
+# Couleurs du graphique pour le thème CTk : (fond, texte, couleurs des parts)
+# Les palettes viennent des styles Matplotlib d'origine, lues sans modifier le style global
+def chart_theme_colors(theme):
+    style_name = 'dark_background' if theme == "Dark" else 'seaborn-v0_8-pastel'
+    prop_cycle = matplotlib.style.library.get(style_name, {}).get('axes.prop_cycle', matplotlib.rcParams['axes.prop_cycle'])
+    palette = prop_cycle.by_key()['color']
+    if theme == "Dark": return "#2b2b2b", "#ffffff", palette # Fond sombre, texte clair
+    return "#ebebeb", "#000000", palette # Light ou System (considéré comme clair)
+
+
+# Donut des dépenses sur une figure unique, créée une fois puis réutilisée
+# Mêmes catégories qu'avant : angles, pourcentages et couleurs sont modifiés en place
+class DonutChart:
+    def __init__(self, figsize=(5, 4), dpi=100):
+        self.figure = Figure(figsize=figsize, dpi=dpi)
+        self.axes = self.figure.add_subplot(111)
+        self.labels = None # Catégories actuellement dessinées
+        self.wedges = []
+        self.autotexts = []
+        self.centre_circle = None
+        self.legend = None
+
+    # Met à jour le contenu de la figure (le dessin lui-même est fait par le canevas)
+    def update(self, labels, sizes, theme):
+        bg_color, text_color, palette = chart_theme_colors(theme)
+        colors = [palette[i % len(palette)] for i in range(len(labels))]
+        fig, ax = self.figure, self.axes
+
+        if tuple(labels) != self.labels:
+            # Catégories différentes : redessiner le contenu des axes (la figure et le canevas sont conservés)
+            ax.clear()
+            self.wedges, _, self.autotexts = ax.pie(sizes, labels=None, colors=colors, autopct='%1.1f%%', startangle=90, pctdistance=0.85)
+            # Ajouter un cercle au centre pour faire un donut chart
+            self.centre_circle = Circle((0, 0), 0.70)
+            ax.add_artist(self.centre_circle)
+            ax.axis('equal') # Assure que le camembert est un cercle
+            self.legend = ax.legend(self.wedges, labels, title="Catégories", loc="center left", bbox_to_anchor=(1.05, 0.5), fontsize=10)
+            ax.set_title("Répartition des Dépenses")
+            self.labels = tuple(labels)
+        else:
+            # Mêmes catégories : recalculer les angles des parts et la position des pourcentages
+            total = float(sum(sizes))
+            theta = 90.0 # Même angle de départ que ax.pie(startangle=90)
+            for wedge, autotext, size in zip(self.wedges, self.autotexts, sizes):
+                fraction = size / total if total else 0.0
+                wedge.set_theta1(theta)
+                wedge.set_theta2(theta + 360 * fraction)
+                middle = math.radians(theta + 180 * fraction)
+                autotext.set_position((0.85 * math.cos(middle), 0.85 * math.sin(middle)))
+                autotext.set_text('%1.1f%%' % (fraction * 100))
+                theta += 360 * fraction
+
+        # Couleurs du thème, appliquées en place
+        fig.patch.set_facecolor(bg_color) # Couleur de fond de la figure
+        ax.set_facecolor(bg_color) # Couleur de fond des axes
+        self.centre_circle.set_facecolor(bg_color)
+        for wedge, color in zip(self.wedges, colors): wedge.set_facecolor(color)
+        for autotext in self.autotexts: autotext.set_color(text_color); autotext.set_fontsize(9)
+        legend = self.legend
+        legend_handles = getattr(legend, 'legend_handles', None) or getattr(legend, 'legendHandles', [])
+        for handle, color in zip(legend_handles, colors): handle.set_facecolor(color)
+        for text in legend.get_texts(): text.set_color(text_color)
+        legend.get_title().set_color(text_color)
+        legend.get_frame().set_facecolor(bg_color)
+        legend.get_frame().set_edgecolor(text_color)
+        ax.title.set_color(text_color)
+        fig.tight_layout(rect=[0, 0, 0.85, 1]) # Ajuster layout pour la légende
+
+
+# Rendu du donut dans un thread dédié : le thread Tk envoie une demande (submit) et récupère
+# plus tard l'image RGBA (poll). Seule la demande la plus récente compte : une demande encore en attente
+# est remplacée par la suivante, et une image terminée après l'arrivée d'une demande plus récente est jetée
+class BackgroundChartRenderer:
+    def __init__(self, dpi=100):
+        self.dpi = dpi
+        self.condition = threading.Condition()
+        self.pending = None # Dernière demande pas encore prise par le thread
+        self.generation = 0 # Numéro de la demande la plus récente
+        self.results = queue.Queue()
+        self.rendering = False # Vrai pendant qu'une image est dessinée
+        self.thread = None
+
+    # Demande un rendu ; retourne le numéro de la demande
+    def submit(self, labels, sizes, theme, width, height):
+        with self.condition:
+            self.generation += 1
+            self.pending = (self.generation, list(labels), list(sizes), theme, width, height)
+            self.condition.notify()
+            if self.thread is None:
+                # Thread daemon : un rendu en cours n'empêche pas de fermer l'application
+                self.thread = threading.Thread(target=self._run, daemon=True)
+                self.thread.start()
+            return self.generation
+
+    # Dernière image prête pour la demande la plus récente : (largeur, hauteur, octets RGBA), ou None
+    def poll(self):
+        latest = None
+        while True:
+            try: generation, image = self.results.get_nowait()
+            except queue.Empty: break
+            if generation == self.generation: latest = image
+        return latest
+
+    # Vrai si une demande attend encore ou est en cours de rendu
+    def busy(self):
+        with self.condition:
+            return self.pending is not None or self.rendering
+
+    # Annule la demande en attente et rend obsolète celle en cours de rendu
+    def cancel(self):
+        with self.condition:
+            self.generation += 1
+            self.pending = None
+
+    def _run(self):
+        # La figure appartient à ce thread : elle n'est jamais touchée par le thread Tk
+        chart = DonutChart(dpi=self.dpi)
+        canvas = FigureCanvasAgg(chart.figure)
+        while True:
+            with self.condition:
+                while self.pending is None: self.condition.wait()
+                generation, labels, sizes, theme, width, height = self.pending
+                self.pending = None
+                self.rendering = True
+            try:
+                chart.figure.set_size_inches(width / self.dpi, height / self.dpi)
+                chart.update(labels, sizes, theme)
+                canvas.draw()
+                image = canvas.get_width_height() + (bytes(canvas.buffer_rgba()),)
+            except Exception as e:
+                print(f"Erreur lors du rendu du graphique: {e}")
+                image = None
+            with self.condition:
+                # Image jetée si une demande plus récente est arrivée pendant le rendu
+                if image is not None and generation == self.generation:
+                    self.results.put((generation, image))
+                self.rendering = False
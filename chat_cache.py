@@ -0,0 +1,110 @@
+# Cache local des réponses du Chat IA : une question déjà posée, avec la même conversation, le même modèle
+# et les mêmes données, reçoit aussitôt la réponse enregistrée au lieu d'un nouvel appel à l'API
+# Les entrées les moins récemment utilisées sont retirées au-delà de la taille maximum, et les entrées
+# trop anciennes expirent. Le cache peut être enregistré sur disque pour servir d'une session à l'autre
+import hashlib # Pour la clé du cache
+import json # Pour la clé et le fichier du cache
+import os # Pour vérifier l'existence du fichier
+import re # Pour normaliser les messages
+import threading # Le cache peut être lu et rempli depuis plusieurs threads
+import time # Pour l'expiration des entrées (heure réelle, valable après un redémarrage)
+from collections import OrderedDict # Ordre d'utilisation des entrées (la moins récente en premier)
+
+import config
+from storage import atomic_write_json
+
+CACHE_FORMAT = 1 # Version du format du fichier
+
+
+# Texte d'un message ramené à une forme simple : minuscules, espaces regroupés, ponctuation finale retirée
+# "Où est-ce que je dépense le plus ?" et "où est-ce que je dépense le plus" donnent la même clé
+def normalize_message(text):
+    return re.sub(r"\s+", " ", str(text)).strip().lower().rstrip(" ?!.")
+
+
+# Cache des réponses (classé de la moins récemment utilisée à la plus récente)
+class ResponseCache:
+    def __init__(self, max_entries=None, ttl=None, path=None):
+        self.max_entries = config.CHAT_CACHE_SIZE if max_entries is None else max_entries
+        self.ttl = config.CHAT_CACHE_TTL if ttl is None else ttl # Durée de vie d'une entrée, en secondes
+        self.path = path # Fichier du cache (None : cache en mémoire seulement)
+        self.entries = OrderedDict() # clé -> (heure d'enregistrement, réponse)
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+        if path is not None: self.load()
+
+    # Clé d'une conversation : tous les messages normalisés (y compris le message système), le modèle
+    # et la version des données du registre
+    @staticmethod
+    def make_key(messages, model, data_version):
+        context = [[message["role"], normalize_message(message["content"])] for message in messages]
+        text = json.dumps([model, data_version, context], ensure_ascii=False)
+        return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+    # Réponse enregistrée pour cette clé, ou None (entrée absente ou expirée)
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None and time.time() - entry[0] > self.ttl:
+                del self.entries[key]
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key, reply):
+        if self.max_entries <= 0: return
+        with self.lock:
+            self.entries[key] = (time.time(), reply)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries: self.entries.popitem(last=False)
+        if self.path is not None: self.save()
+
+    # Retire les entrées expirées ; retourne leur nombre
+    def evict_expired(self):
+        now = time.time()
+        with self.lock:
+            expired = [key for key, (stored_at, _) in self.entries.items() if now - stored_at > self.ttl]
+            for key in expired: del self.entries[key]
+        return len(expired)
+
+    def clear(self):
+        with self.lock: self.entries.clear()
+        if self.path is not None: self.save()
+
+    # Nombre de réponses servies par le cache, d'appels à l'API, et d'entrées gardées
+    def stats(self):
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {"hits": self.hits, "misses": self.misses, "entries": len(self.entries),
+                    "hit_rate": self.hits / lookups if lookups else 0.0}
+
+    # Charge le fichier du cache ; un fichier absent, illisible ou d'un autre format donne un cache vide
+    # Les entrées expirées sont écartées, puis seules les max_entries plus récemment utilisées sont gardées
+    def load(self):
+        if not os.path.exists(self.path): return
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f: content = json.load(f)
+        except (IOError, ValueError) as e:
+            print(f"Cache du chat ignoré ({self.path}): {e}")
+            return
+        if not isinstance(content, dict) or content.get("format") != CACHE_FORMAT: return
+        now = time.time()
+        with self.lock:
+            self.entries.clear()
+            for key, stored_at, reply in content.get("entries", []): # De la moins récente à la plus récente
+                if now - stored_at <= self.ttl: self.entries[key] = (stored_at, reply)
+            while len(self.entries) > max(self.max_entries, 0): self.entries.popitem(last=False)
+
+    # Enregistre le cache (écriture atomique), de la moins récente à la plus récente entrée
+    def save(self):
+        with self.lock:
+            entries = [[key, stored_at, reply] for key, (stored_at, reply) in self.entries.items()]
+        try:
+            atomic_write_json(self.path, {"format": CACHE_FORMAT, "entries": entries}, indent=None)
+        except IOError as e:
+            print(f"Impossible d'enregistrer le cache du chat: {e}")
@@ -0,0 +1,166 @@
+# Client du Chat IA (API OpenRouter compatible OpenAI), sans interface graphique
+# Les réponses sont reçues en flux (server-sent events) : le texte arrive morceau par morceau
+# Une seule session HTTP est gardée (connexions réutilisées), avec délais maximum, nouvelles tentatives
+# espacées (429 et erreurs 5xx) et annulation d'une requête en cours
+import json # Pour les requêtes et les événements du flux
+import random # Pour espacer les nouvelles tentatives de façon aléatoire
+import threading # Pour l'annulation depuis un autre thread
+
+import requests
+from requests.adapters import HTTPAdapter
+
+import config
+
+MODEL = "deepseek/deepseek-r1-0528"
+MAX_TOKENS = 1000 # Limitation nécessaire malgré la clé "unlimited"
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504} # Erreurs passagères : la requête est renvoyée
+BACKOFF_BASE = 0.5 # Secondes avant la première nouvelle tentative (doublé à chaque essai)
+BACKOFF_MAX = 8.0
+
+
+# Erreur renvoyée par l'API (code HTTP ou message d'erreur dans le flux)
+class ChatError(Exception):
+    def __init__(self, message, status_code=None):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+# Requête annulée (par exemple parce que l'utilisateur a envoyé un nouveau message)
+class ChatCancelled(Exception):
+    pass
+
+
+# Requête en cours, annulable depuis un autre thread : cancel() interrompt l'attente entre deux tentatives
+# et ferme la connexion, ce qui débloque la lecture du flux
+class ChatRequest:
+    def __init__(self):
+        self.cancelled = threading.Event()
+        self.lock = threading.Lock()
+        self.response = None
+
+    def cancel(self):
+        with self.lock:
+            self.cancelled.set()
+            response = self.response
+        if response is not None: response.close()
+
+    # Mémorise la réponse en cours (fermée aussitôt si la requête a déjà été annulée)
+    def attach(self, response):
+        with self.lock:
+            self.response = response
+            cancelled = self.cancelled.is_set()
+        if cancelled:
+            response.close()
+            raise ChatCancelled()
+
+
+# Lit un flux server-sent events ; produit le contenu de chaque champ "data"
+# Les commentaires (lignes commençant par ":", envoyés par OpenRouter pendant l'attente) sont ignorés
+def iter_sse_data(lines):
+    data = []
+    for line in lines:
+        if isinstance(line, bytes): line = line.decode('utf-8')
+        line = line.rstrip("\r\n")
+        if not line: # Ligne vide : fin de l'événement
+            if data: yield "\n".join(data)
+            data = []
+        elif line.startswith(":"):
+            continue
+        elif line.startswith("data:"):
+            data.append(line[5:].lstrip(" ") if line[5:6] == " " else line[5:])
+    if data: yield "\n".join(data)
+
+
+# Client réutilisable : une session HTTP (connexions gardées ouvertes) pour tous les messages
+# Utilisable depuis plusieurs threads (une requête à la fois par thread)
+class ChatClient:
+    def __init__(self, api_key, url=None, model=MODEL, connect_timeout=None, read_timeout=None, max_retries=None):
+        self.api_key = api_key
+        self.url = url or config.CHAT_API_URL
+        self.model = model
+        # Délai de connexion, puis délai maximum sans recevoir de données (entre deux morceaux du flux)
+        self.timeout = (connect_timeout or config.CHAT_CONNECT_TIMEOUT, read_timeout or config.CHAT_READ_TIMEOUT)
+        self.max_retries = config.CHAT_MAX_RETRIES if max_retries is None else max_retries
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=4) # Réessais gérés ici (voir stream_chat)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.session.headers.update(self.headers())
+
+    def headers(self):
+        return {
+            "Authorization": f"Bearer {self.api_key}",
+            "Content-Type": "application/json",
+            "HTTP-Referer": "budget_tracker_app",  # Identifiant de l'application
+            "X-Title": "Budget Tracker"  # Nom de l'application
+        }
+
+    # Attente avant la tentative numéro attempt (1, 2, ...) : délai exponentiel avec tirage aléatoire
+    # ("full jitter"), ou délai demandé par le serveur (en-tête Retry-After)
+    @staticmethod
+    def backoff_delay(attempt, retry_after=None):
+        if retry_after is not None:
+            try: return min(float(retry_after), BACKOFF_MAX)
+            except ValueError: pass
+        return random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * 2 ** attempt))
+
+    # Envoie la requête ; renvoie la réponse HTTP dès que l'API accepte de répondre (code 200)
+    # Les erreurs passagères (429, 5xx, connexion impossible, délai dépassé) sont réessayées
+    # on_retry(attempt, delay, reason) est appelé avant chaque attente
+    def _open_stream(self, payload, request, on_retry):
+        attempt = 0
+        while True:
+            if request.cancelled.is_set(): raise ChatCancelled()
+            try:
+                response = self.session.post(self.url, data=json.dumps(payload), stream=True, timeout=self.timeout)
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+                if request.cancelled.is_set(): raise ChatCancelled()
+                if attempt >= self.max_retries: raise
+                reason, retry_after = f"connexion impossible ({type(e).__name__})", None
+            else:
+                request.attach(response)
+                if response.status_code == 200: return response
+                text = response.text
+                response.close()
+                if response.status_code not in RETRY_STATUS_CODES or attempt >= self.max_retries:
+                    raise ChatError(f"Erreur API (code {response.status_code}): {text}", response.status_code)
+                reason, retry_after = f"code {response.status_code}", response.headers.get("Retry-After")
+            attempt += 1
+            delay = self.backoff_delay(attempt, retry_after)
+            if on_retry is not None: on_retry(attempt, delay, reason)
+            if request.cancelled.wait(delay): raise ChatCancelled() # Attente interrompue par cancel()
+
+    # Envoie la conversation et produit les morceaux de la réponse au fur et à mesure
+    # Lève ChatError si l'API répond par une erreur, ChatCancelled si request.cancel() a été appelé,
+    # requests.exceptions.RequestException en cas de problème réseau persistant
+    def stream_chat(self, messages, request=None, on_retry=None):
+        request = request or ChatRequest()
+        payload = {"model": self.model, "messages": messages, "max_tokens": MAX_TOKENS, "stream": True}
+        response = self._open_stream(payload, request, on_retry)
+        done = False
+        try:
+            for data in iter_sse_data(response.iter_lines()):
+                if request.cancelled.is_set(): raise ChatCancelled()
+                # Après [DONE], la fin du flux est lue : la connexion, lue jusqu'au bout, retourne dans la session
+                if done or data == "[DONE]":
+                    done = True
+                    continue
+                event = json.loads(data)
+                if "error" in event:
+                    error = event["error"]
+                    raise ChatError(f"Erreur API: {error.get('message', error) if isinstance(error, dict) else error}")
+                choices = event.get("choices") or []
+                if not choices: continue
+                content = (choices[0].get("delta") or {}).get("content")
+                if content: yield content
+        except ChatCancelled:
+            raise
+        except Exception:
+            # Connexion fermée par cancel() pendant la lecture : l'erreur de lecture n'en est pas une
+            if request.cancelled.is_set(): raise ChatCancelled()
+            raise
+        finally:
+            response.close()
+
+    def close(self):
+        self.session.close()
@@ -0,0 +1,106 @@
+# Contexte envoyé au Chat IA : message système avec un résumé compact du budget de l'utilisateur, puis les
+# derniers échanges qui tiennent dans un budget de tokens. Les échanges plus anciens sont résumés en une ligne
+# Le nombre de tokens est estimé hors ligne (sans le tokenizer du modèle), ce qui suffit pour rester sous la limite
+import re # Pour découper le texte en mots
+
+# Tokens ajoutés par l'API pour chaque message (rôle, séparateurs)
+MESSAGE_OVERHEAD_TOKENS = 4
+_WORDS = re.compile(r"\w+|[^\w\s]")
+
+SYSTEM_PROMPT = ("Tu es un assistant utile intégré à une application de suivi de budget. Réponds de manière concise et "
+                 "pertinente aux questions des utilisateurs, potentiellement liées à la gestion de budget ou à des sujets "
+                 "généraux. Le résumé ci-dessous décrit le budget de l'utilisateur : appuie-toi dessus pour les questions "
+                 "sur ses revenus et ses dépenses.")
+
+
+# Estimation du nombre de tokens d'un texte : un token par mot ou signe de ponctuation,
+# plus un par tranche de 6 caractères dans les mots longs (découpés en plusieurs tokens par le modèle)
+def estimate_tokens(text):
+    return sum(1 + len(word) // 6 for word in _WORDS.findall(text))
+
+
+def message_tokens(message):
+    return MESSAGE_OVERHEAD_TOKENS + estimate_tokens(message["content"])
+
+
+def _fcfa(amount):
+    return f"{amount:,.0f} FCFA".replace(',', ' ')
+
+
+def _change(current, previous):
+    if not previous: return "n/a"
+    return f"{(current - previous) / previous:+.0%}"
+
+
+# Résumé compact du budget à partir des agrégats du registre (les mêmes totaux que l'écran Analyse) :
+# totaux et solde, principales catégories de dépenses, derniers mois avec l'évolution d'un mois sur l'autre
+def ledger_digest(aggregates, top_categories=5, months=3):
+    if not aggregates.income_count and not aggregates.expense_count:
+        return "Budget de l'utilisateur : aucune transaction enregistrée."
+    lines = [f"Budget de l'utilisateur : revenus {_fcfa(aggregates.total_income)}, "
+             f"dépenses {_fcfa(aggregates.total_expenses)}, solde {_fcfa(aggregates.total_income - aggregates.total_expenses)} "
+             f"({aggregates.income_count} revenu(s), {aggregates.expense_count} dépense(s))."]
+    spending = sorted(aggregates.category_totals.items(), key=lambda item: item[1], reverse=True)
+    if spending:
+        total = aggregates.total_expenses or 1
+        shown = ", ".join(f"{category} {_fcfa(amount)} ({amount / total:.0%})" for category, amount in spending[:top_categories])
+        others = len(spending) - top_categories
+        lines.append(f"Principales dépenses : {shown}" + (f", et {others} autre(s) catégorie(s)." if others > 0 else "."))
+    recent = sorted(aggregates.month_totals)[-(months + 1):]
+    if recent:
+        details = []
+        for position, month in enumerate(recent):
+            if position == 0 and len(recent) > months: continue # Mois précédent, seulement pour l'évolution
+            income, expenses = aggregates.month_totals[month]
+            text = f"{month} : revenus {_fcfa(income)}, dépenses {_fcfa(expenses)}"
+            if position > 0:
+                previous = aggregates.month_totals[recent[position - 1]]
+                text += f" (dépenses {_change(expenses, previous[1])} par rapport à {recent[position - 1]})"
+            details.append(text)
+        lines.append("Derniers mois : " + " ; ".join(details) + ".")
+    return "\n".join(lines)
+
+
+# Résumé en une ligne des échanges retirés du contexte : les questions posées, les plus récentes d'abord,
+# jusqu'à budget tokens
+def summarize_turns(messages, budget):
+    questions = [" ".join(m["content"].split()) for m in reversed(messages) if m["role"] == "user"]
+    summary = "Questions précédentes de l'utilisateur (résumé) :"
+    used = estimate_tokens(summary) + MESSAGE_OVERHEAD_TOKENS
+    kept = []
+    for question in questions:
+        if len(question) > 120: question = question[:117] + "..."
+        cost = estimate_tokens(question) + 1
+        if used + cost > budget: break
+        kept.append(question)
+        used += cost
+    if not kept: return None
+    return summary + " " + " | ".join(kept)
+
+
+# Messages à envoyer à l'API : message système (avec le résumé du budget), puis les échanges les plus récents
+# tant qu'ils tiennent dans max_tokens. Le dernier message (la question posée) est toujours envoyé.
+# Les échanges plus anciens sont remplacés par un résumé s'il reste de la place
+def build_messages(system_prompt, history, max_tokens, digest=None):
+    system = {"role": "system", "content": system_prompt + ("\n\n" + digest if digest else "")}
+    used = message_tokens(system)
+    # Si tout l'historique ne tient pas, un dixième du budget est gardé pour le résumé des anciens échanges
+    reserve = 0 if used + sum(message_tokens(m) for m in history) <= max_tokens else max_tokens // 10
+    kept = []
+    for position in range(len(history) - 1, -1, -1):
+        cost = message_tokens(history[position])
+        if kept and used + cost > max_tokens - reserve: break
+        kept.append(history[position])
+        used += cost
+    else:
+        position = -1
+    kept.reverse()
+    # Un échange commence par une question : une réponse isolée en tête du contexte est retirée
+    while len(kept) > 1 and kept[0]["role"] == "assistant":
+        used -= message_tokens(kept.pop(0))
+        position += 1
+    dropped = history[:position + 1]
+    if dropped:
+        summary = summarize_turns(dropped, max_tokens - used)
+        if summary: system["content"] += "\n\n" + summary
+    return [system] + kept
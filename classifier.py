@@ -0,0 +1,100 @@
+# Classement automatique des dépenses, sans réseau : bayésien naïf (multinomial) sur les mots de la description
+# et leurs trigrammes de caractères ("supermarche" ressemble à "supermarché casino", "taxi" à "taxis")
+# Appris à partir des dépenses déjà catégorisées, puis mis à jour à chaque ajout ou suppression (coût constant)
+# Les comptes sont rangés par caractéristique : une prédiction ne lit que les caractéristiques de la description
+import math # Pour les log-probabilités
+import re # Pour découper la description en mots
+import unicodedata # Pour comparer les descriptions sans accents
+from collections import Counter, defaultdict
+from functools import lru_cache
+
+MIN_CONFIDENCE = 0.5 # Probabilité minimum pour proposer une catégorie
+_WORD = re.compile(r"[a-z]{2,}")
+
+
+# Caractéristiques d'une description : chaque mot (sans accents, en minuscules) et ses trigrammes de caractères
+# Les chiffres (dates, références de paiement) sont ignorés
+@lru_cache(maxsize=16384)
+def features(description):
+    text = unicodedata.normalize("NFKD", description.lower())
+    text = "".join(c for c in text if not unicodedata.combining(c))
+    result = []
+    for word in _WORD.findall(text):
+        result.append(word)
+        padded = f"^{word}$"
+        result.extend(padded[i:i + 3] for i in range(len(padded) - 2))
+    return tuple(result)
+
+
+class CategoryClassifier:
+    def __init__(self):
+        self.feature_counts = defaultdict(dict) # caractéristique -> {catégorie: nombre d'occurrences}
+        self.category_features = defaultdict(int) # catégorie -> nombre total de caractéristiques apprises
+        self.category_docs = defaultdict(int) # catégorie -> nombre de dépenses apprises
+        self.total_docs = 0
+
+    # Apprend les dépenses d'une liste de (description, catégorie) ; les paires identiques sont apprises ensemble
+    def train(self, pairs):
+        for (description, category), count in Counter(pairs).items():
+            self.learn(description, category, count)
+
+    # Apprend (ou oublie, avec un poids négatif) une dépense ; coût proportionnel à la longueur de la description
+    def learn(self, description, category, weight=1):
+        if not category: return
+        feats = features(description)
+        if not feats: return
+        for feature in feats:
+            counts = self.feature_counts[feature]
+            count = counts.get(category, 0) + weight
+            if count > 0: counts[category] = count
+            else:
+                counts.pop(category, None)
+                if not counts: del self.feature_counts[feature]
+        self.category_features[category] += weight * len(feats)
+        self.category_docs[category] += weight
+        self.total_docs += weight
+        if self.category_docs[category] <= 0: # Plus aucune dépense de cette catégorie
+            del self.category_docs[category]
+            del self.category_features[category]
+
+    def forget(self, description, category):
+        self.learn(description, category, -1)
+
+    # Catégorie la plus probable et sa confiance (probabilité multipliée par la part des caractéristiques déjà vues),
+    # ou (None, 0.0) si aucune caractéristique n'a été apprise. Les caractéristiques jamais vues n'entrent pas
+    # dans le calcul (elles favoriseraient les catégories les moins fournies) mais baissent la confiance :
+    # une description inconnue qui partage quelques trigrammes avec une catégorie n'y est pas classée
+    # Les catégories sont copiées avant lecture : l'import peut prédire dans un thread pendant un ajout
+    def predict(self, description):
+        categories = list(self.category_docs.items())
+        if not categories: return None, 0.0
+        feats = features(description)
+        known = [counts for counts in map(self.feature_counts.get, feats) if counts]
+        if not known: return None, 0.0
+        vocabulary = len(self.feature_counts) + 1
+        log_total = math.log(sum(docs for _, docs in categories))
+        # Lissage de Laplace : une caractéristique jamais vue avec une catégorie compte pour 1
+        scores = {category: math.log(docs) - log_total - len(known) * math.log(self.category_features.get(category, 0) + vocabulary)
+                  for category, docs in categories}
+        for counts in known:
+            for category, count in list(counts.items()):
+                if category in scores: scores[category] += math.log(count + 1)
+        best = max(scores, key=scores.get)
+        top = scores[best]
+        return best, len(known) / len(feats) / sum(math.exp(score - top) for score in scores.values())
+
+    # Catégorie proposée pour une description, ou None si la prédiction n'est pas assez sûre
+    def suggest(self, description, min_confidence=MIN_CONFIDENCE):
+        category, confidence = self.predict(description)
+        return category if confidence >= min_confidence else None
+
+    # Prédictions pour une liste de descriptions (import d'un relevé) ; chaque description distincte
+    # n'est calculée qu'une fois
+    def classify_many(self, descriptions):
+        memo = {}
+        results = []
+        for description in descriptions:
+            prediction = memo.get(description)
+            if prediction is None: prediction = memo[description] = self.predict(description)
+            results.append(prediction)
+        return results
@@ -0,0 +1,54 @@
+# Paramètres de l'application
+# Chaque valeur peut être modifiée avec une variable d'environnement avant le lancement
+import os
+
+# Mode de stockage : "json" (réécriture complète du fichier), "journal" (ajouts en fin de journal + compaction),
+# "sqlite" (base budget_data.db indexée, migrée automatiquement depuis budget_data.json)
+# "sharded" (un fichier par mois dans budget_data_mois/, chargés à la demande, migré depuis budget_data.json)
+# ou "binary" (fichier compact budget_data.bin lu par mmap, migré depuis budget_data.json)
+STORAGE_MODE = os.environ.get("BUDGET_STORAGE", "json")
+
+# Nombre d'enregistrements dans le journal avant de lancer une compaction en arrière-plan
+JOURNAL_COMPACT_THRESHOLD = int(os.environ.get("BUDGET_JOURNAL_THRESHOLD", "500"))
+
+# Vérification des agrégats (totaux, catégories, mois) contre un recalcul complet après chaque modification
+VERIFY_AGGREGATES = os.environ.get("BUDGET_VERIFY_AGGREGATES", "0") == "1"
+
+# Délai (en secondes) sans nouvelle modification avant l'écriture en arrière-plan : des modifications rapprochées
+# sont écrites en une seule fois ; tout ce qui reste est écrit à la fermeture de la fenêtre
+WRITE_DELAY = float(os.environ.get("BUDGET_WRITE_DELAY", "0.3"))
+
+# Nombre de lignes insérées à la fois dans le tableau des transactions (les suivantes arrivent pendant le défilement)
+TRANSACTION_PAGE_SIZE = int(os.environ.get("BUDGET_PAGE_SIZE", "200"))
+
+# Rendu du graphique d'analyse : "background" (dessiné dans un thread puis affiché comme image)
+# ou "inline" (dessiné directement dans l'interface par Matplotlib)
+CHART_RENDERING = os.environ.get("BUDGET_CHART_RENDERING", "background")
+
+# Démarrage rapide : les écrans Transactions, Analyse et Chat sont construits à leur première ouverture
+# ("0" : tous les écrans sont construits au démarrage)
+LAZY_START = os.environ.get("BUDGET_LAZY_START", "1") == "1"
+
+# Mesures de performance (nombre d'appels et durées) affichées dans l'écran "Performance"
+# Aussi activables avec "python main.py --perf"
+PERF_ENABLED = os.environ.get("BUDGET_PERF", "0") == "1"
+
+# Adresse de l'API du Chat IA (compatible OpenAI) ; peut pointer vers le serveur de test
+# tools/mock_chat_server.py, par exemple http://127.0.0.1:8765/api/v1/chat/completions
+CHAT_API_URL = os.environ.get("BUDGET_CHAT_URL", "https://openrouter.ai/api/v1/chat/completions")
+
+# Délais du Chat IA (en secondes) : connexion, puis attente maximum sans recevoir de données
+CHAT_CONNECT_TIMEOUT = float(os.environ.get("BUDGET_CHAT_CONNECT_TIMEOUT", "5"))
+CHAT_READ_TIMEOUT = float(os.environ.get("BUDGET_CHAT_READ_TIMEOUT", "60"))
+# Nombre de nouvelles tentatives après une erreur passagère (429, 5xx, connexion impossible)
+CHAT_MAX_RETRIES = int(os.environ.get("BUDGET_CHAT_MAX_RETRIES", "3"))
+
+# Cache des réponses du Chat IA : nombre maximum de réponses gardées (0 : pas de cache) et durée de vie (secondes)
+CHAT_CACHE_SIZE = int(os.environ.get("BUDGET_CHAT_CACHE_SIZE", "128"))
+CHAT_CACHE_TTL = float(os.environ.get("BUDGET_CHAT_CACHE_TTL", "86400"))
+# Enregistrement du cache sur disque (chat_cache.json, à côté des données) pour le garder d'une session à l'autre
+CHAT_CACHE_PERSIST = os.environ.get("BUDGET_CHAT_CACHE_PERSIST", "0") == "1"
+
+# Budget de tokens (estimés) du contexte envoyé au Chat IA : message système avec le résumé du budget,
+# puis les derniers échanges ; les plus anciens sont résumés en une ligne
+CHAT_CONTEXT_TOKENS = int(os.environ.get("BUDGET_CHAT_CONTEXT_TOKENS", "2000"))
@@ -0,0 +1,220 @@
+# Import de relevés bancaires (CSV ou OFX) : lecture au fil du fichier, validation avec les mêmes règles que
+# l'ajout manuel (Ledger.make_transaction), détection des doublons, puis ajout en un seul lot (Ledger.add_many)
+# La lecture peut tourner dans un thread (StatementImport) : l'interface suit la progression sans être bloquée
+# Les dépenses sans catégorie sont classées par le classement automatique du registre (classifier.py), s'il est fourni
+import csv # Pour les relevés CSV
+import os # Pour la taille du fichier (progression)
+import queue # Pour transmettre la progression et le résultat au thread principal
+import re # Pour les balises OFX
+import threading # Pour la lecture en arrière-plan
+import unicodedata # Pour comparer les en-têtes sans accents
+from collections import Counter # Doublons : nombre d'exemplaires de chaque transaction existante
+
+from classifier import MIN_CONFIDENCE
+from ledger import Ledger, LedgerError
+
+DEFAULT_CATEGORY = "Non Catégorisé" # Catégorie des dépenses importées sans catégorie
+
+# En-têtes reconnus (en minuscules, sans accents) pour chaque champ d'un relevé CSV
+CSV_COLUMNS = {
+    "date": ["date", "date operation", "date de l'operation", "date comptable", "date de valeur", "booking date"],
+    "description": ["description", "libelle", "libelle operation", "label", "intitule", "memo", "name", "details"],
+    "amount": ["amount", "montant", "montant (fcfa)"],
+    "debit": ["debit", "debit (fcfa)"],
+    "credit": ["credit", "credit (fcfa)"],
+    "type": ["type", "sens"],
+    "category": ["category", "categorie"],
+}
+INCOME_TYPES = {"revenu", "income", "credit", "cr"}
+EXPENSE_TYPES = {"depense", "expense", "expenses", "debit", "dr"}
+
+
+# Erreur de lecture d'un relevé (format non reconnu)
+class ImportFormatError(ValueError):
+    pass
+
+
+def _simplify(text):
+    text = unicodedata.normalize("NFKD", text.strip().lower())
+    return "".join(c for c in text if not unicodedata.combining(c))
+
+
+# Montant d'un relevé ("1 234,56", "-1.234,56", "1234.5") ; lève ValueError s'il est illisible
+def parse_amount(text):
+    text = str(text).strip().replace(" ", "").replace(" ", "").replace(" ", "")
+    if "," in text and "." in text:
+        # Le dernier séparateur est celui des décimales
+        text = text.replace(".", "").replace(",", ".") if text.rfind(",") > text.rfind(".") else text.replace(",", "")
+    else:
+        text = text.replace(",", ".")
+    return float(text)
+
+
+# Date d'un relevé au format de l'application (AAAA-MM-JJ) : accepte AAAA-MM-JJ, JJ/MM/AAAA, JJ-MM-AAAA, JJ.MM.AAAA
+# et AAAAMMJJ (OFX) ; la validité est vérifiée ensuite par Ledger.make_transaction
+def normalize_date(text):
+    text = text.strip()
+    match = re.match(r"^(\d{2})[/.-](\d{2})[/.-](\d{4})$", text)
+    if match: return f"{match.group(3)}-{match.group(2)}-{match.group(1)}"
+    match = re.match(r"^(\d{4})(\d{2})(\d{2})", text)
+    if match: return f"{match.group(1)}-{match.group(2)}-{match.group(3)}"
+    return text
+
+
+# Lignes d'un fichier texte, avec le nombre approximatif d'octets lus (pour la progression)
+class _CountingLines:
+    def __init__(self, f):
+        self.f = f
+        self.consumed = 0
+
+    def __iter__(self):
+        for line in self.f:
+            self.consumed += len(line)
+            yield line
+
+
+# Lit un relevé CSV ligne à ligne ; produit (numéro de ligne, type, description, montant, date, catégorie)
+# Le type vient de la colonne type si elle existe, sinon du signe du montant (ou des colonnes débit/crédit)
+def iter_csv_statement(f, counter):
+    sample = f.read(4096)
+    f.seek(0)
+    try: dialect = csv.Sniffer().sniff(sample, delimiters=",;\t")
+    except csv.Error: dialect = csv.excel
+    reader = csv.reader(counter, dialect)
+    header = next(reader, None)
+    if header is None: return
+    names = [_simplify(name) for name in header]
+    columns = {}
+    for field, aliases in CSV_COLUMNS.items():
+        for position, name in enumerate(names):
+            if name in aliases:
+                columns[field] = position
+                break
+    if "date" not in columns or "description" not in columns or not ("amount" in columns or "debit" in columns or "credit" in columns):
+        raise ImportFormatError("Colonnes attendues : date, description (ou libellé) et montant (ou débit/crédit).")
+    cell = lambda row, field: row[columns[field]].strip() if field in columns and columns[field] < len(row) else ""
+    for line_number, row in enumerate(reader, start=2):
+        if not any(value.strip() for value in row): continue # Ligne vide
+        try:
+            if cell(row, "amount"):
+                amount = parse_amount(cell(row, "amount"))
+            elif cell(row, "debit"):
+                amount = -abs(parse_amount(cell(row, "debit")))
+            else:
+                amount = abs(parse_amount(cell(row, "credit")))
+        except ValueError:
+            yield line_number, None, cell(row, "description"), cell(row, "amount") or cell(row, "debit") or cell(row, "credit"), cell(row, "date"), None
+            continue
+        tx_type = "income" if amount > 0 else "expenses"
+        declared = _simplify(cell(row, "type"))
+        if declared in INCOME_TYPES: tx_type = "income"
+        elif declared in EXPENSE_TYPES: tx_type = "expenses"
+        yield line_number, tx_type, cell(row, "description"), abs(amount), normalize_date(cell(row, "date")), cell(row, "category") or None
+
+
+_OFX_TAG = re.compile(r"<(/?)([A-Za-z0-9.]+)>([^<\r\n]*)")
+
+# Lit un relevé OFX (SGML ou XML) ligne à ligne ; mêmes valeurs produites que iter_csv_statement
+def iter_ofx_statement(f, counter):
+    current, start_line = None, 0
+    for line_number, line in enumerate(counter, start=1):
+        for closing, tag, value in _OFX_TAG.findall(line):
+            tag = tag.upper()
+            if tag == "STMTTRN" and not closing:
+                current, start_line = {}, line_number
+            elif tag == "STMTTRN" and closing and current is not None:
+                description = current.get("NAME") or current.get("MEMO") or current.get("TRNTYPE", "")
+                try: amount = parse_amount(current.get("TRNAMT", ""))
+                except ValueError:
+                    yield start_line, None, description, current.get("TRNAMT", ""), current.get("DTPOSTED", ""), None
+                else:
+                    yield start_line, "income" if amount > 0 else "expenses", description, abs(amount), normalize_date(current.get("DTPOSTED", "")), None
+                current = None
+            elif current is not None and not closing and value.strip():
+                current[tag] = value.strip()
+
+
+# Clé de comparaison des doublons : même type, même date, même montant et même description
+def duplicate_key(tx_type, tx):
+    return (tx_type, tx.get("date"), round(float(tx.get("amount", 0)), 2), tx.get("description", "").strip().lower())
+
+
+# Résultat d'un import : transactions prêtes à ajouter, doublons ignorés, lignes invalides
+class ImportResult:
+    def __init__(self):
+        self.transactions = [] # (type, transaction) validées, pas encore ajoutées au registre
+        self.duplicates = 0
+        self.classified = 0 # Dépenses sans catégorie classées automatiquement
+        self.errors = [] # (numéro de ligne, message)
+
+
+# Lit et valide un relevé ; existing (liste de (type, transaction)) sert à écarter les doublons
+# Une transaction déjà présente n fois n'est écartée que n fois : des achats identiques le même jour restent importés
+# progress(fraction) est appelé régulièrement
+# classifier (CategoryClassifier) propose une catégorie aux dépenses qui n'en ont pas ; sinon default_category
+def parse_statement(path, existing=None, progress=None, default_category=DEFAULT_CATEGORY, classifier=None):
+    result = ImportResult()
+    uncategorized = [] # Dépenses sans catégorie dans le relevé, classées en une fois à la fin
+    remaining = Counter(duplicate_key(tx_type, tx) for tx_type, tx in existing) if existing is not None else None
+    size = max(1, os.path.getsize(path))
+    extension = os.path.splitext(path)[1].lower()
+    with open(path, 'r', encoding='utf-8-sig', errors='replace', newline='') as f:
+        counter = _CountingLines(f)
+        rows = iter_ofx_statement(f, counter) if extension in (".ofx", ".qfx") else iter_csv_statement(f, counter)
+        for count, (line_number, tx_type, description, amount, date_str, category) in enumerate(rows, start=1):
+            if progress is not None and count % 2000 == 0: progress(min(1.0, counter.consumed / size))
+            if tx_type is None:
+                result.errors.append((line_number, f"Montant illisible: {amount!r}"))
+                continue
+            try:
+                # Mêmes règles que la saisie manuelle : description non vide, montant positif, date AAAA-MM-JJ
+                transaction = Ledger.make_transaction(description, amount, date_str,
+                                                      (category or default_category) if tx_type == "expenses" else None)
+            except LedgerError as e:
+                result.errors.append((line_number, str(e)))
+                continue
+            if remaining is not None:
+                key = duplicate_key(tx_type, transaction)
+                if remaining[key] > 0:
+                    remaining[key] -= 1
+                    result.duplicates += 1
+                    continue
+            if tx_type == "expenses" and not category: uncategorized.append(transaction)
+            result.transactions.append((tx_type, transaction))
+    if classifier is not None and uncategorized:
+        predictions = classifier.classify_many([transaction["description"] for transaction in uncategorized])
+        for transaction, (category, confidence) in zip(uncategorized, predictions):
+            if category is not None and confidence >= MIN_CONFIDENCE:
+                transaction["category"] = category
+                result.classified += 1
+    if progress is not None: progress(1.0)
+    return result
+
+
+# Import en arrière-plan : la lecture et la validation tournent dans un thread, le thread Tk appelle poll()
+# pour suivre la progression puis récupérer le résultat (ImportResult ou exception)
+class StatementImport:
+    def __init__(self, path, existing=None, classifier=None):
+        self.events = queue.Queue()
+        self.thread = threading.Thread(target=self._run, args=(path, existing, classifier), daemon=True)
+
+    def start(self):
+        self.thread.start()
+
+    def _run(self, path, existing, classifier):
+        try:
+            result = parse_statement(path, existing, progress=lambda fraction: self.events.put(("progress", fraction)), classifier=classifier)
+            self.events.put(("done", result))
+        except (OSError, ValueError, csv.Error) as e:
+            self.events.put(("error", e))
+
+    # Retourne (dernière progression connue ou None, résultat final ou None, erreur ou None)
+    def poll(self):
+        fraction, result, error = None, None, None
+        while True:
+            try: kind, value = self.events.get_nowait()
+            except queue.Empty: break
+            if kind == "progress": fraction = value
+            elif kind == "done": result = value
+            else: error = value
+        return fraction, result, error
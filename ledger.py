@@ -0,0 +1,627 @@
+# Calculs sur les transactions, indépendants de l'interface graphique
+import bisect # Pour garder les index secondaires triés
+import gc # Ramasse-miettes suspendu pendant le chargement (voir bulk_load)
+import hashlib # Pour l'empreinte des totaux
+import json # Pour l'empreinte des totaux
+import sys # Pour sys.intern (un seul objet chaîne par mois, description, date et catégorie)
+import threading # Verrou du stockage (partagé avec le thread d'écriture)
+from array import array # Index secondaires compacts (entiers 64 bits)
+from collections import defaultdict # Pour les totaux par catégorie et par mois
+from collections.abc import MutableMapping # Transaction s'utilise comme un dictionnaire
+from contextlib import contextmanager # Pour bulk_load
+from datetime import datetime # Pour analyser les dates
+
+# Cache des dates déjà analysées : date AAAA-MM-JJ -> (ordinal, mois AAAA-MM) ou None si invalide
+# Les mêmes dates reviennent très souvent, chaque chaîne distincte n'est analysée qu'une fois
+_parsed_dates = {}
+_PARSED_DATES_LIMIT = 100000
+
+
+# Analyse une date AAAA-MM-JJ en (numéro de jour ordinal, mois AAAA-MM), ou None si la date est invalide
+def parse_date(date_str):
+    try:
+        return _parsed_dates[date_str]
+    except KeyError:
+        pass
+    except TypeError: # Valeur non hachable (date absente ou mal formée dans le fichier)
+        return None
+    try:
+        parsed = datetime.strptime(date_str, '%Y-%m-%d')
+        result = (parsed.toordinal(), sys.intern(parsed.strftime('%Y-%m')))
+    except (ValueError, TypeError):
+        result = None
+    if len(_parsed_dates) < _PARSED_DATES_LIMIT: _parsed_dates[date_str] = result
+    return result
+
+# Mois (AAAA-MM) d'une date AAAA-MM-JJ, ou None si la date est invalide
+def month_of(date_str):
+    parsed = parse_date(date_str)
+    return parsed[1] if parsed else None
+
+# Catégorie utilisée pour l'analyse d'une dépense
+def category_of(tx):
+    return tx.get('category', 'Non Catégorisé')
+
+
+# Transaction en mémoire : un objet à attributs fixes (__slots__) au lieu d'un dictionnaire, environ trois fois
+# plus petit ; les descriptions, dates et catégories sont partagées (sys.intern) au lieu d'être répétées
+# S'utilise comme un dictionnaire (tx["amount"], tx.get("category"), dict(tx)) : un champ absent du fichier
+# est un attribut non défini, les clés inconnues sont gardées dans un petit dictionnaire à part
+class Transaction(MutableMapping):
+    __slots__ = ("id", "description", "amount", "date", "category", "_extra")
+    FIELDS = ("id", "description", "amount", "date", "category") # Dans l'ordre d'écriture du fichier
+    _FIELD_SET = frozenset(FIELDS)
+
+    # Convertit un dictionnaire lu dans le fichier (une Transaction est retournée telle quelle)
+    # Boucle équivalente à tx[key] = value, sans un appel de méthode par champ (chargement d'un million de transactions)
+    @classmethod
+    def from_dict(cls, values):
+        if type(values) is cls: return values
+        tx = cls()
+        fields, intern = cls._FIELD_SET, sys.intern
+        for key, value in values.items():
+            if key in fields: setattr(tx, key, intern(value) if type(value) is str else value)
+            else: tx[key] = value
+        return tx
+
+    def __getitem__(self, key):
+        if key in Transaction._FIELD_SET:
+            try: return getattr(self, key)
+            except AttributeError: raise KeyError(key) from None
+        try: return self._extra[key]
+        except AttributeError: raise KeyError(key) from None
+
+    def __setitem__(self, key, value):
+        if key in Transaction._FIELD_SET: setattr(self, key, sys.intern(value) if type(value) is str else value)
+        else:
+            try: self._extra[key] = value
+            except AttributeError: self._extra = {key: value}
+
+    def __delitem__(self, key):
+        if key in Transaction._FIELD_SET:
+            try: delattr(self, key)
+            except AttributeError: raise KeyError(key) from None
+        else:
+            try: del self._extra[key]
+            except AttributeError: raise KeyError(key) from None
+
+    # Plus rapides que les versions génériques de MutableMapping (appelées pour chaque transaction affichée ou comptée)
+    def get(self, key, default=None):
+        if key in Transaction._FIELD_SET: return getattr(self, key, default)
+        try: return self._extra.get(key, default)
+        except AttributeError: return default
+
+    def __contains__(self, key):
+        if key in Transaction._FIELD_SET: return hasattr(self, key)
+        return hasattr(self, "_extra") and key in self._extra
+
+    def __iter__(self):
+        for key in Transaction.FIELDS:
+            if hasattr(self, key): yield key
+        if hasattr(self, "_extra"): yield from self._extra
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+    def __repr__(self):
+        return f"Transaction({dict(self)!r})"
+
+    # Pour copy et pickle
+    def __reduce__(self):
+        return Transaction.from_dict, (dict(self),)
+
+
+# Chargement d'un registre : le ramasse-miettes est suspendu pendant la création des transactions (il parcourrait
+# à chaque collecte toutes celles déjà créées, qui ne forment aucun cycle), puis remis dans son état précédent
+# Écarter ensuite les objets chargés des collectes suivantes (gc.freeze) est laissé à l'application
+@contextmanager
+def bulk_load():
+    enabled = gc.isenabled()
+    gc.disable()
+    try: yield
+    finally:
+        if enabled: gc.enable()
+
+
+# Totaux tenus à jour à chaque ajout/suppression (en O(1)) au lieu d'être recalculés à chaque affichage :
+# total des revenus et des dépenses, dépenses par catégorie, revenus/dépenses par mois et mois disponibles
+class LedgerAggregates:
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.total_income = 0.0
+        self.total_expenses = 0.0
+        self.income_count = 0
+        self.expense_count = 0
+        self.category_totals = defaultdict(float) # catégorie -> total dépensé
+        self.category_counts = defaultdict(int) # catégorie -> nombre de dépenses
+        self.month_totals = defaultdict(lambda: [0.0, 0.0]) # mois -> [revenus, dépenses]
+        self.month_counts = defaultdict(int) # mois -> nombre de transactions
+        self.version = 0 # Incrémenté à chaque modification des données
+
+    # Recalcule tout à partir des listes de transactions
+    def rebuild(self, data):
+        self.reset()
+        for tx in data.get('income', []): self._apply('income', tx, 1)
+        for tx in data.get('expenses', []): self._apply('expenses', tx, 1)
+
+    # Initialise les totaux à partir de lignes déjà groupées (type, mois, catégorie, somme, nombre),
+    # par exemple le résultat d'un GROUP BY SQL
+    def load_grouped(self, rows):
+        self.reset()
+        for tx_type, month, category, amount, count in rows:
+            self._apply_amount(tx_type, month, category, amount, count)
+
+    def add(self, tx_type, tx):
+        self._apply(tx_type, tx, 1)
+        self.version += 1
+
+    def remove(self, tx_type, tx):
+        self._apply(tx_type, tx, -1)
+        self.version += 1
+
+    def _apply(self, tx_type, tx, sign):
+        category = category_of(tx) if tx_type == 'expenses' else None
+        self._apply_amount(tx_type, month_of(tx.get('date')), category, sign * tx.get('amount', 0), sign)
+
+    def _apply_amount(self, tx_type, month, category, amount, count):
+        if tx_type == 'expenses':
+            self.total_expenses += amount
+            self.expense_count += count
+            self.category_totals[category] += amount
+            self.category_counts[category] += count
+            if self.category_counts[category] <= 0: # Plus aucune dépense : retirer la catégorie de l'analyse
+                del self.category_totals[category]
+                del self.category_counts[category]
+        else:
+            self.total_income += amount
+            self.income_count += count
+        if month is not None:
+            self.month_totals[month][0 if tx_type == 'income' else 1] += amount
+            self.month_counts[month] += count
+            if self.month_counts[month] <= 0:
+                del self.month_totals[month]
+                del self.month_counts[month]
+        # Éviter les résidus d'arrondi quand tout a été supprimé
+        if self.income_count == 0: self.total_income = 0.0
+        if self.expense_count == 0: self.total_expenses = 0.0
+
+    # Liste des mois disponibles, du plus récent au plus ancien
+    def available_months(self):
+        return sorted(self.month_counts, reverse=True)
+
+    # Empreinte des totaux, identique d'une session à l'autre tant que les données ne changent pas
+    # (contrairement à version, remis à zéro au chargement) ; sert de version des données au cache du chat
+    def fingerprint(self):
+        parts = [round(self.total_income, 2), round(self.total_expenses, 2), self.income_count, self.expense_count,
+                 sorted((category, round(total, 2), self.category_counts[category]) for category, total in self.category_totals.items()),
+                 sorted((month, round(totals[0], 2), round(totals[1], 2), self.month_counts[month]) for month, totals in self.month_totals.items())]
+        return hashlib.sha1(json.dumps(parts, ensure_ascii=False).encode('utf-8')).hexdigest()[:16]
+
+    # Compare les totaux tenus à jour avec un recalcul complet ; retourne la liste des écarts trouvés
+    def verify(self, data, tolerance=0.01):
+        expected = LedgerAggregates()
+        expected.rebuild(data)
+        errors = []
+        close = lambda a, b: abs(a - b) <= tolerance
+        if not close(self.total_income, expected.total_income):
+            errors.append(f"Revenu total: {self.total_income} au lieu de {expected.total_income}")
+        if not close(self.total_expenses, expected.total_expenses):
+            errors.append(f"Dépense totale: {self.total_expenses} au lieu de {expected.total_expenses}")
+        if (self.income_count, self.expense_count) != (expected.income_count, expected.expense_count):
+            errors.append(f"Nombre de transactions: {(self.income_count, self.expense_count)} au lieu de {(expected.income_count, expected.expense_count)}")
+        for category in set(self.category_totals) | set(expected.category_totals):
+            if not close(self.category_totals.get(category, 0.0), expected.category_totals.get(category, 0.0)):
+                errors.append(f"Catégorie {category}: {self.category_totals.get(category)} au lieu de {expected.category_totals.get(category)}")
+        for month in set(self.month_totals) | set(expected.month_totals):
+            actual = self.month_totals.get(month, [0.0, 0.0])
+            wanted = expected.month_totals.get(month, [0.0, 0.0])
+            if not (close(actual[0], wanted[0]) and close(actual[1], wanted[1])):
+                errors.append(f"Mois {month}: {actual} au lieu de {wanted}")
+        if set(self.month_counts) != set(expected.month_counts):
+            errors.append(f"Mois disponibles: {sorted(self.month_counts)} au lieu de {sorted(expected.month_counts)}")
+        return errors
+
+
+# Clé de tri d'une transaction : un seul entier (jour ordinal, puis identifiant) pour des listes triées compactes
+# et des comparaisons rapides ; l'identifiant se retrouve avec id_of_key
+# Seuls les identifiants de 1 à MAX_ID - 1 tiennent dans une clé : les autres sont réattribués au chargement
+_KEY_ID_BITS = 40
+MAX_ID = 1 << _KEY_ID_BITS
+
+def sort_key(ordinal, tx_id):
+    return (ordinal << _KEY_ID_BITS) | tx_id
+
+def id_of_key(key):
+    return key & ((1 << _KEY_ID_BITS) - 1)
+
+
+# Index des transactions par identifiant unique : id -> position dans la liste data[type] (type compris, voir _location)
+# Permet de retrouver et supprimer une transaction en O(1) sans comparer les valeurs affichées
+# Les identifiants attribués par l'application se suivent : les positions sont rangées dans un tableau indexé
+# par identifiant (-1 : identifiant libre), seuls les identifiants très éloignés vont dans un dictionnaire
+# Garde aussi des index secondaires triés par date (toutes les transactions, par mois, par catégorie de dépense),
+# dans des tableaux d'entiers 64 bits (array) : 8 octets par clé au lieu d'un objet int par clé
+_TYPES = ("income", "expenses")
+_NO_LOCATION = -1
+
+def _location(tx_type, position):
+    return (position << 1) | (tx_type == "expenses")
+
+def _sorted_keys(keys=()):
+    return array('q', sorted(keys))
+
+
+class TransactionIndex:
+    def __init__(self):
+        self.locations = array('q') # Identifiant -> position (voir _location), ou _NO_LOCATION
+        self.sparse_locations = {} # Identifiants hors du tableau (très éloignés des autres) -> position
+        self.invalid_dates = [] # Transactions dont la date est invalide (exclues des filtres et du tri)
+        self.sorted_keys = _sorted_keys() # Clés de tri de toutes les transactions datées, par ordre croissant
+        self.by_month = defaultdict(_sorted_keys) # mois -> clés triées
+        self.by_category = defaultdict(_sorted_keys) # catégorie -> clés triées (dépenses seulement)
+        self.next_id = 1
+
+    # Construit l'index à partir des données chargées et attribue un identifiant aux transactions
+    # qui n'en ont pas (anciens fichiers), dont l'identifiant est en double ou hors de 1..MAX_ID - 1 (il ne tiendrait
+    # pas dans une clé de tri) ; retourne le nombre d'identifiants attribués
+    def rebuild(self, data):
+        count = sum(len(data.get(tx_type, [])) for tx_type in _TYPES)
+        self.locations = array('q', [_NO_LOCATION]) * (count + 1) # Assez grand pour des identifiants 1..count
+        self.sparse_locations = {}
+        self.invalid_dates = []
+        missing = []
+        sorted_keys, by_month, by_category = [], defaultdict(list), defaultdict(list) # Listes, triées une fois à la fin
+        locations, size = self.locations, len(self.locations) # Accès locaux : boucle de chargement
+        for tx_type in _TYPES:
+            expense = tx_type == 'expenses'
+            for position, tx in enumerate(data.get(tx_type, [])):
+                tx_id = tx.get('id')
+                if type(tx_id) is not int or not 0 < tx_id < MAX_ID:
+                    missing.append((tx_type, position, tx))
+                    continue
+                if 0 <= tx_id < size:
+                    if locations[tx_id] != _NO_LOCATION: # Identifiant en double
+                        missing.append((tx_type, position, tx))
+                        continue
+                    locations[tx_id] = (position << 1) | expense
+                elif self.location_of(tx_id) is None:
+                    self._set_location(tx_id, (position << 1) | expense)
+                    size = len(locations) # Le tableau a pu s'agrandir
+                else:
+                    missing.append((tx_type, position, tx))
+                    continue
+                parsed = parse_date(tx.get('date'))
+                if parsed is None:
+                    self.invalid_dates.append(tx)
+                    continue
+                key = (parsed[0] << _KEY_ID_BITS) | tx_id
+                sorted_keys.append(key)
+                by_month[parsed[1]].append(key)
+                if expense:
+                    category = tx.get('category')
+                    if category is not None: by_category[category].append(key)
+        # Un seul tri par liste au chargement, les ajouts suivants sont insérés à leur place
+        self.sorted_keys = _sorted_keys(sorted_keys)
+        del sorted_keys # Libéré avant de convertir les index par mois et par catégorie
+        self.by_month = defaultdict(_sorted_keys, ((month, _sorted_keys(keys)) for month, keys in by_month.items()))
+        self.by_category = defaultdict(_sorted_keys, ((category, _sorted_keys(keys)) for category, keys in by_category.items()))
+        last_dense = next((tx_id for tx_id in range(len(locations) - 1, 0, -1) if locations[tx_id] != _NO_LOCATION), 0)
+        self.next_id = max(last_dense, max(self.sparse_locations, default=0)) + 1
+        for tx_type, position, tx in missing:
+            tx['id'] = self.new_id()
+            self._set_location(tx['id'], _location(tx_type, position))
+            self._register(tx_type, tx)
+        return len(missing)
+
+    # Position d'un identifiant (voir _location), ou None s'il est inconnu
+    def location_of(self, tx_id):
+        if 0 <= tx_id < len(self.locations):
+            location = self.locations[tx_id]
+            return None if location == _NO_LOCATION else location
+        return self.sparse_locations.get(tx_id)
+
+    # Le tableau s'agrandit pour les identifiants proches de sa fin (nouveaux identifiants)
+    def _set_location(self, tx_id, location):
+        size = len(self.locations)
+        if size <= tx_id < 2 * size + 1024:
+            self.locations.extend(array('q', [_NO_LOCATION]) * (max(tx_id + 1, 2 * size) - size))
+        if 0 <= tx_id < len(self.locations): self.locations[tx_id] = location
+        else: self.sparse_locations[tx_id] = location
+
+    def _pop_location(self, tx_id):
+        location = self.location_of(tx_id)
+        if location is not None:
+            if 0 <= tx_id < len(self.locations): self.locations[tx_id] = _NO_LOCATION
+            else: del self.sparse_locations[tx_id]
+        return location
+
+    # Identifiants indexés
+    def ids(self):
+        yield from (tx_id for tx_id, location in enumerate(self.locations) if location != _NO_LOCATION)
+        yield from self.sparse_locations
+
+    # Clé de tri d'une transaction (None si sa date est invalide)
+    @staticmethod
+    def key_of(tx):
+        parsed = parse_date(tx.get('date'))
+        return None if parsed is None else sort_key(parsed[0], tx['id'])
+
+    # Index secondaires d'une transaction datée : liste de (clés triées, dictionnaire propriétaire, nom)
+    def _key_lists(self, tx_type, tx, parsed):
+        lists = [(self.sorted_keys, None, None), (self.by_month[parsed[1]], self.by_month, parsed[1])]
+        if tx_type == 'expenses' and tx.get('category') is not None:
+            lists.append((self.by_category[tx['category']], self.by_category, tx['category']))
+        return lists
+
+    # Analyse la date et ajoute la transaction aux index secondaires
+    def _register(self, tx_type, tx, sort=True):
+        parsed = parse_date(tx.get('date'))
+        if parsed is None:
+            self.invalid_dates.append(tx)
+            return
+        key = sort_key(parsed[0], tx['id'])
+        for keys, _, _ in self._key_lists(tx_type, tx, parsed):
+            if sort: bisect.insort(keys, key)
+            else: keys.append(key)
+
+    # Retire la transaction des index secondaires
+    def _unregister(self, tx_type, tx):
+        parsed = parse_date(tx.get('date'))
+        if parsed is None: return
+        key = sort_key(parsed[0], tx['id'])
+        for keys, owner, name in self._key_lists(tx_type, tx, parsed):
+            position = bisect.bisect_left(keys, key)
+            if position < len(keys) and keys[position] == key: del keys[position]
+            if owner is not None and not keys: del owner[name] # Mois ou catégorie vide
+
+    # Nouvel identifiant, jamais utilisé pendant cette session
+    def new_id(self):
+        tx_id = self.next_id
+        self.next_id += 1
+        return tx_id
+
+    # Enregistre une transaction qui vient d'être ajoutée à la fin de data[tx_type]
+    def add(self, data, tx_type, tx):
+        self._set_location(tx['id'], _location(tx_type, len(data[tx_type]) - 1))
+        self._register(tx_type, tx)
+
+    # Enregistre un lot de transactions qui viennent d'être ajoutées à la fin des listes (liste de (type, transaction))
+    # Les listes triées ne sont triées qu'une fois à la fin, au lieu d'une insertion triée par transaction
+    def add_many(self, data, items):
+        positions = {tx_type: len(data[tx_type]) - sum(1 for t, _ in items if t == tx_type) for tx_type in _TYPES}
+        touched = {}
+        for tx_type, tx in items:
+            self._set_location(tx['id'], _location(tx_type, positions[tx_type]))
+            positions[tx_type] += 1
+            self._register(tx_type, tx, sort=False)
+            parsed = parse_date(tx.get('date'))
+            if parsed is not None:
+                for keys, _, _ in self._key_lists(tx_type, tx, parsed): touched[id(keys)] = keys
+        for keys in touched.values(): keys[:] = _sorted_keys(keys) # Chaque liste modifiée, une seule fois
+
+    # Retourne (type, transaction) pour un identifiant, ou None s'il est inconnu
+    def get(self, data, tx_id):
+        location = self.location_of(tx_id)
+        if location is None: return None
+        tx_type = _TYPES[location & 1]
+        return tx_type, data[tx_type][location >> 1]
+
+    # Supprime des transactions par identifiant, en O(1) chacune : la dernière transaction de la liste
+    # prend la place libérée (l'ordre des listes n'a pas d'importance, l'affichage est trié par date puis id)
+    # Retourne la liste des (type, transaction) supprimées ; les identifiants inconnus sont ignorés
+    def remove(self, data, tx_ids):
+        removed = []
+        for tx_id in tx_ids:
+            location = self._pop_location(tx_id)
+            if location is None: continue
+            tx_type, position = _TYPES[location & 1], location >> 1
+            tx_list = data[tx_type]
+            removed.append((tx_type, tx_list[position]))
+            self._unregister(tx_type, tx_list[position])
+            last = tx_list.pop()
+            if position < len(tx_list):
+                tx_list[position] = last
+                self._set_location(last['id'], _location(tx_type, position))
+        return removed
+
+    # Clés des transactions d'un mois et/ou d'une catégorie (None = pas de filtre), de la plus récente à la plus ancienne
+    # Mois + catégorie : intersection des deux index, en ne gardant de la liste de la catégorie
+    # que la plage de clés couverte par le mois (les deux listes sont triées par date)
+    def query(self, month=None, category=None):
+        if month is None and category is None:
+            keys = self.sorted_keys
+        elif category is None:
+            keys = self.by_month.get(month, [])
+        elif month is None:
+            keys = self.by_category.get(category, [])
+        else:
+            month_keys = self.by_month.get(month)
+            category_keys = self.by_category.get(category)
+            if not month_keys or not category_keys: return []
+            start = bisect.bisect_left(category_keys, month_keys[0])
+            end = bisect.bisect_right(category_keys, month_keys[-1])
+            keys = category_keys[start:end]
+        return keys[::-1]
+
+
+# Erreur de validation d'une transaction ; le message peut être affiché tel quel à l'utilisateur
+class LedgerError(ValueError):
+    pass
+
+
+CLASSIFIER_TRAINING_ROWS = 5000 # Stockage par mois : transactions récentes chargées pour apprendre le classement
+
+
+# Moteur du registre, sans interface graphique : données en mémoire, index, totaux tenus à jour
+# et enregistrements à sauvegarder pour chaque modification. Utilisé par BudgetApp et par les rapports en ligne
+# de commande ; storage est l'un des stockages de storage.py (passé en paramètre : ce module n'en dépend pas)
+class Ledger:
+    def __init__(self, storage, verify=False):
+        self.storage = storage
+        self.verify_enabled = verify # Compare les totaux avec un recalcul complet après chaque modification
+        self.data = {"income": [], "expenses": []}
+        self.index = TransactionIndex() # Identifiant -> transaction (suppressions en O(1)) et index par mois/catégorie
+        self.aggregates = LedgerAggregates() # Totaux précalculés pour le tableau de bord et l'analyse
+        self.classifier = None # Classement automatique des dépenses, créé par category_classifier
+        self.storage_lock = threading.RLock() # Protège le stockage quand un thread d'écriture l'utilise aussi
+        self.writer = None # Écriture en arrière-plan (storage.BackgroundWriter) ; None : save écrit directement
+
+    # Lit les données depuis le stockage ; retourne le nombre d'identifiants attribués (voir attach)
+    def load(self):
+        with self.storage_lock, bulk_load(): return self.attach(self.storage.load())
+
+    # Utilise des données déjà chargées : construit l'index et les totaux
+    # Retourne le nombre d'identifiants attribués aux transactions qui n'en avaient pas (à enregistrer avec save)
+    def attach(self, data):
+        self.data = data
+        backfilled = self.index.rebuild(data)
+        # Stockage par mois : les identifiants des mois non chargés ne doivent pas être réattribués
+        if self.storage.loads_lazily:
+            with self.storage_lock: self.index.next_id = max(self.index.next_id, self.storage.max_id() + 1)
+        self.rebuild_aggregates()
+        self.classifier = None
+        return backfilled
+
+    # Stockage par mois (ShardedStorage) : charge les mois pas encore en mémoire (months=None : tous) et les ajoute
+    # aux données et à l'index ; les agrégats, lus dans le manifeste, les comptent déjà
+    # Retourne le nombre de transactions chargées (toujours 0 avec les autres stockages, qui chargent tout)
+    def ensure_loaded(self, months=None):
+        if not self.storage.loads_lazily: return 0
+        with self.storage_lock: loaded = self.storage.load_months(months)
+        if not loaded: return 0
+        for tx_type, transaction in loaded: self.data[tx_type].append(transaction)
+        self.index.add_many(self.data, loaded)
+        if self.classifier is not None:
+            for tx_type, transaction in loaded:
+                if tx_type == "expenses": self.classifier.learn(transaction["description"], transaction.get("category"))
+        return len(loaded)
+
+    # Charge les mois les plus récents jusqu'à avoir au moins rows transactions (de la catégorie, si elle est donnée) :
+    # les rows premières lignes d'une requête sans filtre de mois sont alors définitives
+    def load_recent(self, rows, category=None):
+        if not self.storage.loads_lazily: return 0
+        with self.storage_lock: months = self.storage.recent_months(rows, category)
+        return self.ensure_loaded(months)
+
+    # Vrai s'il reste des transactions (de la catégorie, si elle est donnée) dans des mois non chargés
+    def has_unloaded(self, category=None):
+        if not self.storage.loads_lazily: return False
+        with self.storage_lock: return self.storage.has_unloaded(category)
+
+    def fully_loaded(self):
+        if not self.storage.loads_lazily: return True
+        with self.storage_lock: return self.storage.all_loaded()
+
+    # Classement automatique des dépenses (classifier.CategoryClassifier), appris à la première utilisation
+    # à partir des dépenses catégorisées, puis tenu à jour par add, add_many et delete
+    # (avec le stockage par mois, appris sur les mois récents puis sur chaque mois chargé ensuite)
+    def category_classifier(self):
+        if self.classifier is None:
+            from classifier import CategoryClassifier
+            self.load_recent(CLASSIFIER_TRAINING_ROWS)
+            classifier = CategoryClassifier()
+            classifier.train((tx.get("description", ""), tx["category"]) for tx in self.data["expenses"] if tx.get("category"))
+            self.classifier = classifier
+        return self.classifier
+
+    # Recalcule complètement les agrégats (au chargement) ; avec SQLite, à partir d'un GROUP BY indexé
+    # (stockage par mois : à partir des totaux du manifeste, sans lire les mois ; binaire : sur les enregistrements bruts)
+    def rebuild_aggregates(self):
+        if self.storage.provides_totals:
+            with self.storage_lock: rows = self.storage.grouped_totals()
+            self.aggregates.load_grouped(rows)
+        else: self.aggregates.rebuild(self.data)
+
+    # Sauvegarde : réécriture complète, ou ajout des modifications (records) en fin de journal
+    # Avec un thread d'écriture (writer), la version actuelle lui est seulement confiée : save revient sans attendre le disque
+    def save(self, records=None):
+        if records is None: self.ensure_loaded() # Réécriture complète : tous les mois doivent être en mémoire
+        if self.writer is not None:
+            self.writer.submit(self.data, records)
+            return
+        with self.storage_lock:
+            if records is None: self.storage.save(self.data)
+            else: self.storage.append(self.data, records)
+
+    # Vérifie et construit une transaction à partir des valeurs saisies (sans identifiant)
+    # Lève LedgerError si la description est vide, le montant invalide ou la date mal formée
+    @staticmethod
+    def make_transaction(description, amount, date_str, category=None):
+        description = description.strip()
+        if not description:
+            raise LedgerError("La description ne peut pas être vide.")
+        try:
+            amount = float(amount)
+            if amount <= 0:
+                raise ValueError("Le montant doit être positif.")
+        except (ValueError, TypeError):
+            raise LedgerError("Veuillez entrer un montant numérique valide et positif.")
+        if parse_date(date_str) is None:
+            raise LedgerError("Format de date invalide. Utilisez AAAA-MM-JJ.")
+        transaction = {"description": description, "amount": amount, "date": date_str}
+        if category is not None: transaction["category"] = category
+        return transaction
+
+    # Ajoute une transaction (construite par make_transaction) ; retourne les enregistrements à sauvegarder
+    def add(self, tx_type, transaction):
+        self.ensure_loaded([month_of(transaction["date"])]) # Stockage par mois : le mois modifié doit être chargé
+        transaction = Transaction.from_dict(dict(transaction, id=self.index.new_id()))
+        self.data[tx_type].append(transaction)
+        self.index.add(self.data, tx_type, transaction)
+        self.aggregates.add(tx_type, transaction)
+        if self.classifier is not None and tx_type == "expenses": self.classifier.learn(transaction["description"], transaction.get("category"))
+        self.verify()
+        return [{"op": "add", "type": tx_type, "tx": transaction}]
+
+    # Ajoute un lot de transactions (liste de (type, transaction construite par make_transaction)) en une fois :
+    # index trié une seule fois et un seul enregistrement à sauvegarder par transaction, à écrire ensemble
+    # Retourne (transactions ajoutées avec leur identifiant, enregistrements à sauvegarder)
+    def add_many(self, items):
+        self.ensure_loaded({month_of(transaction["date"]) for _, transaction in items})
+        added = []
+        for tx_type, transaction in items:
+            transaction = Transaction.from_dict(dict(transaction, id=self.index.new_id()))
+            self.data[tx_type].append(transaction)
+            self.aggregates.add(tx_type, transaction)
+            if self.classifier is not None and tx_type == "expenses": self.classifier.learn(transaction["description"], transaction.get("category"))
+            added.append((tx_type, transaction))
+        self.index.add_many(self.data, added)
+        self.verify()
+        return added, [{"op": "add", "type": tx_type, "tx": transaction} for tx_type, transaction in added]
+
+    # Supprime des transactions par identifiant ; retourne (liste des (type, transaction) supprimées,
+    # enregistrements à sauvegarder). Les identifiants inconnus sont ignorés
+    def delete(self, tx_ids):
+        removed = self.index.remove(self.data, tx_ids)
+        deleted_ids = {"income": [], "expenses": []}
+        for tx_type, transaction in removed:
+            self.aggregates.remove(tx_type, transaction)
+            if self.classifier is not None and tx_type == "expenses": self.classifier.forget(transaction["description"], transaction.get("category"))
+            deleted_ids[tx_type].append(transaction["id"])
+        if removed: self.verify()
+        return removed, [{"op": "delete", "type": tx_type, "ids": ids} for tx_type, ids in deleted_ids.items() if ids]
+
+    # Clés de tri (voir sort_key) des transactions d'un mois et/ou d'une catégorie, de la plus récente à la plus ancienne
+    def query(self, month=None, category=None):
+        return self.index.query(month=month, category=category)
+
+    # Retourne (type, transaction) pour un identifiant, ou None s'il est inconnu
+    def get(self, tx_id):
+        return self.index.get(self.data, tx_id)
+
+    # Catégories présentes dans les dépenses (stockage par mois partiellement chargé : celles des agrégats)
+    def expense_categories(self):
+        if not self.fully_loaded(): return set(self.aggregates.category_counts)
+        return {tx["category"] for tx in self.data["expenses"] if "category" in tx}
+
+    # En mode vérification, compare les agrégats avec un recalcul complet ; recalcule tout en cas d'écart
+    def verify(self):
+        if not self.verify_enabled or not self.fully_loaded(): return # La vérification a besoin de toutes les transactions
+        errors = self.aggregates.verify(self.data)
+        if errors:
+            print("Erreur: agrégats incohérents, recalcul complet:\n  " + "\n  ".join(errors))
+            version = self.aggregates.version
+            self.aggregates.rebuild(self.data)
+            self.aggregates.version = version + 1
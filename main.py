@@ -1,17 +1,101 @@
 # Fichier principal pour lancer l'application les ✌️
 
-# Cette ligne sert importer la classe BudgetApp depuis le fichier app.py
-from app import BudgetApp
-# On importe aussi customtkinter pour pouvoir définir le thème avant de lancer l'app (Claire ou sombre)
-import customtkinter as ctk
+# Heure de lancement, pour mesurer le temps jusqu'à l'affichage de la fenêtre
+import time
+START_TIME = time.perf_counter()
 
-ctk.set_appearance_mode("dark")  
+import argparse
+import os
+import sys
+import config # Paramètres de l'application, modifiables par les options de la ligne de commande
+import perf # Mesures de performance (activées par --perf ou BUDGET_PERF=1)
+
+
+# Options de la ligne de commande (lues avant d'importer l'application, qui dépend de config)
+# Sans commande : lance l'interface ; "report" : rapport sans interface (voir reports.py) ;
+# "convert" : conversion sans perte entre le format JSON et le format binaire (voir storage.py)
+def parse_args():
+    parser = argparse.ArgumentParser(description="Suivi Budget Étudiant")
+    parser.add_argument("--perf", action="store_true", help="active les mesures de performance (écran Performance)")
+    commands = parser.add_subparsers(dest="command")
+    report = commands.add_parser("report", help="affiche les totaux, par catégorie et par mois, sans ouvrir l'interface")
+    report.add_argument("--data-file", default=os.path.join(os.path.dirname(os.path.abspath(__file__)), "budget_data.json"),
+                        help="fichier de données (budget_data.json ; le journal ou la base SQLite sont trouvés à côté)")
+    report.add_argument("--storage", choices=["json", "journal", "sqlite", "sharded", "binary"], default=config.STORAGE_MODE, help="mode de stockage")
+    report.add_argument("--month", help="ne garder que ce mois (AAAA-MM)")
+    report.add_argument("--category", help="ne garder que les dépenses de cette catégorie")
+    report.add_argument("--type", choices=["income", "expenses"], help="ne garder que les revenus ou les dépenses")
+    report.add_argument("--format", choices=["text", "json"], default="text", help="format du rapport")
+    report.add_argument("--export", help="exporte les transactions filtrées (.csv ou .jsonl)")
+    convert = commands.add_parser("convert", help="convertit un fichier de données entre JSON (.json) et binaire (.bin)")
+    convert.add_argument("source", help="fichier à lire (.json ou .bin)")
+    convert.add_argument("destination", help="fichier à écrire (.json ou .bin)")
+    return parser.parse_args()
+
+
+# Commande "report" : n'importe que le registre et le stockage (ni customtkinter ni matplotlib)
+# Retourne le code de sortie (1 si les données ne peuvent pas être lues ou l'export écrit)
+def run_report_command(args):
+    import sqlite3
+    from reports import run_report
+    from storage import create_storage
+    if not os.path.isdir(os.path.dirname(os.path.abspath(args.data_file))):
+        # Sans ce contrôle, les modes "sharded" et "binary" créeraient leurs fichiers dans un dossier inexistant
+        print(f"Erreur: dossier introuvable pour le fichier de données {args.data_file}", file=sys.stderr)
+        return 1
+    try:
+        storage = create_storage(args.storage, args.data_file, config.JOURNAL_COMPACT_THRESHOLD)
+        run_report(storage, month=args.month, category=args.category, type_filter=args.type,
+                   output_format=args.format, export_path=args.export)
+    except (OSError, ValueError, sqlite3.Error) as e:
+        print(f"Erreur: impossible de produire le rapport à partir de {args.data_file}: {e}", file=sys.stderr)
+        return 1
+    return 0
+
+
+# Commande "convert" : les transactions sont recopiées telles quelles (montants, dates et clés inconnues compris)
+# Retourne le code de sortie (1 si la source ne peut pas être lue ou la destination écrite)
+def run_convert_command(args):
+    from storage import read_ledger_file, write_ledger_file
+    try:
+        data = read_ledger_file(args.source)
+        write_ledger_file(args.destination, data)
+    except (OSError, ValueError) as e:
+        print(f"Erreur: impossible de convertir {args.source} vers {args.destination}: {e}", file=sys.stderr)
+        return 1
+    count = len(data.get("income", [])) + len(data.get("expenses", []))
+    print(f"{count} transaction(s) convertie(s) de {args.source} vers {args.destination}")
+    return 0
+
+
+# Mesure le temps écoulé entre le lancement et la première fenêtre dessinée ; avec les mesures de performance,
+# il est enregistré (écran Performance) et affiché dans la console
+def report_startup_time(app):
+    app.update_idletasks() # Finir l'affichage en attente avant de mesurer
+    app.startup_seconds = time.perf_counter() - START_TIME
+    if perf.enabled():
+        perf.record("startup", app.startup_seconds)
+        print(f"Fenêtre affichée en {app.startup_seconds * 1000:.0f} ms")
 
-ctk.set_default_color_theme("blue")  
 
 if __name__ == "__main__":
-    
+    args = parse_args()
+    if args.perf: config.PERF_ENABLED = True
+    if args.command == "report":
+        raise SystemExit(run_report_command(args))
+    if args.command == "convert":
+        raise SystemExit(run_convert_command(args))
+
+    # Cette ligne sert importer la classe BudgetApp depuis le fichier app.py
+    from app import BudgetApp
+    # On importe aussi customtkinter pour pouvoir définir le thème avant de lancer l'app (Claire ou sombre)
+    import customtkinter as ctk
+
+    ctk.set_appearance_mode("dark")  
+
+    ctk.set_default_color_theme("blue")  
+
     app = BudgetApp()
+    app.after_idle(report_startup_time, app) # Exécuté dès que la boucle principale a affiché la fenêtre
 
     app.mainloop()
-
@@ -0,0 +1,112 @@
+# Mesures de performance (optionnelles) : nombre d'appels et histogramme des durées par opération
+# Activées avec BUDGET_PERF=1 ou "python main.py --perf". Désactivées, les fonctions décorées
+# sont laissées telles quelles : aucun coût à l'exécution
+import json
+import threading
+import time
+
+import config
+
+# Bornes supérieures (en millisecondes) des classes de l'histogramme ; la dernière classe reçoit le reste
+BUCKET_BOUNDS_MS = (0.1, 0.5, 1, 5, 10, 50, 100, 500, 1000, 5000)
+
+_metrics = {} # Nom de l'opération -> statistiques
+_lock = threading.Lock() # Certaines mesures viennent d'autres threads (chat)
+
+
+def enabled():
+    return config.PERF_ENABLED
+
+
+# Enregistre une durée (en secondes) pour une opération
+def record(name, seconds):
+    ms = seconds * 1000
+    with _lock:
+        stats = _metrics.get(name)
+        if stats is None:
+            stats = _metrics[name] = {"count": 0, "total_ms": 0.0, "min_ms": ms, "max_ms": ms,
+                                      "buckets": [0] * (len(BUCKET_BOUNDS_MS) + 1)}
+        stats["count"] += 1
+        stats["total_ms"] += ms
+        if ms < stats["min_ms"]: stats["min_ms"] = ms
+        if ms > stats["max_ms"]: stats["max_ms"] = ms
+        bucket = 0
+        while bucket < len(BUCKET_BOUNDS_MS) and ms > BUCKET_BOUNDS_MS[bucket]: bucket += 1
+        stats["buckets"][bucket] += 1
+
+
+# Décorateur : mesure chaque appel de la fonction sous le nom donné
+# Le choix est fait à l'import du module décoré : désactivé, la fonction d'origine est retournée
+def timed(name):
+    def decorate(func):
+        if not enabled(): return func
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try: return func(*args, **kwargs)
+            finally: record(name, time.perf_counter() - start)
+        wrapper.__name__, wrapper.__doc__, wrapper.__wrapped__ = func.__name__, func.__doc__, func
+        return wrapper
+    return decorate
+
+
+# Mesure d'un bloc de code : "with perf.measure('nom'):"
+class _Measure:
+    __slots__ = ("name", "start")
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+
+    def __exit__(self, *exc):
+        record(self.name, time.perf_counter() - self.start)
+        return False
+
+
+class _NoMeasure:
+    __slots__ = ()
+    def __enter__(self): pass
+    def __exit__(self, *exc): return False
+
+_NO_MEASURE = _NoMeasure() # Objet unique réutilisé quand les mesures sont désactivées
+
+
+def measure(name):
+    return _Measure(name) if enabled() else _NO_MEASURE
+
+
+# Copie des statistiques, avec la moyenne et les bornes de l'histogramme
+def snapshot():
+    with _lock:
+        result = {}
+        for name, stats in _metrics.items():
+            entry = dict(stats, buckets=list(stats["buckets"]))
+            entry["mean_ms"] = stats["total_ms"] / stats["count"]
+            result[name] = entry
+        return result
+
+
+def reset():
+    with _lock: _metrics.clear()
+
+
+# Texte lisible pour le panneau "Performance"
+def format_report():
+    metrics = snapshot()
+    if not metrics: return "Aucune mesure pour l'instant."
+    labels = [f"≤{bound:g}" for bound in BUCKET_BOUNDS_MS] + [f">{BUCKET_BOUNDS_MS[-1]:g}"]
+    lines = []
+    for name in sorted(metrics):
+        stats = metrics[name]
+        lines.append(f"{name} : {stats['count']} appel(s), moyenne {stats['mean_ms']:.2f} ms, "
+                     f"min {stats['min_ms']:.2f} ms, max {stats['max_ms']:.2f} ms")
+        histogram = ", ".join(f"{label} ms: {count}" for label, count in zip(labels, stats["buckets"]) if count)
+        lines.append(f"    {histogram}")
+    return "\n".join(lines)
+
+
+# Exporte les mesures dans un fichier JSON
+def export_json(path):
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump({"bucket_bounds_ms": list(BUCKET_BOUNDS_MS), "metrics": snapshot()}, f, indent=4)
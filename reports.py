@@ -0,0 +1,128 @@
+# Rapports en ligne de commande : totaux, répartition par catégorie et par mois, export filtré des transactions
+# Les transactions sont lues une à une (iter_transactions du stockage) : la mémoire utilisée ne dépend pas
+# de la taille du registre. Ce module n'importe ni customtkinter ni matplotlib
+import csv # Pour l'export CSV
+import json # Pour le rapport JSON et l'export JSON lines
+import os # Pour l'extension du fichier d'export
+import sys # Messages sur la sortie d'erreur (la sortie standard reste réservée au rapport)
+
+from ledger import LedgerAggregates, month_of # Totaux tenus à jour et mois (AAAA-MM) d'une date
+
+EXPORT_FIELDS = ["id", "type", "date", "description", "amount", "category"]
+
+
+# Vrai si la transaction correspond aux filtres (None = pas de filtre)
+# Comme dans le tableau de l'application, le filtre par catégorie ne garde que des dépenses
+def matches(tx_type, tx, month=None, category=None, type_filter=None):
+    if type_filter is not None and tx_type != type_filter: return False
+    if category is not None and (tx_type != "expenses" or tx.get("category") != category): return False
+    if month is not None and month_of(tx.get("date")) != month: return False
+    return True
+
+
+# Export CSV, écrit au fur et à mesure
+class CsvExporter:
+    def __init__(self, path):
+        self.file = open(path, 'w', encoding='utf-8', newline='')
+        self.writer = csv.writer(self.file)
+        self.writer.writerow(EXPORT_FIELDS)
+
+    def write(self, tx_type, tx):
+        self.writer.writerow([tx.get("id"), tx_type, tx.get("date"), tx.get("description"), tx.get("amount"), tx.get("category", "")])
+
+    def close(self):
+        self.file.close()
+
+
+# Export JSON lines (une transaction par ligne), écrit au fur et à mesure
+class JsonLinesExporter:
+    def __init__(self, path):
+        self.file = open(path, 'w', encoding='utf-8')
+
+    def write(self, tx_type, tx):
+        self.file.write(json.dumps(dict(tx, type=tx_type), ensure_ascii=False) + "\n")
+
+    def close(self):
+        self.file.close()
+
+
+# Choisit le format d'export d'après l'extension du fichier (.csv ou .jsonl)
+def open_exporter(path):
+    extension = os.path.splitext(path)[1].lower()
+    if extension == ".csv": return CsvExporter(path)
+    if extension in (".jsonl", ".ndjson"): return JsonLinesExporter(path)
+    raise ValueError(f"Format d'export non pris en charge: {extension or path} (utilisez .csv ou .jsonl)")
+
+
+# Parcourt les transactions une seule fois : totaux des transactions filtrées, et export éventuel
+# Retourne (agrégats, nombre de transactions exportées)
+def build_report(transactions, month=None, category=None, type_filter=None, exporter=None):
+    aggregates = LedgerAggregates()
+    matched = 0
+    for tx_type, tx in transactions:
+        if not matches(tx_type, tx, month, category, type_filter): continue
+        aggregates.add(tx_type, tx)
+        matched += 1
+        if exporter is not None: exporter.write(tx_type, tx)
+    return aggregates, matched
+
+
+# Rapport sous forme de dictionnaire (pour l'affichage texte ou la sortie JSON)
+def report_dict(aggregates, filters):
+    return {
+        "filters": filters,
+        "totals": {
+            "income": aggregates.total_income,
+            "expenses": aggregates.total_expenses,
+            "balance": aggregates.total_income - aggregates.total_expenses,
+            "income_count": aggregates.income_count,
+            "expense_count": aggregates.expense_count,
+        },
+        "categories": [{"category": category, "total": total, "count": aggregates.category_counts[category]}
+                       for category, total in sorted(aggregates.category_totals.items(), key=lambda item: item[1], reverse=True)],
+        "months": [{"month": month, "income": totals[0], "expenses": totals[1], "balance": totals[0] - totals[1],
+                    "count": aggregates.month_counts[month]}
+                   for month, totals in sorted(aggregates.month_totals.items())],
+    }
+
+
+# Rapport lisible, dans le même format que l'application (montants en FCFA)
+def format_text(report):
+    fcfa_format = lambda x: f"{x:,.0f} FCFA".replace(',', ' ')
+    totals = report["totals"]
+    active = {key: value for key, value in report["filters"].items() if value is not None}
+    lines = []
+    if active: lines.append("Filtres : " + ", ".join(f"{key}={value}" for key, value in active.items()))
+    lines.append(f"Solde : {fcfa_format(totals['balance'])}")
+    lines.append(f"Revenu Total : {fcfa_format(totals['income'])} ({totals['income_count']} transaction(s))")
+    lines.append(f"Dépense Totale : {fcfa_format(totals['expenses'])} ({totals['expense_count']} transaction(s))")
+    if report["categories"]:
+        lines.append("\nDépenses par Catégorie :")
+        for entry in report["categories"]:
+            lines.append(f"  - {entry['category']}: {fcfa_format(entry['total'])} ({entry['count']})")
+    if report["months"]:
+        lines.append("\nPar Mois (revenus / dépenses / solde) :")
+        for entry in report["months"]:
+            lines.append(f"  - {entry['month']}: {fcfa_format(entry['income'])} / {fcfa_format(entry['expenses'])} / {fcfa_format(entry['balance'])}")
+    return "\n".join(lines)
+
+
+# Commande "python main.py report" : lit le registre du stockage choisi et affiche le rapport
+# Sans filtre ni export, les totaux groupés du stockage suffisent quand il sait les calculer (provides_totals)
+def run_report(storage, month=None, category=None, type_filter=None, output_format="text", export_path=None):
+    exporter = open_exporter(export_path) if export_path else None
+    try:
+        if storage.provides_totals and exporter is None and month is None and category is None and type_filter is None:
+            aggregates = LedgerAggregates()
+            aggregates.load_grouped(storage.grouped_totals())
+            matched = aggregates.income_count + aggregates.expense_count
+        else:
+            aggregates, matched = build_report(storage.iter_transactions(), month, category, type_filter, exporter)
+    finally:
+        if exporter is not None: exporter.close()
+        storage.close()
+    report = report_dict(aggregates, {"month": month, "category": category, "type": type_filter})
+    if output_format == "json": print(json.dumps(report, indent=4, ensure_ascii=False))
+    else: print(format_text(report))
+    if export_path: print(f"{matched} transaction(s) exportée(s) dans {export_path}", file=sys.stderr)
+    return report
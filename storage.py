@@ -0,0 +1,1100 @@
+# Gestion de la sauvegarde des données (fichier JSON simple, journal + compaction, base SQLite,
+# un fichier par mois avec chargement à la demande, ou fichier binaire compact lu par mmap)
+import json # Pour la sauvegarde en JSON
+import mmap # Pour lire le fichier binaire sans le copier en mémoire
+import os # Pour les chemins et le remplacement atomique des fichiers
+import queue # Pour transmettre les erreurs d'écriture au thread principal
+import re # Pour sauter les espaces pendant la lecture progressive du JSON
+import sqlite3 # Pour le stockage en base SQLite
+import struct # Pour les enregistrements du fichier binaire
+import sys # Pour sys.intern (descriptions et catégories partagées)
+import threading # Pour la compaction et les écritures en arrière-plan
+import time # Pour regrouper les écritures rapprochées
+from datetime import date, datetime # Pour dater la migration et convertir les dates du fichier binaire
+
+from ledger import Transaction, TransactionIndex, category_of, month_of, parse_date # Transactions compactes, suppressions par identifiant, catégorie, mois (AAAA-MM) et analyse des dates
+
+
+# Structure vide utilisée si aucun fichier n'existe
+def empty_data():
+    return {"income": [], "expenses": []}
+
+# Convertit le montant d'une transaction en float si nécessaire
+def normalize_transaction(tx):
+    if isinstance(tx.get("amount"), str):
+        try: tx["amount"] = float(tx["amount"])
+        except ValueError: tx["amount"] = 0 # Mettre 0 si conversion impossible
+    return tx
+
+# Assure que les listes existent, convertit les montants en float si nécessaire et remplace chaque dictionnaire
+# par une Transaction compacte (sur place : chaque dictionnaire est libéré aussitôt)
+def normalize_data(data):
+    if "income" not in data: data["income"] = []
+    if "expenses" not in data: data["expenses"] = []
+    for tx_type in ["income", "expenses"]:
+        tx_list = data[tx_type]
+        for position, tx in enumerate(tx_list):
+            if type(tx) is not Transaction: tx_list[position] = Transaction.from_dict(normalize_transaction(tx))
+    return data
+
+# Crochet de json.load : chaque transaction est convertie en Transaction dès sa lecture, son dictionnaire est
+# libéré aussitôt (la mémoire ne contient jamais tout le fichier sous forme de dictionnaires)
+# Les objets sans aucun champ de transaction (l'objet principal {"income": [...], "expenses": [...]}) restent des dictionnaires
+def transaction_hook(obj):
+    if "id" in obj or "amount" in obj or "date" in obj or "description" in obj:
+        return Transaction.from_dict(normalize_transaction(obj))
+    return obj
+
+# Écriture JSON des transactions compactes (json ne connaît que les dictionnaires)
+def json_default(value):
+    if isinstance(value, Transaction): return dict(value)
+    raise TypeError(f"Type non enregistrable en JSON: {type(value).__name__}")
+
+_WHITESPACE = re.compile(r'[ \t\r\n]*')
+
+# Lit un objet JSON sans le charger entièrement : produit (clé, valeur, élément) pour chaque clé de premier niveau,
+# avec élément=True pour chaque élément d'une liste (une transaction à la fois) et False pour les autres valeurs
+# La mémoire utilisée ne dépend pas de la taille du fichier
+def iter_json_object(path, chunk_size=1 << 16):
+    decoder = json.JSONDecoder()
+    with open(path, 'r', encoding='utf-8') as f:
+        buffer, pos, eof = "", 0, False
+
+        # Ajoute la suite du fichier au tampon (en oubliant la partie déjà lue) ; False à la fin du fichier
+        def fill():
+            nonlocal buffer, pos, eof
+            chunk = f.read(chunk_size)
+            if not chunk:
+                eof = True
+                return False
+            buffer, pos = buffer[pos:] + chunk, 0
+            return True
+
+        # Prochain caractère significatif (les espaces sont sautés), "" à la fin du fichier
+        def peek():
+            nonlocal pos
+            while True:
+                pos = _WHITESPACE.match(buffer, pos).end()
+                if pos < len(buffer): return buffer[pos]
+                if not fill(): return ""
+
+        def expect(char):
+            nonlocal pos
+            if peek() != char: raise ValueError(f"JSON invalide dans {path}: '{char}' attendu")
+            pos += 1
+
+        # Décode la valeur suivante ; relit la suite du fichier si elle est coupée par la fin du tampon
+        # (une valeur qui se termine pile à la fin du tampon, comme un nombre, peut aussi être incomplète)
+        def decode():
+            nonlocal pos
+            peek()
+            while True:
+                try:
+                    value, end = decoder.raw_decode(buffer, pos)
+                    if end < len(buffer) or eof: break
+                except json.JSONDecodeError:
+                    if eof: raise
+                if not fill(): continue # Fin du fichier : dernier essai, l'erreur éventuelle est levée
+            pos = end
+            return value
+
+        expect("{")
+        while peek() != "}":
+            key = decode()
+            expect(":")
+            if peek() == "[":
+                pos += 1
+                while peek() != "]":
+                    yield key, decode(), True
+                    if peek() == ",": pos += 1
+                pos += 1
+            else:
+                yield key, decode(), False
+            if peek() == ",": pos += 1
+
+# Écrit un fichier JSON de façon atomique : fichier temporaire, fsync, puis os.replace
+# En cas de plantage pendant l'écriture, l'ancien fichier reste intact
+def atomic_write_json(path, data, indent=4):
+    tmp_path = path + ".tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, indent=indent, ensure_ascii=False, default=json_default)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+# Applique un enregistrement du journal (ajout ou suppression) aux données en mémoire
+# index (TransactionIndex) est nécessaire pour les suppressions par identifiant
+def apply_record(data, record, index=None):
+    tx_list = data[record["type"]]
+    if record["op"] == "add":
+        tx_list.append(record["tx"])
+        if index is not None: index.add(data, record["type"], record["tx"])
+    elif record["op"] == "delete" and "ids" in record:
+        index.remove(data, record["ids"])
+    elif record["op"] == "delete":
+        # Ancien format (avant les identifiants) : index relatifs à la liste avant suppression
+        for position in sorted(record["indices"], reverse=True):
+            if 0 <= position < len(tx_list): del tx_list[position]
+    else:
+        raise ValueError(f"Opération de journal inconnue: {record['op']}")
+
+
+# Stockage historique : tout le fichier est réécrit à chaque modification
+class JsonStorage:
+    loads_lazily = False # load() retourne toutes les transactions
+    provides_totals = False # Les agrégats sont calculés par le registre à partir des transactions (sinon grouped_totals)
+
+    def __init__(self, data_file):
+        self.data_file = data_file
+
+    # Charge les données depuis le fichier JSON
+    def load(self):
+        if not os.path.exists(self.data_file):
+            return empty_data()
+        with open(self.data_file, 'r', encoding='utf-8') as f:
+            return normalize_data(json.load(f, object_hook=transaction_hook))
+
+    # Parcourt les transactions une à une, sans charger tout le fichier : produit des couples (type, transaction)
+    def iter_transactions(self):
+        if not os.path.exists(self.data_file): return
+        for key, value, is_item in iter_json_object(self.data_file):
+            if is_item and key in ("income", "expenses"): yield key, normalize_transaction(value)
+
+    # Réécrit entièrement le fichier
+    def save(self, data):
+        atomic_write_json(self.data_file, data)
+
+    # Enregistre une liste de modifications ; ici on réécrit simplement tout le fichier
+    def append(self, data, records):
+        self.save(data)
+
+    # Rien à libérer pour ce mode
+    def close(self):
+        pass
+
+
+# Stockage journalisé : chaque ajout/suppression est ajouté en fin de fichier journal (une ligne JSON),
+# et le journal est replié dans un nouvel instantané en arrière-plan quand il devient trop long
+class JournalStorage(JsonStorage):
+    def __init__(self, data_file, compact_threshold=500):
+        super().__init__(data_file)
+        self.journal_file = os.path.splitext(data_file)[0] + ".journal"
+        self.compact_threshold = compact_threshold
+        self.seq = 0 # Numéro du dernier enregistrement écrit
+        self.pending_records = 0 # Enregistrements du journal pas encore repliés dans l'instantané
+        self.journal_lock = threading.Lock() # Protège le fichier journal (ajouts vs compaction)
+        self.journal_handle = None
+        self.compaction_thread = None
+
+    # Charge l'instantané puis rejoue le journal par-dessus
+    def load(self):
+        data = super().load()
+        # Numéro du dernier enregistrement déjà inclus dans l'instantané
+        snapshot_seq = data.pop("journal_seq", 0)
+        self.seq = snapshot_seq
+        self.pending_records = 0
+        index = None # Construit seulement si le journal contient des suppressions par identifiant
+        if os.path.exists(self.journal_file):
+            valid_end = 0 # Position de la fin de la dernière ligne lisible
+            with open(self.journal_file, 'rb') as f:
+                for line in f:
+                    try: record = json.loads(line)
+                    except ValueError: break # Dernière ligne tronquée par un plantage pendant l'écriture
+                    valid_end += len(line)
+                    if record["seq"] <= snapshot_seq: continue # Déjà présent dans l'instantané
+                    if index is None and "ids" in record:
+                        index = TransactionIndex()
+                        index.rebuild(data)
+                    apply_record(data, record, index)
+                    self.seq = record["seq"]
+                    self.pending_records += 1
+            self._repair_journal(valid_end)
+        return normalize_data(data)
+
+    # Retire la fin tronquée du journal avant tout nouvel ajout : sinon les ajouts suivants seraient écrits
+    # à la suite de la ligne incomplète et perdus au prochain chargement
+    # Une dernière ligne lisible mais sans retour à la ligne est complétée
+    def _repair_journal(self, valid_end):
+        with self.journal_lock:
+            if self.journal_handle is not None:
+                self.journal_handle.close()
+                self.journal_handle = None
+            with open(self.journal_file, 'r+b') as f:
+                size = f.seek(0, os.SEEK_END)
+                repaired = valid_end < size
+                if repaired:
+                    f.truncate(valid_end)
+                    print(f"Avertissement: fin de journal illisible retirée de {self.journal_file} ({size - valid_end} octet(s))", file=sys.stderr)
+                if valid_end:
+                    f.seek(valid_end - 1)
+                    if f.read(1) != b"\n":
+                        f.seek(valid_end)
+                        f.write(b"\n")
+                        repaired = True
+                if repaired:
+                    f.flush()
+                    os.fsync(f.fileno())
+
+    # Parcourt les transactions une à une (instantané lu au fil de l'eau, puis ajouts du journal)
+    # Le journal, court, est lu d'abord : ses suppressions sont écartées pendant la lecture de l'instantané
+    def iter_transactions(self):
+        records = self._read_journal()
+        if not records:
+            yield from super().iter_transactions()
+            return
+        if not os.path.exists(self.data_file):
+            snapshot_events, snapshot_seq = iter(()), 0
+        else:
+            snapshot_events = iter_json_object(self.data_file)
+            first = next(snapshot_events, None)
+            # Les instantanés commencent par journal_seq ; sinon (ancien fichier ou ancien format de suppression),
+            # chargement complet
+            if first is None or first[0] != "journal_seq" or any("indices" in r for r in records):
+                snapshot_events.close()
+                data = self.load()
+                for tx_type in ["income", "expenses"]:
+                    for tx in data[tx_type]: yield tx_type, tx
+                return
+            snapshot_seq = first[1]
+        deleted_ids = set() # Transactions de l'instantané supprimées par le journal
+        added = {} # Identifiant -> (type, transaction) ajoutée par le journal et toujours présente
+        for record in records:
+            if record["seq"] <= snapshot_seq: continue # Déjà présent dans l'instantané
+            if record["op"] == "add":
+                added[record["tx"]["id"]] = (record["type"], record["tx"])
+            else:
+                for tx_id in record["ids"]:
+                    if added.pop(tx_id, None) is None: deleted_ids.add(tx_id)
+        for key, value, is_item in snapshot_events:
+            if is_item and key in ("income", "expenses") and value.get("id") not in deleted_ids:
+                yield key, normalize_transaction(value)
+        for tx_type, tx in added.values(): yield tx_type, normalize_transaction(tx)
+
+    # Enregistrements du journal (la dernière ligne, tronquée par un plantage, est ignorée)
+    def _read_journal(self):
+        records = []
+        if os.path.exists(self.journal_file):
+            with open(self.journal_file, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try: records.append(json.loads(line))
+                    except ValueError: break
+        return records
+
+    # Écrit un instantané complet et vide le journal (utilisé pour une sauvegarde explicite)
+    # journal_seq est placé en tête : iter_transactions le connaît avant de lire les transactions
+    def save(self, data):
+        self.wait_for_compaction()
+        snapshot = dict(journal_seq=self.seq, **data)
+        atomic_write_json(self.data_file, snapshot)
+        self._truncate_journal(self.seq)
+        self.pending_records = 0
+
+    # Ajoute les modifications en fin de journal, puis lance une compaction si le seuil est dépassé
+    def append(self, data, records):
+        lines = [json.dumps(dict(record, seq=seq), ensure_ascii=False, default=json_default)
+                 for seq, record in enumerate(records, start=self.seq + 1)]
+        with self.journal_lock:
+            if self.journal_handle is None:
+                self.journal_handle = open(self.journal_file, 'a', encoding='utf-8')
+            start = os.fstat(self.journal_handle.fileno()).st_size
+            try:
+                self.journal_handle.write("\n".join(lines) + "\n")
+                self.journal_handle.flush()
+                os.fsync(self.journal_handle.fileno()) # L'ajout est durable dès le retour
+            except OSError:
+                # Échec (disque plein...) : retirer ce qui a pu être écrit, l'appel pourra être refait tel quel
+                try: self.journal_handle.close()
+                except OSError: pass
+                self.journal_handle = None
+                try: os.truncate(self.journal_file, start)
+                except OSError: pass # Ligne incomplète éventuelle retirée au prochain chargement
+                raise
+        self.seq += len(records)
+        self.pending_records += len(records)
+        if self.pending_records >= self.compact_threshold:
+            self.compact(data)
+
+    # Replie le journal dans un nouvel instantané, dans un thread séparé
+    def compact(self, data):
+        if self.compaction_thread is not None and self.compaction_thread.is_alive():
+            return # Une compaction est déjà en cours
+        # Copie superficielle des listes : les transactions elles-mêmes ne sont jamais modifiées
+        snapshot = {"journal_seq": self.seq}
+        snapshot.update((key, list(value) if isinstance(value, list) else value) for key, value in data.items())
+        self.pending_records = 0
+        # Thread non-daemon : l'interpréteur attend la fin de la compaction avant de quitter
+        self.compaction_thread = threading.Thread(target=self._write_snapshot, args=(snapshot,))
+        self.compaction_thread.start()
+
+    def _write_snapshot(self, snapshot):
+        try:
+            atomic_write_json(self.data_file, snapshot)
+            self._truncate_journal(snapshot["journal_seq"])
+        except (OSError, ValueError) as e:
+            # Le journal est conservé tel quel : aucune donnée perdue, on réessaiera au prochain seuil
+            print(f"Erreur lors de la compaction du journal: {e}")
+
+    # Retire du journal les enregistrements déjà inclus dans l'instantané (numéro <= upto_seq)
+    def _truncate_journal(self, upto_seq):
+        with self.journal_lock:
+            if self.journal_handle is not None:
+                self.journal_handle.close()
+                self.journal_handle = None
+            if not os.path.exists(self.journal_file):
+                return
+            remaining = []
+            with open(self.journal_file, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        if json.loads(line)["seq"] > upto_seq: remaining.append(line)
+                    except ValueError:
+                        break
+            if remaining:
+                tmp_path = self.journal_file + ".tmp"
+                with open(tmp_path, 'w', encoding='utf-8') as f:
+                    f.writelines(remaining)
+                    f.flush()
+                    os.fsync(f.fileno())
+                os.replace(tmp_path, self.journal_file)
+            else:
+                os.remove(self.journal_file)
+
+    # Attend la fin d'une éventuelle compaction en cours
+    def wait_for_compaction(self):
+        if self.compaction_thread is not None:
+            self.compaction_thread.join()
+            self.compaction_thread = None
+
+    # Termine la compaction en cours et ferme le journal
+    def close(self):
+        self.wait_for_compaction()
+        with self.journal_lock:
+            if self.journal_handle is not None:
+                self.journal_handle.close()
+                self.journal_handle = None
+
+
+# Stockage en base SQLite (fichier budget_data.db à côté de budget_data.json)
+# Les totaux sont initialisés par un GROUP BY indexé (les filtres utilisent les index en mémoire du registre)
+class SqliteStorage:
+    loads_lazily = False
+    provides_totals = True
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS transactions (
+            id INTEGER PRIMARY KEY,
+            type TEXT NOT NULL,
+            date TEXT NOT NULL,
+            month TEXT,
+            description TEXT NOT NULL,
+            amount REAL NOT NULL,
+            category TEXT
+        );
+        CREATE INDEX IF NOT EXISTS idx_transactions_date ON transactions(date);
+        CREATE INDEX IF NOT EXISTS idx_transactions_month ON transactions(month, type);
+        CREATE INDEX IF NOT EXISTS idx_transactions_category ON transactions(category, type);
+        CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+    """
+
+    def __init__(self, data_file):
+        self.data_file = data_file # Fichier JSON d'origine, utilisé pour la migration
+        self.db_file = os.path.splitext(data_file)[0] + ".db"
+        self.connection = None
+
+    def _connect(self):
+        if self.connection is None:
+            # Connexion utilisée aussi par le thread d'écriture (BackgroundWriter) : les accès sont protégés par son verrou
+            self.connection = sqlite3.connect(self.db_file, check_same_thread=False)
+            self.connection.executescript(self.SCHEMA)
+        return self.connection
+
+    # Ligne SQL correspondant à une transaction de la liste data[tx_type]
+    # (sans identifiant, SQLite en attribue un : cas de la migration d'un ancien fichier)
+    @staticmethod
+    def _row(tx_type, tx):
+        date_str = tx.get("date", "")
+        month = month_of(date_str) # None si la date est invalide : exclue des filtres par mois
+        return (tx.get("id"), tx_type, date_str, month, tx.get("description", ""), tx.get("amount", 0), tx.get("category"))
+
+    def _insert(self, tx_type, tx):
+        self.connection.execute(
+            "INSERT INTO transactions (id, type, date, month, description, amount, category) VALUES (?, ?, ?, ?, ?, ?, ?)",
+            self._row(tx_type, tx))
+
+    # Migration unique : importe budget_data.json dans la base si elle n'a jamais été remplie
+    def migrate_from_json(self):
+        connection = self._connect()
+        if connection.execute("SELECT value FROM meta WHERE key = 'migrated_from_json'").fetchone():
+            return 0
+        imported = 0
+        with connection: # Une seule transaction SQL pour toute la migration
+            if os.path.exists(self.data_file):
+                data = JournalStorage(self.data_file).load() # Instantané JSON + journal éventuel
+                TransactionIndex().rebuild(data) # Identifiants manquants ou en double attribués avant l'import
+                for tx_type in ["income", "expenses"]:
+                    for tx in data[tx_type]:
+                        self._insert(tx_type, tx)
+                        imported += 1
+            connection.execute("INSERT INTO meta (key, value) VALUES ('migrated_from_json', ?)", (datetime.now().isoformat(),))
+        if imported:
+            print(f"Migration: {imported} transaction(s) importée(s) de {self.data_file} vers {self.db_file}", file=sys.stderr)
+        return imported
+
+    # Charge toutes les transactions dans la structure habituelle {"income": [...], "expenses": [...]}
+    def load(self):
+        self.migrate_from_json()
+        data = {"income": [], "expenses": []}
+        for tx_id, tx_type, date_str, description, amount, category in self.connection.execute(
+                "SELECT id, type, date, description, amount, category FROM transactions ORDER BY id"):
+            tx = Transaction()
+            tx["id"], tx["description"], tx["amount"], tx["date"] = tx_id, description, amount, date_str
+            if category is not None: tx["category"] = category
+            data[tx_type].append(tx)
+        return data
+
+    # Parcourt les transactions une à une, directement depuis le curseur SQL
+    def iter_transactions(self):
+        self.migrate_from_json()
+        for tx_id, tx_type, date_str, description, amount, category in self.connection.execute(
+                "SELECT id, type, date, description, amount, category FROM transactions ORDER BY id"):
+            tx = {"id": tx_id, "description": description, "amount": amount, "date": date_str}
+            if category is not None: tx["category"] = category
+            yield tx_type, tx
+
+    # Remplace tout le contenu de la base par les données fournies
+    # (la base fait alors foi : budget_data.json ne sera plus importé)
+    def save(self, data):
+        connection = self._connect()
+        with connection:
+            connection.execute("DELETE FROM transactions")
+            for tx_type in ["income", "expenses"]:
+                for tx in data[tx_type]:
+                    self._insert(tx_type, tx)
+            connection.execute("INSERT OR IGNORE INTO meta (key, value) VALUES ('migrated_from_json', ?)", (datetime.now().isoformat(),))
+
+    # Applique les modifications (mêmes enregistrements que le journal) dans une seule transaction SQL
+    def append(self, data, records):
+        connection = self._connect()
+        with connection:
+            for record in records:
+                if record["op"] == "add":
+                    self._insert(record["type"], record["tx"])
+                elif record["op"] == "delete":
+                    connection.executemany("DELETE FROM transactions WHERE id = ?", [(tx_id,) for tx_id in record["ids"]])
+                else:
+                    raise ValueError(f"Opération inconnue: {record['op']}")
+
+    # Totaux groupés par (type, mois, catégorie) : sert à initialiser les agrégats sans parcourir les transactions en Python
+    def grouped_totals(self):
+        self.migrate_from_json() # Rapport sans filtre sur un fichier JSON pas encore importé
+        return self._connect().execute(
+            "SELECT type, month, CASE WHEN type = 'expenses' THEN COALESCE(category, 'Non Catégorisé') END, SUM(amount), COUNT(*) "
+            "FROM transactions GROUP BY type, month, category").fetchall()
+
+    def close(self):
+        if self.connection is not None:
+            self.connection.close()
+            self.connection = None
+
+
+# Stockage par mois : un fichier JSON par mois (budget_data_mois/AAAA-MM.json) et un manifeste avec les totaux
+# de chaque mois. Au démarrage, seuls le manifeste (qui suffit aux totaux, à l'analyse et à la liste des mois),
+# le mois en cours et les transactions sans date valide sont lus ; les autres mois sont chargés à la demande
+# (load_months). Une modification ne réécrit que le fichier du mois concerné, puis le manifeste
+class ShardedStorage:
+    loads_lazily = True
+    provides_totals = True
+    MANIFEST_FORMAT = 1
+    UNDATED = "sans-date" # Fichier des transactions dont la date est invalide (toujours chargé)
+
+    def __init__(self, data_file):
+        self.data_file = data_file # Fichier JSON d'origine, découpé par mois au premier lancement
+        self.shard_dir = os.path.splitext(data_file)[0] + "_mois"
+        self.manifest_file = os.path.join(self.shard_dir, "manifest.json")
+        self.manifest = None # {"format", "max_id", "shards": {mois: totaux (voir shard_totals)}}
+        self.shards = {} # Mois chargés -> {"income": [...], "expenses": [...]} (mêmes objets que les données du registre)
+        self.shard_of = {} # Identifiant -> mois, pour les transactions chargées (suppressions)
+
+    def _shard_path(self, name):
+        return os.path.join(self.shard_dir, f"{name}.json")
+
+    @classmethod
+    def shard_name(cls, tx):
+        return month_of(tx.get("date")) or cls.UNDATED
+
+    # Totaux d'un mois, enregistrés dans le manifeste : revenus [total, nombre], dépenses {catégorie: [total, nombre]}
+    @staticmethod
+    def shard_totals(shard):
+        expenses = {}
+        for tx in shard["expenses"]:
+            totals = expenses.setdefault(category_of(tx), [0.0, 0])
+            totals[0] += tx.get("amount", 0)
+            totals[1] += 1
+        return {"income": [sum(tx.get("amount", 0) for tx in shard["income"]), len(shard["income"])], "expenses": expenses}
+
+    # Nombre de transactions d'un mois d'après le manifeste (d'une seule catégorie de dépenses si category est donné)
+    def _shard_count(self, name, category=None):
+        totals = self.manifest["shards"][name]
+        if category is not None: return totals["expenses"].get(category, [0, 0])[1]
+        return totals["income"][1] + sum(count for _, count in totals["expenses"].values())
+
+    # Lit le manifeste ; au premier lancement, découpe budget_data.json (instantané et journal éventuel) par mois
+    def _open(self):
+        if self.manifest is not None: return
+        if os.path.exists(self.manifest_file):
+            with open(self.manifest_file, 'r', encoding='utf-8') as f:
+                manifest = json.load(f)
+            if manifest.get("format") != self.MANIFEST_FORMAT:
+                raise ValueError(f"Format de manifeste non pris en charge: {manifest.get('format')}")
+            self.manifest = manifest
+            return
+        self.manifest = {"format": self.MANIFEST_FORMAT, "max_id": 0, "shards": {}}
+        data = JournalStorage(self.data_file).load()
+        TransactionIndex().rebuild(data) # Identifiants manquants ou en double attribués avant le découpage
+        self.save(data)
+        count = len(data["income"]) + len(data["expenses"])
+        if count: print(f"Migration: {count} transaction(s) de {self.data_file} réparties par mois dans {self.shard_dir}", file=sys.stderr)
+
+    def _read_shard(self, name):
+        with open(self._shard_path(name), 'r', encoding='utf-8') as f:
+            return normalize_data(json.load(f, object_hook=transaction_hook))
+
+    # Écrit un mois (ou supprime son fichier s'il est vide) et met à jour ses totaux dans manifest
+    def _write_shard(self, name, shard, manifest):
+        if shard["income"] or shard["expenses"]:
+            atomic_write_json(self._shard_path(name), shard, indent=None)
+            manifest["shards"][name] = self.shard_totals(shard)
+        else:
+            manifest["shards"].pop(name, None)
+            if os.path.exists(self._shard_path(name)): os.remove(self._shard_path(name))
+
+    # Copie du manifeste modifiée pendant une écriture : self.manifest n'est remplacé qu'une fois tout écrit
+    def _manifest_copy(self):
+        return dict(self.manifest, shards=dict(self.manifest["shards"]))
+
+    # Le manifeste est écrit après les fichiers des mois : il ne référence jamais un mois pas encore écrit
+    def _write_manifest(self, manifest):
+        atomic_write_json(self.manifest_file, manifest, indent=None)
+        self.manifest = manifest
+
+    # Charge le manifeste, le mois en cours et les transactions sans date valide
+    def load(self):
+        self._open()
+        self.shards, self.shard_of = {}, {}
+        data = empty_data()
+        for tx_type, tx in self.load_months([datetime.now().strftime("%Y-%m"), self.UNDATED]):
+            data[tx_type].append(tx)
+        return data
+
+    # Charge des mois pas encore en mémoire (months=None : tous) ; retourne les (type, transaction) lues,
+    # à ajouter aux données du registre. Les mois inconnus du manifeste sont ignorés
+    def load_months(self, months=None):
+        self._open()
+        loaded = []
+        for name in list(self.manifest["shards"]) if months is None else months:
+            if name in self.shards or name not in self.manifest["shards"]: continue
+            shard = self.shards[name] = self._read_shard(name)
+            for tx_type in ["income", "expenses"]:
+                for tx in shard[tx_type]:
+                    self.shard_of[tx["id"]] = name
+                    loaded.append((tx_type, tx))
+        return loaded
+
+    # Mois (les plus récents d'abord) à charger pour que les mois déjà chargés, sans trou depuis le plus récent,
+    # contiennent au moins rows transactions (de la catégorie, si elle est donnée) ; toute transaction plus récente
+    # que la dernière de ces mois est alors en mémoire
+    def recent_months(self, rows, category=None):
+        self._open()
+        needed, count = [], 0
+        for name in sorted((name for name in self.manifest["shards"] if name != self.UNDATED), reverse=True):
+            if count >= rows: break
+            if name not in self.shards: needed.append(name)
+            count += self._shard_count(name, category)
+        return needed
+
+    # Vrai s'il reste des mois non chargés qui contiennent des transactions (de la catégorie, si elle est donnée)
+    def has_unloaded(self, category=None):
+        self._open()
+        return any(name not in self.shards and self._shard_count(name, category) for name in self.manifest["shards"])
+
+    def all_loaded(self):
+        self._open()
+        return all(name in self.shards for name in self.manifest["shards"])
+
+    # Plus grand identifiant enregistré, y compris dans les mois non chargés (les nouveaux identifiants le suivent)
+    def max_id(self):
+        self._open()
+        return self.manifest["max_id"]
+
+    # Parcourt les transactions mois par mois (un seul mois non chargé en mémoire à la fois)
+    def iter_transactions(self):
+        self._open()
+        for name in sorted(self.manifest["shards"]):
+            shard = self.shards.get(name) or self._read_shard(name)
+            for tx_type in ["income", "expenses"]:
+                for tx in shard[tx_type]: yield tx_type, tx
+
+    # Totaux groupés par (type, mois, catégorie), lus dans le manifeste (comme SqliteStorage.grouped_totals)
+    def grouped_totals(self):
+        self._open()
+        rows = []
+        for name, totals in self.manifest["shards"].items():
+            month = None if name == self.UNDATED else name
+            if totals["income"][1]: rows.append(("income", month, None, totals["income"][0], totals["income"][1]))
+            for category, (total, count) in totals["expenses"].items():
+                rows.append(("expenses", month, category, total, count))
+        return rows
+
+    # Réécrit tous les mois à partir de données complètes (tous les mois doivent avoir été chargés)
+    def save(self, data):
+        self._open()
+        os.makedirs(self.shard_dir, exist_ok=True)
+        shards = {}
+        for tx_type in ["income", "expenses"]:
+            for tx in data[tx_type]: shards.setdefault(self.shard_name(tx), empty_data())[tx_type].append(tx)
+        manifest = self._manifest_copy()
+        for name in set(manifest["shards"]) - set(shards): self._write_shard(name, empty_data(), manifest)
+        for name, shard in shards.items(): self._write_shard(name, shard, manifest)
+        shard_of = {tx["id"]: name for name, shard in shards.items() for tx_type in shard for tx in shard[tx_type]}
+        manifest["max_id"] = max(manifest["max_id"], max(shard_of, default=0))
+        self._write_manifest(manifest)
+        self.shards, self.shard_of = shards, shard_of
+
+    # Copie (dans touched) d'un mois à modifier, lu d'abord s'il n'est pas encore en mémoire
+    def _touch_shard(self, touched, name):
+        if name not in touched:
+            if name not in self.shards: self.load_months([name]) # Normalement déjà chargé par le registre
+            shard = self.shards.get(name) or empty_data()
+            touched[name] = {tx_type: list(shard[tx_type]) for tx_type in ["income", "expenses"]}
+        return touched[name]
+
+    # Applique les modifications aux mois concernés, puis réécrit seulement ces mois et le manifeste
+    # Les modifications sont faites sur des copies, gardées seulement une fois les fichiers écrits : après un échec
+    # d'écriture, le même appel peut être refait sans appliquer deux fois les modifications
+    def append(self, data, records):
+        self._open()
+        os.makedirs(self.shard_dir, exist_ok=True)
+        touched = {} # Mois modifiés -> copie à écrire
+        added = {} # Identifiant -> mois des transactions ajoutées
+        removed = set() # Identifiants supprimés
+        deleted = {} # (mois, type) -> identifiants supprimés
+        manifest = self._manifest_copy()
+        for record in records:
+            if record["op"] == "add":
+                tx = record["tx"]
+                name = self.shard_name(tx)
+                self._touch_shard(touched, name)[record["type"]].append(tx)
+                added[tx["id"]] = name
+                manifest["max_id"] = max(manifest["max_id"], tx["id"])
+            elif record["op"] == "delete":
+                for tx_id in record["ids"]:
+                    name = added.pop(tx_id, None) or (self.shard_of.get(tx_id) if tx_id not in removed else None)
+                    if name is None: continue
+                    removed.add(tx_id)
+                    self._touch_shard(touched, name)
+                    deleted.setdefault((name, record["type"]), set()).add(tx_id)
+            else:
+                raise ValueError(f"Opération inconnue: {record['op']}")
+        for (name, tx_type), ids in deleted.items():
+            touched[name][tx_type] = [tx for tx in touched[name][tx_type] if tx["id"] not in ids]
+        if not touched: return
+        for name, shard in touched.items(): self._write_shard(name, shard, manifest)
+        self._write_manifest(manifest)
+        self.shards.update(touched)
+        for tx_id in removed: self.shard_of.pop(tx_id, None)
+        self.shard_of.update(added)
+
+    def close(self):
+        pass
+
+
+# Format binaire compact (budget_data.bin) :
+#   en-tête (64 octets), puis un enregistrement de taille fixe par transaction (40 octets : identifiant, montant,
+#   jour ordinal, position de la description dans la table des textes, catégorie et indicateurs), puis la table
+#   des textes (UTF-8, chaque description distincte une seule fois), puis la liste des catégories (JSON ; avec les
+#   autres clés de premier niveau du fichier d'origine, s'il en a)
+# Ce qui ne tient pas dans un enregistrement (date invalide ou écrite autrement que AAAA-MM-JJ, clé inconnue,
+# valeur d'un autre type) est gardé en JSON dans la table des textes : la conversion depuis et vers JSON est sans perte
+BINARY_MAGIC = b"BUDGETB1"
+BINARY_VERSION = 1
+_BINARY_HEADER = struct.Struct("<8sHHIQQQQQQ") # magique, version, taille d'enregistrement, réservé, nombre, identifiant max,
+                                               # position et taille de la table des textes, puis des catégories
+_BINARY_RECORD = struct.Struct("<QdiIIIIHBx") # identifiant, montant, jour ordinal, description (position, taille),
+                                              # complément JSON (position, taille), catégorie, indicateurs
+_NO_CATEGORY = 0xFFFF
+# Indicateurs d'un enregistrement : champs présents dans la transaction d'origine
+_F_EXPENSE, _F_ID, _F_DESCRIPTION, _F_AMOUNT, _F_INT_AMOUNT, _F_DATE, _F_CATEGORY, _F_EXTRA = 1, 2, 4, 8, 16, 32, 64, 128
+_NATIVE_KEYS = ("id", "description", "amount", "date", "category")
+_iso_dates = {} # Jour ordinal -> date AAAA-MM-JJ (une seule chaîne par jour)
+
+
+def _iso_date(ordinal):
+    text = _iso_dates.get(ordinal)
+    if text is None: text = _iso_dates[ordinal] = sys.intern(date.fromordinal(ordinal).isoformat())
+    return text
+
+
+# Contenu du fichier binaire pour des données {"income": [...], "expenses": [...]}
+def encode_binary_ledger(data):
+    records, strings = bytearray(), bytearray()
+    string_positions = {} # Texte -> (position, taille) : chaque texte distinct n'est écrit qu'une fois
+    categories = {} # Catégorie -> numéro
+    count = max_id = 0
+    def put_string(text):
+        position = string_positions.get(text)
+        if position is None:
+            encoded = text.encode('utf-8')
+            position = string_positions[text] = (len(strings), len(encoded))
+            strings.extend(encoded)
+        return position
+    for tx_type in ["income", "expenses"]:
+        for tx in data.get(tx_type, []):
+            flags = _F_EXPENSE if tx_type == "expenses" else 0
+            extra = {key: value for key, value in tx.items() if key not in _NATIVE_KEYS}
+            tx_id, amount, ordinal, description, category = 0, 0.0, 0, (0, 0), _NO_CATEGORY
+            value = tx.get("id")
+            if type(value) is int and 0 <= value < 1 << 63:
+                flags |= _F_ID
+                tx_id = value
+                if value > max_id: max_id = value
+            elif "id" in tx: extra["id"] = value
+            value = tx.get("description")
+            if type(value) is str:
+                flags |= _F_DESCRIPTION
+                description = put_string(value)
+            elif "description" in tx: extra["description"] = value
+            value = tx.get("amount")
+            if type(value) is float or (type(value) is int and abs(value) < 1 << 53):
+                flags |= _F_AMOUNT | (_F_INT_AMOUNT if type(value) is int else 0)
+                amount = float(value)
+            elif "amount" in tx: extra["amount"] = value
+            value = tx.get("date")
+            parsed = parse_date(value)
+            if parsed is not None and _iso_date(parsed[0]) == value:
+                flags |= _F_DATE
+                ordinal = parsed[0]
+            elif "date" in tx: extra["date"] = value
+            value = tx.get("category")
+            if type(value) is str and (value in categories or len(categories) < _NO_CATEGORY):
+                flags |= _F_CATEGORY
+                category = categories.setdefault(value, len(categories))
+            elif "category" in tx: extra["category"] = value
+            extra_position = (0, 0)
+            if extra:
+                flags |= _F_EXTRA
+                extra_position = put_string(json.dumps(extra, ensure_ascii=False))
+            records.extend(_BINARY_RECORD.pack(tx_id, amount, ordinal, description[0], description[1],
+                                               extra_position[0], extra_position[1], category, flags))
+            count += 1
+    # Clés de premier niveau autres que les transactions (journal_seq, métadonnées...) : gardées avec les catégories
+    extra = {key: value for key, value in data.items() if key not in ("income", "expenses")}
+    table = {"categories": list(categories), "extra": extra} if extra else list(categories)
+    category_table = json.dumps(table, ensure_ascii=False, default=json_default).encode('utf-8')
+    strings_offset = _BINARY_HEADER.size + len(records)
+    header = _BINARY_HEADER.pack(BINARY_MAGIC, BINARY_VERSION, _BINARY_RECORD.size, 0, count, max_id,
+                                 strings_offset, len(strings), strings_offset + len(strings), len(category_table))
+    return b"".join([header, records, strings, category_table])
+
+
+# Écrit le fichier binaire de façon atomique (fichier temporaire, fsync, puis os.replace)
+def write_binary_ledger(path, data):
+    content = encode_binary_ledger(data)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(content)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+# Lecture d'un fichier binaire par mmap : les enregistrements sont lus directement dans le fichier projeté
+# en mémoire, sans copie ; à utiliser avec "with"
+class BinaryLedgerReader:
+    def __init__(self, path):
+        self.path = path
+
+    def __enter__(self):
+        self.file = open(self.path, 'rb')
+        size = os.fstat(self.file.fileno()).st_size
+        if size < _BINARY_HEADER.size:
+            self.file.close()
+            raise ValueError(f"Fichier binaire tronqué: {self.path}")
+        self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        self.view = memoryview(self.map)
+        (magic, version, record_size, _, self.count, self.max_id, self.strings_offset, strings_size,
+         categories_offset, categories_size) = _BINARY_HEADER.unpack_from(self.view)
+        if magic != BINARY_MAGIC or version != BINARY_VERSION or record_size != _BINARY_RECORD.size:
+            self.__exit__(None, None, None)
+            raise ValueError(f"Format binaire non pris en charge: {self.path}")
+        table = json.loads(str(self.view[categories_offset:categories_offset + categories_size], 'utf-8'))
+        # Liste des catégories, ou {"categories": [...], "extra": {...}} si le fichier a d'autres clés de premier niveau
+        self.categories, self.extra = (table["categories"], table["extra"]) if isinstance(table, dict) else (table, {})
+        return self
+
+    def __exit__(self, *exc_info):
+        self.view.release() # Avant de fermer la projection (sinon BufferError)
+        self.map.close()
+        self.file.close()
+
+    # Enregistrements bruts : tuples (identifiant, montant, ordinal, description, taille, complément, taille,
+    # catégorie, indicateurs), sans créer de dictionnaire
+    def records(self):
+        end = _BINARY_HEADER.size + self.count * _BINARY_RECORD.size
+        return _BINARY_RECORD.iter_unpack(self.view[_BINARY_HEADER.size:end])
+
+    def _string(self, position, size):
+        start = self.strings_offset + position
+        return str(self.view[start:start + size], 'utf-8')
+
+    # Transactions (type, Transaction) dans l'ordre d'origine ; chaque description distincte n'est décodée
+    # qu'une fois et partagée entre les transactions, comme les dates et les catégories
+    def transactions(self):
+        descriptions = {}
+        categories = [sys.intern(name) for name in self.categories]
+        for tx_id, amount, ordinal, position, size, extra_position, extra_size, category, flags in self.records():
+            tx = Transaction()
+            if flags & _F_ID: tx.id = tx_id
+            if flags & _F_DESCRIPTION:
+                text = descriptions.get(position)
+                if text is None: text = descriptions[position] = sys.intern(self._string(position, size))
+                tx.description = text
+            if flags & _F_AMOUNT: tx.amount = int(amount) if flags & _F_INT_AMOUNT else amount
+            if flags & _F_DATE: tx.date = _iso_date(ordinal)
+            if flags & _F_CATEGORY: tx.category = categories[category]
+            if flags & _F_EXTRA: tx.update(json.loads(self._string(extra_position, extra_size)))
+            yield ("expenses" if flags & _F_EXPENSE else "income"), tx
+
+    # Totaux groupés par (type, mois, catégorie), calculés sur les enregistrements bruts (sans dictionnaire)
+    # Les enregistrements avec un complément JSON (rares : date non standard, montant d'un autre type) sont décodés
+    def grouped_totals(self):
+        totals = {} # (type, mois, numéro de catégorie) -> [somme, nombre]
+        decoded = {} # (type, mois, nom de catégorie) -> [somme, nombre], transactions avec complément JSON
+        months = {} # Jour ordinal -> mois AAAA-MM
+        for _, amount, ordinal, _, _, extra_position, extra_size, category, flags in self.records():
+            if flags & _F_EXTRA:
+                tx = json.loads(self._string(extra_position, extra_size))
+                if flags & _F_DATE: tx["date"] = _iso_date(ordinal)
+                if flags & _F_AMOUNT: tx["amount"] = amount
+                if flags & _F_CATEGORY: tx["category"] = self.categories[category]
+                tx_type = "expenses" if flags & _F_EXPENSE else "income"
+                amount = normalize_transaction(tx).get("amount", 0)
+                key, groups = (tx_type, month_of(tx.get("date")), category_of(tx) if tx_type == "expenses" else None), decoded
+            else:
+                month = months.get(ordinal)
+                if month is None: month = months[ordinal] = _iso_date(ordinal)[:7] if flags & _F_DATE else None
+                if flags & _F_EXPENSE: key = ("expenses", month, category if flags & _F_CATEGORY else _NO_CATEGORY)
+                else: key = ("income", month, None)
+                groups = totals
+            entry = groups.get(key)
+            if entry is None: groups[key] = [amount, 1]
+            else:
+                entry[0] += amount
+                entry[1] += 1
+        names = dict(enumerate(self.categories))
+        names[_NO_CATEGORY] = category_of({}) # Dépense sans catégorie
+        rows = [(tx_type, month, names.get(category), total, count) for (tx_type, month, category), (total, count) in totals.items()]
+        return rows + [(tx_type, month, category, total, count) for (tx_type, month, category), (total, count) in decoded.items()]
+
+
+# Lit un fichier de données, JSON ou binaire (d'après l'extension), tel quel (sans conversion des montants)
+def read_ledger_file(path):
+    if os.path.splitext(path)[1].lower() == ".bin":
+        data = empty_data()
+        with BinaryLedgerReader(path) as reader:
+            data.update(reader.extra)
+            for tx_type, tx in reader.transactions(): data[tx_type].append(tx)
+        return data
+    with open(path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    if not isinstance(data, dict) or not all(isinstance(data.get(key, []), list) for key in ("income", "expenses")):
+        raise ValueError(f"Fichier de données invalide (objet avec les listes income et expenses attendu): {path}")
+    return data
+
+
+# Écrit un fichier de données, JSON ou binaire (d'après l'extension)
+def write_ledger_file(path, data):
+    if os.path.splitext(path)[1].lower() == ".bin": write_binary_ledger(path, data)
+    else: atomic_write_json(path, data)
+
+
+# Stockage binaire compact (budget_data.bin à côté de budget_data.json, importé au premier lancement)
+# Les totaux sont calculés directement sur les enregistrements projetés en mémoire ; chaque modification
+# réécrit le fichier (rapide : pas de mise en forme JSON)
+class BinaryStorage:
+    loads_lazily = False
+    provides_totals = True
+
+    def __init__(self, data_file):
+        self.data_file = data_file # Fichier JSON d'origine, importé au premier lancement
+        self.binary_file = os.path.splitext(data_file)[0] + ".bin"
+
+    # Import unique : crée le fichier binaire à partir de budget_data.json (et du journal éventuel)
+    def migrate_from_json(self):
+        if os.path.exists(self.binary_file): return 0
+        data = JournalStorage(self.data_file).load()
+        write_binary_ledger(self.binary_file, data)
+        count = len(data["income"]) + len(data["expenses"])
+        if count: print(f"Migration: {count} transaction(s) importée(s) de {self.data_file} vers {self.binary_file}", file=sys.stderr)
+        return count
+
+    def load(self):
+        self.migrate_from_json()
+        return normalize_data(read_ledger_file(self.binary_file))
+
+    def iter_transactions(self):
+        self.migrate_from_json()
+        with BinaryLedgerReader(self.binary_file) as reader:
+            for tx_type, tx in reader.transactions(): yield tx_type, normalize_transaction(tx)
+
+    def grouped_totals(self):
+        self.migrate_from_json()
+        with BinaryLedgerReader(self.binary_file) as reader:
+            return reader.grouped_totals()
+
+    def save(self, data):
+        write_binary_ledger(self.binary_file, data)
+
+    # Le fichier est réécrit entièrement (comme JsonStorage)
+    def append(self, data, records):
+        self.save(data)
+
+    def close(self):
+        pass
+
+
+# Crée l'objet de stockage correspondant au mode choisi dans config.py
+def create_storage(mode, data_file, compact_threshold=500):
+    if mode == "binary":
+        return BinaryStorage(data_file)
+    if mode == "sqlite":
+        return SqliteStorage(data_file)
+    if mode == "sharded":
+        return ShardedStorage(data_file)
+    if mode == "journal":
+        return JournalStorage(data_file, compact_threshold)
+    if mode == "json":
+        return JsonStorage(data_file)
+    raise ValueError(f"Mode de stockage inconnu: {mode}")
+
+
+# Écriture en arrière-plan : le thread Tk ne touche jamais le disque. submit() enregistre une version des données
+# (copie superficielle des listes : les transactions ne sont jamais modifiées) et les modifications à ajouter ;
+# le thread d'écriture attend que les modifications cessent pendant delay secondes (au plus max_delay) et écrit
+# tout ce qui est en attente en une seule fois : des modifications rapprochées donnent une seule écriture
+# lock protège le stockage : il est partagé avec le registre, qui lit les mois non chargés pendant les écritures
+class BackgroundWriter:
+    def __init__(self, storage, lock=None, delay=0.3, max_delay=3.0):
+        self.storage = storage
+        self.lock = lock if lock is not None else threading.RLock()
+        self.delay = delay
+        self.max_delay = max_delay
+        self.condition = threading.Condition()
+        self.snapshot = None # Dernière version des données soumise, pas encore écrite
+        self.records = [] # Modifications en attente, dans l'ordre (inutiles si full_rewrite)
+        self.full_rewrite = False # Réécriture complète demandée : l'instantané contient toutes les modifications
+        self.version = 0 # Numéro de la dernière version soumise
+        self.written_version = 0 # Numéro de la dernière version écrite
+        self.first_submit = self.last_submit = 0.0 # Instants de la première et de la dernière soumission en attente
+        self.flushing = False # Écriture immédiate demandée (flush)
+        self.writing = False
+        self.failed_version = None # Version dont l'écriture a échoué : réessayée à la prochaine soumission ou au flush
+        self.errors = queue.Queue() # Erreurs d'écriture, lues par le thread Tk (take_error)
+        self.closed = False
+        # Thread daemon : close() écrit ce qui reste avant la fermeture de l'application
+        self.thread = threading.Thread(target=self._run, name="budget-writer", daemon=True)
+        self.thread.start()
+
+    # Enregistre une nouvelle version des données : records=None demande une réécriture complète,
+    # sinon records est ajouté aux modifications en attente ; retourne le numéro de la version
+    def submit(self, data, records=None):
+        snapshot = {key: list(value) if isinstance(value, list) else value for key, value in data.items()}
+        with self.condition:
+            if records is None:
+                self.full_rewrite = True
+                self.records = []
+            elif not self.full_rewrite: self.records.extend(records)
+            now = time.monotonic()
+            if self.snapshot is None: self.first_submit = now
+            self.snapshot = snapshot
+            self.last_submit = now
+            self.version += 1
+            self.condition.notify_all()
+            return self.version
+
+    # Vrai si une version attend d'être écrite ou est en cours d'écriture
+    def busy(self):
+        with self.condition:
+            return self.snapshot is not None or self.writing
+
+    # Dernière erreur d'écriture pas encore signalée, ou None
+    def take_error(self):
+        error = None
+        while True:
+            try: error = self.errors.get_nowait()
+            except queue.Empty: return error
+
+    # Écrit immédiatement ce qui est en attente et attend la fin de l'écriture (au plus timeout secondes)
+    # Retourne True si la dernière version soumise est écrite
+    def flush(self, timeout=None):
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self.condition:
+            target = self.version
+            self.flushing = True
+            self.failed_version = None # Nouvelle tentative après un échec
+            self.condition.notify_all()
+            while self.written_version < target and self.thread.is_alive():
+                if self.failed_version is not None: break # L'écriture a échoué : l'erreur est dans errors
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0: break
+                self.condition.wait(remaining)
+            self.flushing = False
+            return self.written_version >= target
+
+    # Écrit ce qui reste puis arrête le thread ; retourne True si tout est écrit
+    # En cas d'échec le thread continue, avec les modifications toujours en attente (nouvel essai avec close ou flush)
+    def close(self, timeout=None):
+        if not self.flush(timeout): return False
+        with self.condition:
+            self.closed = True
+            self.condition.notify_all()
+        self.thread.join(timeout)
+        return True
+
+    # Vrai si une version attend et peut être écrite (pas de nouvel essai automatique après un échec)
+    def _ready(self):
+        return self.snapshot is not None and self.failed_version != self.version
+
+    def _run(self):
+        while True:
+            with self.condition:
+                while not self._ready() and not self.closed: self.condition.wait()
+                if not self._ready(): return # Fermé, plus rien à écrire
+                # Regroupement : attendre que les modifications cessent, sauf flush ou attente trop longue
+                while not self.flushing and not self.closed:
+                    wait = min(self.last_submit + self.delay, self.first_submit + self.max_delay) - time.monotonic()
+                    if wait <= 0: break
+                    self.condition.wait(wait)
+                snapshot, records, full_rewrite, version = self.snapshot, self.records, self.full_rewrite, self.version
+                self.snapshot, self.records, self.full_rewrite = None, [], False
+                self.writing = True
+            try:
+                with self.lock:
+                    if full_rewrite: self.storage.save(snapshot)
+                    else: self.storage.append(snapshot, records)
+            except (OSError, ValueError, sqlite3.Error) as e:
+                with self.condition:
+                    # Le travail non écrit est remis en attente devant les modifications arrivées entre-temps
+                    if self.snapshot is None:
+                        self.snapshot = snapshot
+                        self.first_submit = self.last_submit = time.monotonic()
+                    if full_rewrite or self.full_rewrite: self.full_rewrite, self.records = True, []
+                    else: self.records = records + self.records
+                    self.failed_version = self.version
+                    self.writing = False
+                    self.errors.put(e)
+                    self.condition.notify_all()
+            else:
+                with self.condition:
+                    self.written_version = version
+                    self.writing = False
+                    self.condition.notify_all()
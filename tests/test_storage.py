@@ -0,0 +1,95 @@
+# Tests des stockages : une écriture qui échoue puis est refaite ne doit ni dupliquer ni perdre de modification
+#   python -m pytest tests
+import os
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import storage
+from ledger import Ledger
+from storage import BackgroundWriter, create_storage
+
+
+# atomic_write_json qui échoue une seule fois (disque plein simulé), puis écrit normalement
+def failing_once():
+    real = storage.atomic_write_json
+    calls = {"failed": False}
+    def write(path, data, indent=4):
+        if not calls["failed"]:
+            calls["failed"] = True
+            raise OSError("disque plein (simulé)")
+        real(path, data, indent)
+    return mock.patch.object(storage, "atomic_write_json", side_effect=write)
+
+
+class RetryAfterFailedWriteTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.data_file = os.path.join(self.directory.name, "budget_data.json")
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def open_ledger(self, mode):
+        ledger = Ledger(create_storage(mode, self.data_file))
+        ledger.load()
+        ledger.ensure_loaded()
+        return ledger
+
+    def descriptions(self, mode):
+        ledger = self.open_ledger(mode)
+        return sorted(tx["description"] for tx in ledger.data["expenses"])
+
+    def add(self, ledger, description):
+        return ledger.add("expenses", Ledger.make_transaction(description, 10, "2024-03-05", "Alimentation"))
+
+    def test_sharded_add_retried_once(self):
+        ledger = self.open_ledger("sharded")
+        ledger.save(self.add(ledger, "a"))
+        records = self.add(ledger, "b")
+        with failing_once():
+            with self.assertRaises(OSError): ledger.save(records)
+            ledger.save(records) # Nouvel essai, comme BackgroundWriter
+        self.assertEqual(self.descriptions("sharded"), ["a", "b"])
+
+    def test_sharded_delete_retried_once(self):
+        ledger = self.open_ledger("sharded")
+        ledger.save(self.add(ledger, "a") + self.add(ledger, "b"))
+        _, records = ledger.delete([1])
+        with failing_once():
+            with self.assertRaises(OSError): ledger.save(records)
+            ledger.save(records)
+        self.assertEqual(self.descriptions("sharded"), ["b"])
+
+    def test_background_writer_retries_after_error(self):
+        for mode in ["json", "journal", "sqlite", "sharded", "binary"]:
+            with self.subTest(mode=mode):
+                os.makedirs(os.path.join(self.directory.name, mode)) # Chaque mode dans son propre dossier
+                self.data_file = os.path.join(self.directory.name, mode, "budget_data.json")
+                ledger = self.open_ledger(mode)
+                ledger.writer = BackgroundWriter(ledger.storage, ledger.storage_lock, delay=0.01)
+                ledger.save(self.add(ledger, "a"))
+                self.assertTrue(ledger.writer.flush(5))
+                real_save, real_append = ledger.storage.save, ledger.storage.append
+                failed = []
+                def append(data, records):
+                    if not failed:
+                        failed.append(True)
+                        raise OSError("disque plein (simulé)")
+                    real_append(data, records)
+                with mock.patch.object(ledger.storage, "append", side_effect=append):
+                    ledger.save(self.add(ledger, "b"))
+                    self.assertFalse(ledger.writer.flush(5))
+                    self.assertIsInstance(ledger.writer.take_error(), OSError)
+                    _, records = ledger.delete([1])
+                    ledger.save(records)
+                    self.assertTrue(ledger.writer.close(5))
+                ledger.storage.close()
+                self.assertEqual(self.descriptions(mode), ["b"])
+
+
+if __name__ == "__main__":
+    unittest.main()
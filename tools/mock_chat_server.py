@@ -0,0 +1,112 @@
+# Serveur local qui imite l'API de chat d'OpenRouter, pour tester le Chat IA sans réseau ni clé
+#   python tools/mock_chat_server.py --port 8765 --delay 0.05
+#   BUDGET_CHAT_URL=http://127.0.0.1:8765/api/v1/chat/completions python main.py
+# Avec "stream": true, la réponse est envoyée en server-sent events, un mot par événement
+# --fail-count 2 --fail-status 503 : les deux premières requêtes échouent (pour tester les nouvelles tentatives)
+import argparse
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+REPLY = ("Voici quelques conseils pour votre budget : notez chaque dépense, fixez un plafond par catégorie "
+         "et gardez une petite épargne de précaution chaque mois.")
+
+
+class MockChatHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    delay = 0.05 # Secondes entre deux morceaux de la réponse
+    first_token_delay = 0.2 # Secondes avant le premier morceau
+    fail_status = None # Code d'erreur renvoyé (pour tester la gestion des erreurs)
+    fail_count = None # Nombre de requêtes en échec avant de répondre normalement (None : toutes)
+    retry_after = None # Valeur de l'en-tête Retry-After des réponses en erreur
+    requests_served = 0
+    lock = threading.Lock()
+
+    def do_POST(self):
+        with MockChatHandler.lock:
+            MockChatHandler.requests_served += 1
+            number = MockChatHandler.requests_served
+        length = int(self.headers.get("Content-Length", 0))
+        payload = json.loads(self.rfile.read(length) or b"{}")
+        if self.fail_status and (self.fail_count is None or number <= self.fail_count):
+            body = json.dumps({"error": {"message": "Erreur simulée", "code": self.fail_status}}).encode("utf-8")
+            self.send_response(self.fail_status)
+            if self.retry_after is not None: self.send_header("Retry-After", str(self.retry_after))
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+            return
+        last_question = next((m["content"] for m in reversed(payload.get("messages", [])) if m.get("role") == "user"), "")
+        reply = f"{REPLY} (question : {last_question})"
+        if payload.get("stream"):
+            # Envoi en "chunked transfer encoding", comme l'API réelle : chaque événement part aussitôt
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Cache-Control", "no-cache")
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+            try:
+                self.send_chunk(b": OPENROUTER PROCESSING\n\n") # Commentaire SSE, comme l'API réelle
+                time.sleep(self.first_token_delay)
+                for i, word in enumerate(reply.split(" ")):
+                    chunk = {"choices": [{"index": 0, "delta": {"content": word if i == 0 else " " + word}}]}
+                    self.send_chunk(f"data: {json.dumps(chunk, ensure_ascii=False)}\n\n".encode("utf-8"))
+                    time.sleep(self.delay)
+                self.send_chunk(b"data: [DONE]\n\n")
+                self.send_chunk(b"") # Fin de la réponse
+            except (BrokenPipeError, ConnectionResetError):
+                self.close_connection = True # Le client a interrompu la réponse
+        else:
+            time.sleep(self.first_token_delay)
+            body = json.dumps({"choices": [{"index": 0, "message": {"role": "assistant", "content": reply}}]}, ensure_ascii=False).encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+    def handle(self):
+        try: super().handle()
+        except ConnectionResetError: pass # Connexion fermée par le client (requête annulée)
+
+    def send_chunk(self, data):
+        self.wfile.write(f"{len(data):X}\r\n".encode("ascii") + data + b"\r\n")
+        self.wfile.flush()
+
+    def log_message(self, format, *args):
+        pass # Pas de journal pour chaque requête
+
+
+# Démarre le serveur (port 0 : port libre choisi par le système) ; retourne le serveur, à arrêter avec shutdown()
+# requests_served est remis à zéro : fail_count compte les requêtes de ce serveur
+def start_server(port=0, delay=0.05, first_token_delay=0.2, fail_status=None, fail_count=None, retry_after=None):
+    MockChatHandler.requests_served = 0
+    handler = type("Handler", (MockChatHandler,), {"delay": delay, "first_token_delay": first_token_delay, "fail_status": fail_status,
+                                                   "fail_count": fail_count, "retry_after": retry_after})
+    server = ThreadingHTTPServer(("127.0.0.1", port), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serveur de test imitant l'API de chat d'OpenRouter")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--delay", type=float, default=0.05, help="secondes entre deux morceaux de la réponse")
+    parser.add_argument("--first-token-delay", type=float, default=0.2, help="secondes avant le premier morceau")
+    parser.add_argument("--fail-status", type=int, help="renvoie ce code d'erreur HTTP")
+    parser.add_argument("--fail-count", type=int, help="n'échoue que pour les N premières requêtes")
+    parser.add_argument("--retry-after", type=float, help="en-tête Retry-After (secondes) des réponses en erreur")
+    args = parser.parse_args()
+    handler = type("Handler", (MockChatHandler,), {"delay": args.delay, "first_token_delay": args.first_token_delay,
+                                                   "fail_status": args.fail_status, "fail_count": args.fail_count,
+                                                   "retry_after": args.retry_after})
+    server = ThreadingHTTPServer(("127.0.0.1", args.port), handler)
+    print(f"Serveur de chat de test sur http://127.0.0.1:{args.port}/api/v1/chat/completions")
+    try: server.serve_forever()
+    except KeyboardInterrupt: pass
+
+
+if __name__ == "__main__":
+    main()